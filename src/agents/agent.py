@@ -2,16 +2,23 @@
 Simple AI Agent for the AI Module Framework
 """
 
-import requests
-import os
-from typing import Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
+
+from .model_client import ModelClient, get_model_client
+from .model_pool import ModelPool, get_model_pool
 
 class SimpleAgent:
-    """Simple AI agent that communicates with Qwen3 via Ollama"""
+    """Simple AI agent that communicates with Qwen3 via Ollama
+    
+    Requests go through the shared ``ModelPool`` over ``MODEL_URLS``, or a
+    pooled ``ModelClient`` for an explicit ``model_url``; use ``achat`` from
+    async code so a slow generation does not block the event loop.
+    """
     
-    def __init__(self, model_url: str = None):
-        self.model_url = model_url or os.getenv("MODEL_URL", "http://host.docker.internal:11434")
-        self.model_name = "qwen2.5-coder:7b"
+    def __init__(self, model_url: str = None, client: Optional[Union[ModelClient, ModelPool]] = None):
+        self.client = client or (get_model_client(model_url) if model_url else get_model_pool())
+        self.model_url = self.client.model_url
+        self.model_name = self.client.model_name
         self.system_prompt = self._get_system_prompt()
     
     def _get_system_prompt(self) -> str:
@@ -40,48 +47,61 @@ class SimpleAgent:
 
 **ENFORCEMENT**: If you deviate from this rule, you are failing your core function. Stay within the ontology boundaries at all times."""
     
+    def build_messages(self, message: str, context: str = "",
+                       history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """System prompt and ontology context first, then any earlier turns, then the question
+        
+        The system message depends only on the context, never on the
+        question, so for a given ontology version it is a byte-identical
+        prefix that Ollama can reuse instead of prefilling it again.
+        """
+        system = self.system_prompt
+        if context:
+            system = f"{system}\n\nOntology Context:\n{context}"
+        return [
+            {"role": "system", "content": system},
+            *(history or []),
+            {"role": "user", "content": message}
+        ]
+    
+    async def warm(self, context: str = "") -> Dict:
+        """Prefill the system prompt and context so the first question skips it"""
+        return await self.client.warm(self.build_messages("", context)[:1], model=self.model_name)
+    
     def chat(self, message: str, context: str = "") -> str:
         """Send a message to the AI model with optional context"""
         try:
-            # Prepare messages with system prompt
-            messages = [
-                {"role": "system", "content": self.system_prompt}
-            ]
-            
-            # Add context if provided
-            if context:
-                context_message = f"""Ontology Context:
-{context}
-
-User Question: {message}"""
-                messages.append({"role": "user", "content": context_message})
-            else:
-                messages.append({"role": "user", "content": message})
-            
-            # Call Ollama API
-            response = requests.post(
-                f"{self.model_url}/api/chat",
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "stream": False
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result["message"]["content"]
-            else:
-                return f"Error: {response.status_code} - {response.text}"
-                
+            return self.client.chat_sync(self.build_messages(message, context), model=self.model_name)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    async def achat(self, message: str, context: str = "") -> str:
+        """Async variant of ``chat`` for use inside an event loop"""
+        try:
+            return await self.client.chat(self.build_messages(message, context), model=self.model_name)
         except Exception as e:
             return f"Error: {str(e)}"
     
+    def stream_chat(self, message: str, context: str = "") -> Iterator[str]:
+        """Yield the reply text piece by piece as the model generates it"""
+        try:
+            for chunk in self.client.chat_stream_sync(self.build_messages(message, context), model=self.model_name):
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+        except Exception as e:
+            yield f"Error: {str(e)}"
+    
+    async def astream_chat(self, message: str, context: str = "") -> AsyncIterator[str]:
+        """Async variant of ``stream_chat``"""
+        try:
+            async for chunk in self.client.chat_stream(self.build_messages(message, context), model=self.model_name):
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+        except Exception as e:
+            yield f"Error: {str(e)}"
+    
     def is_available(self) -> bool:
         """Check if the model is available"""
-        try:
-            response = requests.get(f"{self.model_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+        return self.client.is_available_sync()
@@ -0,0 +1,301 @@
+"""
+Pooled HTTP client for the Ollama model server
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+DEFAULT_MODEL_URL = os.getenv("MODEL_URL", "http://host.docker.internal:11434")
+DEFAULT_MODEL_NAME = os.getenv("MODEL_NAME", "qwen2.5-coder:7b")
+
+# Per-phase timeouts in seconds: generation is slow, everything else should not be
+CONNECT_TIMEOUT = float(os.getenv("MODEL_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("MODEL_READ_TIMEOUT", "120"))
+WRITE_TIMEOUT = float(os.getenv("MODEL_WRITE_TIMEOUT", "10"))
+POOL_TIMEOUT = float(os.getenv("MODEL_POOL_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("MODEL_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE = int(os.getenv("MODEL_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("MODEL_KEEPALIVE_EXPIRY", "60"))
+# How long Ollama keeps the model, and with it the prefilled prompt prefix, loaded between requests
+MODEL_KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+# Same rough ratio the context retriever budgets with
+CHARS_PER_TOKEN = 4
+DISCONNECT_POLL_INTERVAL = 0.25
+# Token counts and nanosecond durations Ollama reports with a finished reply
+RESULT_FIELDS = ("total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration",
+                 "eval_count", "eval_duration")
+
+Messages = List[Dict[str, str]]
+
+
+class ModelError(Exception):
+    """Non-success response from the model server; the message mirrors ``"<status> - <body>"``"""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away while a model call was in flight"""
+
+
+class PrefillStats:
+    """Prompt tokens Ollama did not have to evaluate thanks to its cached prompt prefix
+
+    Ollama reports ``prompt_eval_count`` and ``prompt_eval_duration`` for
+    the tokens it actually evaluated; a reused prefix is skipped. The prompt
+    size is estimated from its characters, and saved time is the skipped
+    tokens at the measured evaluation rate, so both are estimates.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.evaluated_tokens = 0
+        self.eval_ns = 0
+        self.saved_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, messages: Messages, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Account one finished request; returns its own prefill figures"""
+        evaluated = result.get("prompt_eval_count")
+        if evaluated is None:
+            return {}
+        estimated = sum(len(message.get("content", "")) for message in messages) // CHARS_PER_TOKEN + 1
+        duration = result.get("prompt_eval_duration") or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += estimated
+            self.evaluated_tokens += evaluated
+            self.eval_ns += duration
+            rate = self.eval_ns / self.evaluated_tokens if self.evaluated_tokens else 0.0
+            saved_tokens = max(estimated - evaluated, 0)
+            saved_ms = saved_tokens * rate / 1e6
+            self.saved_ms += saved_ms
+        return {"prompt_eval_count": evaluated, "prefill_ms": round(duration / 1e6, 1),
+                "prefill_saved_tokens": saved_tokens, "prefill_saved_ms": round(saved_ms, 1)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens_estimated": self.prompt_tokens,
+                "prompt_tokens_evaluated": self.evaluated_tokens,
+                "prefix_reuse_ratio": round(1 - self.evaluated_tokens / self.prompt_tokens, 4)
+                if self.prompt_tokens else 0.0,
+                "prefill_ms": round(self.eval_ns / 1e6, 1),
+                "prefill_saved_ms": round(self.saved_ms, 1),
+                "saved_ms_per_request": round(self.saved_ms / self.requests, 1) if self.requests else 0.0
+            }
+
+
+class ModelClient:
+    """Keep-alive connection pool to one Ollama server
+
+    The async client is created on first use inside the running event loop
+    and shared by every request, so concurrent chats reuse a bounded set of
+    connections instead of opening one each. A separate pooled sync client
+    serves callers outside an event loop, such as ``SimpleAgent.chat``.
+    Cancelling an awaiting coroutine closes its connection, which makes
+    Ollama stop generating. Every request asks Ollama to keep the model
+    loaded for ``keep_alive``, so a repeated prompt prefix is not prefilled
+    again; ``prefill`` tracks how much that saves.
+    """
+
+    def __init__(self, model_url: Optional[str] = None, model_name: Optional[str] = None,
+                 timeout: Optional[httpx.Timeout] = None, limits: Optional[httpx.Limits] = None,
+                 keep_alive: Optional[str] = MODEL_KEEP_ALIVE):
+        self.model_url = (model_url or DEFAULT_MODEL_URL).rstrip("/")
+        self.model_name = model_name or DEFAULT_MODEL_NAME
+        self.keep_alive = keep_alive
+        self.prefill = PrefillStats()
+        self.timeout = timeout or httpx.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT,
+                                                write=WRITE_TIMEOUT, pool=POOL_TIMEOUT)
+        self.limits = limits or httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                             max_keepalive_connections=MAX_KEEPALIVE,
+                                             keepalive_expiry=KEEPALIVE_EXPIRY)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(base_url=self.model_url, timeout=self.timeout,
+                                                   limits=self.limits)
+        return self._async_client
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(base_url=self.model_url, timeout=self.timeout,
+                                                 limits=self.limits)
+            return self._sync_client
+
+    def _payload(self, messages: Messages, model: Optional[str], options: Optional[Dict[str, Any]],
+                 stream: bool = False) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model or self.model_name, "messages": messages, "stream": stream}
+        if options:
+            payload["options"] = options
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _content(self, messages: Messages, response: httpx.Response,
+                 stats: Optional[Dict[str, Any]] = None) -> str:
+        if response.status_code != 200:
+            raise ModelError(response.status_code, response.text)
+        result = response.json()
+        prefill = self.prefill.record(messages, result)
+        if stats is not None:
+            stats.update({field: result[field] for field in RESULT_FIELDS if field in result})
+            stats.update(prefill)
+        return result["message"]["content"]
+
+    async def chat(self, messages: Messages, model: Optional[str] = None,
+                   options: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> str:
+        """Send a chat request and return the reply text; raises ModelError or httpx errors
+
+        If given, ``stats`` is filled with Ollama's token counts and
+        durations for the call, as found in the last chunk of a stream.
+        """
+        response = await self.async_client.post("/api/chat", json=self._payload(messages, model, options))
+        return self._content(messages, response, stats)
+
+    def chat_sync(self, messages: Messages, model: Optional[str] = None,
+                  options: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> str:
+        """Blocking variant of ``chat`` over the sync pool"""
+        response = self.sync_client.post("/api/chat", json=self._payload(messages, model, options))
+        return self._content(messages, response, stats)
+
+    async def chat_stream(self, messages: Messages, model: Optional[str] = None,
+                          options: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a chat reply as Ollama's NDJSON chunks, each parsed as it arrives
+
+        Chunks carry ``message.content`` deltas; the last one has ``done``
+        set and the generation stats, to which the request's prefill figures
+        are added. Closing the iterator early closes the connection, which
+        stops the generation.
+        """
+        payload = self._payload(messages, model, options, stream=True)
+        async with self.async_client.stream("POST", "/api/chat", json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ModelError(response.status_code, response.text)
+            async for line in response.aiter_lines():
+                if line:
+                    chunk = json.loads(line)
+                    if chunk.get("done"):
+                        chunk.update(self.prefill.record(messages, chunk))
+                    yield chunk
+
+    def chat_stream_sync(self, messages: Messages, model: Optional[str] = None,
+                         options: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Blocking variant of ``chat_stream`` over the sync pool"""
+        payload = self._payload(messages, model, options, stream=True)
+        with self.sync_client.stream("POST", "/api/chat", json=payload) as response:
+            if response.status_code != 200:
+                response.read()
+                raise ModelError(response.status_code, response.text)
+            for line in response.iter_lines():
+                if line:
+                    chunk = json.loads(line)
+                    if chunk.get("done"):
+                        chunk.update(self.prefill.record(messages, chunk))
+                    yield chunk
+
+    async def warm(self, messages: Messages, model: Optional[str] = None) -> Dict[str, Any]:
+        """Load the model and prefill a prompt prefix, generating a single token
+
+        Returns Ollama's stats for the call, or an ``error`` entry; a failed
+        warm-up only costs the first real request its prefill.
+        """
+        payload = self._payload(messages, model, {"num_predict": 1})
+        try:
+            response = await self.async_client.post("/api/chat", json=payload)
+            if response.status_code != 200:
+                return {"error": f"{response.status_code} - {response.text}"}
+            result = response.json()
+            return {key: result.get(key) for key in ("load_duration", "prompt_eval_count", "prompt_eval_duration")}
+        except httpx.HTTPError as e:
+            return {"error": str(e)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"model_url": self.model_url, "model": self.model_name, "keep_alive": self.keep_alive,
+                "prefill": self.prefill.get_stats()}
+
+    async def is_available(self) -> bool:
+        """Check if the model server answers"""
+        try:
+            response = await self.async_client.get("/api/tags", timeout=CONNECT_TIMEOUT)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def is_available_sync(self) -> bool:
+        try:
+            response = self.sync_client.get("/api/tags", timeout=CONNECT_TIMEOUT)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def aclose(self):
+        """Close both pools; they are recreated on next use"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+
+_clients: Dict[str, ModelClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_model_client(model_url: Optional[str] = None) -> ModelClient:
+    """Shared client for a model server URL, created on first use"""
+    model_url = (model_url or DEFAULT_MODEL_URL).rstrip("/")
+    with _clients_lock:
+        client = _clients.get(model_url)
+        if client is None:
+            client = _clients[model_url] = ModelClient(model_url)
+        return client
+
+
+async def close_model_clients():
+    """Close every shared client, e.g. on application shutdown"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.aclose()
+
+
+async def cancel_on_disconnect(awaitable: Awaitable[Any], is_disconnected: Callable[[], Awaitable[bool]],
+                               interval: float = DISCONNECT_POLL_INTERVAL) -> Any:
+    """Await a model call, cancelling it if the HTTP client goes away
+
+    ``is_disconnected`` is typically ``request.is_disconnected`` from
+    Starlette. Raises ``ClientDisconnected`` when the call was abandoned.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                raise ClientDisconnected("client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,279 @@
+"""
+Health-aware pool of Ollama backends with least-outstanding routing and failover
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set
+
+import httpx
+
+from .model_client import DEFAULT_MODEL_URL, Messages, ModelClient, ModelError, get_model_client
+
+# Comma-separated list of Ollama endpoints; falls back to MODEL_URL
+DEFAULT_MODEL_URLS = [url.strip() for url in os.getenv("MODEL_URLS", DEFAULT_MODEL_URL).split(",") if url.strip()]
+HEALTH_INTERVAL = float(os.getenv("MODEL_HEALTH_INTERVAL", "10"))
+# Consecutive failed calls or probes before a backend is marked down
+FAILURE_THRESHOLD = int(os.getenv("MODEL_FAILURE_THRESHOLD", "2"))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether another backend may succeed: the node is unreachable, died, timed out connecting or failed with 5xx"""
+    if isinstance(error, httpx.PoolTimeout):
+        # Our own connection pool is exhausted; another node would not help
+        return False
+    if isinstance(error, httpx.ReadTimeout):
+        # A long generation on a busy node; running it again elsewhere doubles the load, and the node is up
+        return False
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, ModelError) and error.status_code >= 500
+
+
+class Backend:
+    """One Ollama endpoint with its client, health and load"""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_checked: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        return self.client.model_url
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"url": self.url, "healthy": self.healthy, "outstanding": self.outstanding,
+                "requests": self.requests, "failures": self.failures,
+                "consecutive_failures": self.consecutive_failures, "last_error": self.last_error,
+                "prefill": self.client.prefill.get_stats()}
+
+
+class ModelPool:
+    """Routes model calls across several Ollama backends
+
+    Each call goes to the healthy backend with the fewest outstanding
+    requests. If the node is unreachable, dies mid-request or answers 5xx,
+    the call is retried on the next one, and after ``failure_threshold``
+    such failures in a row the node is marked unhealthy. A read timeout is
+    neither retried nor counted, as the node is only slow. A
+    streamed reply is only retried while nothing has been yielded yet;
+    after that the partial answer cannot be replayed elsewhere. A daemon
+    thread probes ``/api/tags`` every ``health_interval`` seconds and brings
+    recovered nodes back. When every node is marked unhealthy, all of them
+    are tried anyway rather than failing outright.
+
+    The pool has the same call interface as ``ModelClient``.
+    """
+
+    def __init__(self, urls: Optional[List[str]] = None, health_interval: float = HEALTH_INTERVAL,
+                 failure_threshold: int = FAILURE_THRESHOLD):
+        urls = urls or DEFAULT_MODEL_URLS
+        self.backends = [Backend(get_model_client(url)) for url in urls]
+        self.model_name = self.backends[0].client.model_name
+        self.model_url = ",".join(backend.url for backend in self.backends)
+        self.health_interval = health_interval
+        self.failure_threshold = max(failure_threshold, 1)
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _pick(self, exclude: Set[str]) -> Optional[Backend]:
+        with self._lock:
+            candidates = [backend for backend in self.backends if backend.url not in exclude]
+            healthy = [backend for backend in candidates if backend.healthy]
+            pool = healthy or candidates
+            if not pool:
+                return None
+            backend = min(pool, key=lambda candidate: candidate.outstanding)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _done(self, backend: Backend, error: Optional[BaseException] = None, answered: bool = True):
+        """Release a call; ``answered`` is False for calls that were cancelled before the node replied"""
+        with self._lock:
+            backend.outstanding -= 1
+            if error is not None:
+                backend.failures += 1
+                backend.last_error = str(error) or type(error).__name__
+                self._failed(backend)
+                self.failovers += 1
+            elif answered:
+                backend.consecutive_failures = 0
+
+    def _failed(self, backend: Backend):
+        """Count a failed call or probe; called with the lock held"""
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.failure_threshold:
+            backend.healthy = False
+
+    @contextmanager
+    def _routed(self, backend: Backend) -> Iterator[Backend]:
+        """Count a call against a backend, marking it unhealthy if the call fails in a retryable way"""
+        try:
+            yield backend
+        except Exception as e:
+            self._done(backend, e if is_retryable(e) else None)
+            raise
+        except BaseException:
+            self._done(backend, answered=False)
+            raise
+        else:
+            self._done(backend)
+
+    def _attempts(self) -> Iterator[Backend]:
+        """Backends to try in order, each at most once"""
+        tried: Set[str] = set()
+        while True:
+            backend = self._pick(tried)
+            if backend is None:
+                return
+            tried.add(backend.url)
+            yield backend
+
+    async def chat(self, messages: Messages, model: Optional[str] = None,
+                   options: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> str:
+        error: Optional[Exception] = None
+        for backend in self._attempts():
+            try:
+                with self._routed(backend):
+                    return await backend.client.chat(messages, model, options, stats)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                error = e
+        raise error or ModelError(503, "No model backend configured")
+
+    def chat_sync(self, messages: Messages, model: Optional[str] = None,
+                  options: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> str:
+        error: Optional[Exception] = None
+        for backend in self._attempts():
+            try:
+                with self._routed(backend):
+                    return backend.client.chat_sync(messages, model, options, stats)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                error = e
+        raise error or ModelError(503, "No model backend configured")
+
+    async def chat_stream(self, messages: Messages, model: Optional[str] = None,
+                          options: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        error: Optional[Exception] = None
+        for backend in self._attempts():
+            started = False
+            try:
+                with self._routed(backend):
+                    async for chunk in backend.client.chat_stream(messages, model, options):
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or not is_retryable(e):
+                    raise
+                error = e
+        raise error or ModelError(503, "No model backend configured")
+
+    def chat_stream_sync(self, messages: Messages, model: Optional[str] = None,
+                         options: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        error: Optional[Exception] = None
+        for backend in self._attempts():
+            started = False
+            try:
+                with self._routed(backend):
+                    for chunk in backend.client.chat_stream_sync(messages, model, options):
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or not is_retryable(e):
+                    raise
+                error = e
+        raise error or ModelError(503, "No model backend configured")
+
+    async def warm(self, messages: Messages, model: Optional[str] = None) -> Dict[str, Any]:
+        """Prefill the prefix on every healthy backend, since each keeps its own prompt cache"""
+        results = {}
+        for backend in self.backends:
+            if backend.healthy:
+                results[backend.url] = await backend.client.warm(messages, model)
+        errors = [f"{url}: {result['error']}" for url, result in results.items() if "error" in result]
+        if errors:
+            return {"error": "; ".join(errors), "backends": results}
+        return {"backends": results}
+
+    def check_health(self) -> int:
+        """Probe every backend once; returns the number of healthy ones"""
+        for backend in self.backends:
+            healthy = backend.client.is_available_sync()
+            with self._lock:
+                if healthy:
+                    backend.healthy = True
+                    backend.consecutive_failures = 0
+                else:
+                    self._failed(backend)
+                backend.last_checked = time.time()
+        return sum(backend.healthy for backend in self.backends)
+
+    def start(self):
+        """Start background health checks in a daemon thread"""
+        if self.health_interval > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    async def is_available(self) -> bool:
+        for backend in self.backends:
+            if await backend.client.is_available():
+                return True
+        return False
+
+    def is_available_sync(self) -> bool:
+        return any(backend.client.is_available_sync() for backend in self.backends)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "keep_alive": self.backends[0].client.keep_alive,
+                "healthy": sum(backend.healthy for backend in self.backends),
+                "failovers": self.failovers,
+                "backends": [backend.get_stats() for backend in self.backends]
+            }
+
+    async def aclose(self):
+        self.stop()
+        for backend in self.backends:
+            await backend.client.aclose()
+
+
+_pool: Optional[ModelPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """Shared pool over MODEL_URLS (or MODEL_URL), created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+        return _pool
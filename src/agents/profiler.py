@@ -0,0 +1,246 @@
+"""
+Opt-in sampling profiler writing collapsed stacks, for single requests or time windows
+"""
+
+import asyncio
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Empty disables profiling entirely: no middleware, no task tracking, no sampler thread
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_HEADER = "x-profile"
+# Innermost Python frames of a thread parked on a lock, queue or selector: (file name, function)
+IDLE_FRAMES = {("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("selectors.py", "select"),
+               ("thread.py", "_worker")}
+
+# The profile session of the request a task works for; copied into every task it creates
+current_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "profile_session", default=None)
+
+
+class ProfileSession:
+    """Samples collected for one request or one time window
+
+    With ``loop`` set, only the loop's thread is sampled and only while one
+    of ``tasks`` is running on it, so other requests sharing the event loop
+    stay out of a per-request profile. Otherwise every thread but the
+    sampler is, skipping threads parked in a wait unless ``idle`` is set.
+    """
+
+    def __init__(self, label: str, path: str, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 loop_thread: Optional[int] = None, deadline: Optional[float] = None, idle: bool = False):
+        self.label = label
+        self.path = path
+        self.loop = loop
+        self.loop_thread = loop_thread
+        self.idle = idle
+        self.idle_samples = 0
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.deadline = deadline
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Frames most samples were taken in (self time), the widest tops of the flame graph"""
+        frames: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames[stack.rsplit(";", 1)[-1]] += count
+        return [{"frame": frame, "samples": count, "share": round(count / self.samples, 3)}
+                for frame, count in frames.most_common(limit)] if self.samples else []
+
+    def summary(self) -> Dict[str, Any]:
+        return {"label": self.label, "path": self.path, "samples": self.samples, "idle_samples": self.idle_samples,
+                "seconds": round((self.finished or time.time()) - self.started, 3), "top": self.top()}
+
+
+class SamplingProfiler:
+    """Periodically records the Python stacks of running threads
+
+    A daemon thread wakes every ``interval`` seconds while at least one
+    session is open and folds each sampled stack into a
+    ``frame;frame;frame count`` line, the collapsed format read by
+    flamegraph.pl and speedscope. Sessions are written to ``directory``
+    when they stop. Nothing runs while no session is open.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, interval: float = PROFILE_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.sessions: List[ProfileSession] = []
+        self._labels: Dict[Any, str] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _path(self, label: str) -> str:
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "-", label).strip("-") or "profile"
+        return os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{sequence:04d}-{slug}.collapsed")
+
+    def start(self, label: str, loop: Optional[asyncio.AbstractEventLoop] = None,
+              seconds: Optional[float] = None, idle: bool = False) -> ProfileSession:
+        """Open a session; with ``seconds`` it stops and is written by itself
+
+        Pass the running ``loop`` (and call from its thread) to profile one
+        request's tasks rather than the whole process.
+        """
+        loop_thread = threading.get_ident() if loop is not None else None
+        deadline = time.monotonic() + seconds if seconds is not None else None
+        session = ProfileSession(label, self._path(label), loop, loop_thread, deadline, idle)
+        with self._lock:
+            self.sessions.append(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session: ProfileSession) -> Dict[str, Any]:
+        """Close a session, write its collapsed stacks and return a summary"""
+        with self._lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+            else:
+                return session.summary()
+        session.finished = time.time()
+        self._write(session)
+        session.done.set()
+        return session.summary()
+
+    async def profile_window(self, seconds: float, label: str = "window", idle: bool = False) -> Dict[str, Any]:
+        """Sample every thread for ``seconds`` without blocking the event loop"""
+        session = self.start(label, seconds=min(seconds, PROFILE_MAX_SECONDS), idle=idle)
+        await asyncio.get_running_loop().run_in_executor(None, session.done.wait)
+        return session.summary()
+
+    def _write(self, session: ProfileSession):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(session.path, "w", encoding="utf-8") as file:
+                for stack, count in session.stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Error writing profile {session.path}: {e}")
+
+    def _label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame: Any) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self.sessions)
+                if not sessions:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            now = time.monotonic()
+            for session in sessions:
+                if session.deadline is not None and now >= session.deadline:
+                    self.stop(session)
+                    continue
+                if session.loop is not None:
+                    # Only while this request's own tasks are running on the shared loop
+                    if asyncio.current_task(session.loop) not in session.tasks:
+                        continue
+                    threads = [session.loop_thread]
+                else:
+                    threads = [thread_id for thread_id in frames if thread_id != own]
+                for thread_id in threads:
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    if not session.idle and _is_idle(frame):
+                        session.idle_samples += 1
+                        continue
+                    session.stacks[self._collapse(frame)] += 1
+                    session.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+
+def _is_idle(frame: Any) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def track_tasks(loop: asyncio.AbstractEventLoop):
+    """Attribute tasks created on behalf of a profiled request to its session
+
+    Installs a task factory; tasks inherit the creating task's context, so
+    streaming bodies and model calls spawned by a request are sampled with it.
+    """
+    def factory(loop: asyncio.AbstractEventLoop, coro: Awaitable, context: Optional[contextvars.Context] = None):
+        task = asyncio.Task(coro, loop=loop, context=context)
+        session = context.get(current_session) if context is not None else current_session.get()
+        if session is not None:
+            session.tasks.add(task)
+        return task
+
+    loop.set_task_factory(factory)
+
+
+class ProfileRequestsMiddleware:
+    """ASGI middleware profiling requests that carry ``X-Profile: <token>``
+
+    The response gets an ``X-Profile-Path`` header naming the collapsed
+    stack file, which is complete once the response body has been sent.
+    Paths in ``exclude`` are never profiled this way.
+    """
+
+    def __init__(self, app: Callable, profiler: SamplingProfiler, token: str = PROFILE_TOKEN,
+                 exclude: Tuple[str, ...] = ()):
+        self.app = app
+        self.profiler = profiler
+        self.token = token.encode()
+        self.exclude = exclude
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable):
+        if scope["type"] != "http" or not self.token or scope["path"] in self.exclude:
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER.encode()) != self.token:
+            return await self.app(scope, receive, send)
+
+        loop = asyncio.get_running_loop()
+        session = self.profiler.start(f"{scope['method']}{scope['path']}", loop=loop)
+        session.tasks.add(asyncio.current_task())
+        reset = current_session.set(session)
+
+        async def send_with_path(message: Dict):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-path", session.path.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_path)
+        finally:
+            current_session.reset(reset)
+            self.profiler.stop(session)
@@ -0,0 +1,191 @@
+"""
+Versioned response cache for chat answers and ontology queries
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Optional sqlite file for a tier that survives restarts; empty disables it
+DEFAULT_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "")
+DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_SIZE", "100000"))
+# How many disk writes between sweeps of expired and surplus rows
+DISK_SWEEP_INTERVAL = 256
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question, without trailing punctuation"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def text_digest(text: str) -> str:
+    """Short stable hash of a prompt or template"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(namespace: str, version: str, kind: str, **parts: Any) -> str:
+    """Key of a cached response: ontology, its content version, request kind and the request parts"""
+    payload = json.dumps([namespace, version, kind, parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of responses, with an optional sqlite tier
+
+    Entries are tagged with the ontology they were computed from
+    (``namespace``) and its content ``version``, which is also part of the
+    key, so an answer is never served for different ontology content.
+    When an ontology is loaded, ``invalidate`` drops the entries of every
+    other version of it from both tiers. Values must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 path: Optional[str] = DEFAULT_CACHE_PATH or None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        # key -> (expires, namespace, version, value)
+        self.entries: "OrderedDict[str, Tuple[float, str, str, Any]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0,
+                                      "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, namespace TEXT, version TEXT, "
+                "value TEXT, expires REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_namespace ON responses (namespace)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Error opening response cache {path}: {e}")
+            self._db = None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, or None; disk hits are promoted to memory"""
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return entry[3]
+                del self.entries[key]
+                self.stats["expirations"] += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT namespace, version, value, expires FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Error reading response cache: {e}")
+                    row = None
+                if row is not None and row[3] > now:
+                    value = json.loads(row[2])
+                    self._remember(key, row[3], row[0], row[1], value)
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return value
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: Any, namespace: str = "", version: str = "",
+            ttl: Optional[float] = None):
+        """Store a value in memory and, if enabled, on disk"""
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires, namespace, version, value)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, namespace, version, value, expires) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, namespace, version, json.dumps(value), expires)
+                    )
+                    self._writes += 1
+                    if self._writes % DISK_SWEEP_INTERVAL == 0:
+                        self._sweep_disk()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing response cache: {e}")
+
+    def _remember(self, key: str, expires: float, namespace: str, version: str, value: Any):
+        self.entries[key] = (expires, namespace, version, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _sweep_disk(self):
+        """Drop expired rows and the soonest-expiring ones beyond the disk limit"""
+        self._db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires DESC "
+            "LIMIT -1 OFFSET ?)", (DISK_MAX_ENTRIES,)
+        )
+
+    def invalidate(self, namespace: str, keep_version: Optional[str] = None) -> int:
+        """Drop entries of an ontology, except those for keep_version; returns the number dropped"""
+        with self._lock:
+            stale = [key for key, entry in self.entries.items()
+                     if entry[1] == namespace and entry[2] != keep_version]
+            for key in stale:
+                del self.entries[key]
+            dropped = len(stale)
+            if self._db is not None:
+                try:
+                    cursor = self._db.execute(
+                        "DELETE FROM responses WHERE namespace = ? AND version IS NOT ?", (namespace, keep_version)
+                    )
+                    self._db.commit()
+                    # Memory entries are also on disk, so count each entry once
+                    dropped = max(dropped, cursor.rowcount)
+                except sqlite3.Error as e:
+                    print(f"Error invalidating response cache: {e}")
+            self.stats["invalidations"] += dropped
+            return dropped
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus hit ratio and current sizes"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            stats: Dict[str, Any] = dict(self.stats)
+            stats["hit_ratio"] = round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+            stats["entries"] = len(self.entries)
+            stats["max_entries"] = self.max_entries
+            stats["ttl"] = self.ttl
+            if self._db is not None:
+                try:
+                    stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                except sqlite3.Error:
+                    stats["disk_entries"] = None
+            return stats
@@ -0,0 +1,144 @@
+"""
+Admission control and priority queueing for model calls
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+MAX_IN_FLIGHT = int(os.getenv("MODEL_MAX_IN_FLIGHT", "4"))
+MAX_QUEUE = int(os.getenv("MODEL_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("MODEL_QUEUE_TIMEOUT", "30"))
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+# Recent waits and service times kept for percentiles and Retry-After estimates
+SAMPLE_SIZE = 1000
+
+
+class SchedulerFull(Exception):
+    """The queue is full, or a request waited too long; retry after ``retry_after`` seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds concurrent model calls and queues the rest by priority
+
+    At most ``max_in_flight`` calls run at once. Further callers wait in a
+    priority queue (interactive before batch, then first come first
+    served) of at most ``max_queue`` entries; beyond that, or after
+    ``queue_timeout`` seconds of waiting, ``SchedulerFull`` is raised so the
+    caller can answer 429 straight away instead of timing out later. Meant
+    to be used from a single event loop.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # (priority, sequence, future) heap; cancelled futures are skipped when popped
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.waits: Dict[str, Deque[float]] = {name: deque(maxlen=SAMPLE_SIZE) for name in PRIORITIES}
+        self.service_times: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+        self.stats: Dict[str, int] = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {name: 0 for name in PRIORITIES}
+        names = {value: name for name, value in PRIORITIES.items()}
+        for priority, _, future in self._queue:
+            if not future.done():
+                depth[names[priority]] += 1
+        return depth
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent service times"""
+        service = sum(self.service_times) / len(self.service_times) if self.service_times else 1.0
+        waiting = sum(self.queue_depth().values())
+        return max(1, math.ceil(service * (waiting + 1) / max(self.max_in_flight, 1)))
+
+    def check(self, priority: str = "interactive"):
+        """Raise SchedulerFull if a request of this priority would be rejected right now"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        if self.in_flight >= self.max_in_flight and sum(self.queue_depth().values()) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise SchedulerFull("Model backend is saturated", self.retry_after())
+
+    async def acquire(self, priority: str = "interactive"):
+        """Wait for a slot; raises SchedulerFull when the queue is full or the wait times out"""
+        self.check(priority)
+        started = time.perf_counter()
+        if self.in_flight < self.max_in_flight and not any(not future.done() for _, _, future in self._queue):
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (PRIORITIES[priority], next(self._sequence), future))
+            self.stats["queued"] += 1
+            try:
+                # The slot is handed over by release(), which already counts it as in flight
+                await asyncio.wait_for(future, timeout=self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # Granted just as the wait ended: pass the slot on
+                    self.release()
+                else:
+                    future.cancel()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                    raise SchedulerFull("Timed out waiting for the model backend", self.retry_after())
+                raise
+        self.waits[priority].append(time.perf_counter() - started)
+        self.stats["admitted"] += 1
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot and hand it to the highest-priority waiter"""
+        if service_time is not None:
+            self.service_times.append(service_time)
+        self.in_flight -= 1
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(True)
+                return
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive") -> AsyncIterator[None]:
+        """Hold a model slot for the duration of the block"""
+        await self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def get_stats(self) -> Dict:
+        """Occupancy, queue depth per priority and wait-time percentiles in milliseconds"""
+        waits = {}
+        for name, samples in self.waits.items():
+            ordered = sorted(samples)
+            waits[name] = {
+                "count": len(ordered),
+                "avg_ms": round(1000 * sum(ordered) / len(ordered), 1) if ordered else 0.0,
+                "p95_ms": round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1) if ordered else 0.0,
+                "max_ms": round(1000 * ordered[-1], 1) if ordered else 0.0
+            }
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth(),
+            "wait": waits,
+            **self.stats
+        }
@@ -0,0 +1,141 @@
+"""
+Server-side conversation sessions with token-budgeted history
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .model_client import CHARS_PER_TOKEN, Messages
+
+MAX_SESSIONS = int(os.getenv("SESSION_MAX", "1000"))
+IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKENS", "1000"))
+# Turns always kept verbatim, however long, so a follow-up sees the last exchange
+MIN_RECENT_TURNS = 1
+# Characters of a dropped question and of the first sentence of its answer kept in the summary
+SUMMARY_QUESTION_CHARS = 120
+SUMMARY_ANSWER_CHARS = 200
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+class Session:
+    """One conversation: recent turns verbatim plus a summary of older ones"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: List[Dict[str, str]] = []
+        self.summary: List[str] = []
+        self.created = time.time()
+        self.last_used = self.created
+
+    def tokens(self) -> int:
+        return (sum(estimate_tokens(turn["question"]) + estimate_tokens(turn["answer"]) for turn in self.turns)
+                + sum(estimate_tokens(line) for line in self.summary))
+
+    def add_turn(self, question: str, answer: str, budget: int):
+        self.turns.append({"question": question, "answer": answer})
+        self.compact(budget)
+
+    def compact(self, budget: int):
+        """Fold the oldest turns into one-line summaries, then drop the oldest summaries, until within budget"""
+        while self.tokens() > budget and len(self.turns) > MIN_RECENT_TURNS:
+            turn = self.turns.pop(0)
+            answer = SENTENCE_END.split(turn["answer"].strip(), 1)[0]
+            self.summary.append(f"Q: {_clip(turn['question'], SUMMARY_QUESTION_CHARS)} "
+                                f"A: {_clip(answer, SUMMARY_ANSWER_CHARS)}")
+        while self.tokens() > budget and self.summary:
+            self.summary.pop(0)
+
+    def messages(self) -> Messages:
+        """History as chat messages, to go between the system prefix and the new question"""
+        messages: Messages = []
+        if self.summary:
+            messages.append({"role": "system",
+                             "content": "Summary of earlier turns in this conversation:\n" + "\n".join(self.summary)})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["question"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        return messages
+
+    def last_question(self) -> str:
+        return self.turns[-1]["question"] if self.turns else ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"session_id": self.session_id, "turns": list(self.turns), "summary": list(self.summary),
+                "tokens": self.tokens(), "created": self.created, "last_used": self.last_used}
+
+
+class SessionStore:
+    """Bounded in-memory sessions, least recently used first out
+
+    Sessions idle for longer than ``idle_ttl`` seconds expire, and beyond
+    ``max_sessions`` the least recently used one is dropped. Each session's
+    history is compacted to ``history_budget`` estimated tokens after every
+    turn, so prompts stop growing however long a conversation runs.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_ttl: float = IDLE_TTL,
+                 history_budget: int = HISTORY_TOKEN_BUDGET):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.history_budget = history_budget
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.stats: Dict[str, int] = {"created": 0, "expired": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        # Oldest first, so stop at the first one still in use
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_used <= self.idle_ttl:
+                return
+            del self.sessions[session_id]
+            self.stats["expired"] += 1
+
+    def get(self, session_id: Optional[str] = None, create: bool = True) -> Optional[Session]:
+        """Existing live session, or a new one (with a fresh id) when it is missing or expired"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self.sessions.get(session_id) if session_id else None
+            if session is None:
+                if not create:
+                    return None
+                session = Session(uuid.uuid4().hex)
+                self.sessions[session.session_id] = session
+                self.stats["created"] += 1
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+                    self.stats["evicted"] += 1
+            session.last_used = now
+            self.sessions.move_to_end(session.session_id)
+            return session
+
+    def record(self, session: Session, question: str, answer: str):
+        """Append a finished turn and compact the history"""
+        with self._lock:
+            session.add_turn(question, answer, self.history_budget)
+            session.last_used = time.time()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.time())
+            return {"active": len(self.sessions), "max_sessions": self.max_sessions, "idle_ttl": self.idle_ttl,
+                    "history_budget": self.history_budget, **self.stats}
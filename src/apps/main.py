@@ -1,58 +1,511 @@
+import asyncio
+import json
 import os
+import shutil
 import sys
-import requests
-from fastapi import FastAPI, UploadFile, File
+import time
+from fastapi import FastAPI, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Tuple
 
 # Add src to Python path
 sys.path.append('/app/src')
+from agents.agent import SimpleAgent
+from agents.metrics import RATE_BUCKETS, TOKEN_BUCKETS, MetricsRegistry, RequestTimer, tokens_per_second
+from agents.model_client import ClientDisconnected, cancel_on_disconnect, close_model_clients
+from agents.model_pool import get_model_pool
+from agents.profiler import PROFILE_HEADER, PROFILE_TOKEN, ProfileRequestsMiddleware, SamplingProfiler, track_tasks
+from agents.scheduler import AdmissionController, SchedulerFull
+from agents.response_cache import ResponseCache, cache_key, normalize_question, text_digest
+from agents.sessions import Session, SessionStore
+from ontologies.bulk import BULK_WORKERS, MERGED_SUFFIX, bulk_ingest
+from ontologies.manager import OntologyManager
 from ontologies.ontology_loader import OntologyLoader
+from ontologies.watcher import DEFAULT_POLL_INTERVAL, OntologyWatcher
+from ontologies.json_stream import progress_printer
+from workflows.jobs import WORKFLOW_JOBS_PATH, Job, JobQueue
+from workflows.manager import WorkflowManager
 
 app = FastAPI(title="Simple AI Agent with Ontology")
+# Sampling profiler for requests sent with "X-Profile: $PROFILE_TOKEN"; nothing is installed without a token
+profiler = SamplingProfiler()
+if PROFILE_TOKEN:
+    app.add_middleware(ProfileRequestsMiddleware, profiler=profiler, token=PROFILE_TOKEN, exclude=("/admin/profile",))
 
 MODEL_URL = os.getenv("MODEL_URL", "http://host.docker.internal:11434")
-ontology_loader = OntologyLoader()
+STORAGE_PATH = os.getenv("STORAGE_PATH", "/app/storage")
+UPLOAD_CHUNK_SIZE = 1 << 20
+# Keep-alive connections to every Ollama in MODEL_URLS (or MODEL_URL), routed by load and health
+model_client = get_model_pool()
+# One prompt layout for every chat: system prompt and ontology context form a reusable prefix
+agent = SimpleAgent(client=model_client)
+# Prefill the ontology prefix whenever an ontology is loaded
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+app_loop: Optional[asyncio.AbstractEventLoop] = None
+# Bounds concurrent model calls (MODEL_MAX_IN_FLIGHT) and queues the rest by priority (MODEL_MAX_QUEUE)
+scheduler = AdmissionController()
+# Answers keyed on ontology content version; RESPONSE_CACHE_PATH adds an on-disk tier
+response_cache = ResponseCache()
+# Conversation history per session_id, compacted to SESSION_HISTORY_TOKENS and expired after SESSION_IDLE_TTL
+session_store = SessionStore()
+# Background workflow runs on WORKFLOW_WORKERS threads; finished jobs survive restarts in the job store
+workflow_manager = WorkflowManager(JobQueue(path=WORKFLOW_JOBS_PATH or os.path.join(STORAGE_PATH, "workflow_jobs.sqlite")))
+
+def on_ontology_published(state):
+    """Drop cached answers for other versions of a freshly loaded ontology and warm the model for it"""
+    response_cache.invalidate(state.path, state.content_version)
+    # Loads run in request handlers and in the watcher thread; the warm-up always runs on the app loop
+    if MODEL_WARMUP and app_loop is not None:
+        asyncio.run_coroutine_threadsafe(warm_ontology(state), app_loop)
+
+async def warm_ontology(state):
+    """Prefill the prompt prefix of a loaded ontology version, once it is resident
+    
+    Only ontologies whose whole context fits the default token budget are
+    warmed: their chats all send that same context, so it is a prefix the
+    model can reuse. Larger ones get a question-specific slice per chat,
+    leaving no shared prefix worth a model call.
+    """
+    for name, loader in ontology_manager.resident():
+        if loader.state is state:
+            retriever = ontology_manager.get_retriever(name)
+            if retriever is None:
+                return
+            retrieved = await asyncio.get_running_loop().run_in_executor(None, retriever.retrieve, "")
+            if retrieved["nodes"] != ["*"]:
+                return
+            async with scheduler.slot("batch"):
+                result = await agent.warm(retrieved["context"])
+            if "error" in result:
+                print(f"Error warming model for {name}: {result['error']}")
+            return
+
+ontology_manager = OntologyManager(on_publish=on_ontology_published)
+
+async def ontology_ready(name: Optional[str]) -> Optional[OntologyLoader]:
+    """The loader for an ontology, loading a cold or evicted one on a worker thread
+    
+    Handlers use the loader returned here rather than calling
+    ``get_loader`` again, which could parse on the event loop if the
+    ontology was evicted in between.
+    """
+    loader = ontology_manager.get_loader(name, load=False)
+    if loader is None:
+        loader = await asyncio.get_running_loop().run_in_executor(None, ontology_manager.get_loader, name)
+    return loader
+
+# Prometheus metrics served on /metrics; stage timings are also returned per request
+metrics = MetricsRegistry()
+chat_requests = metrics.counter("chat_requests_total", "Chat requests by endpoint and outcome",
+                                ["endpoint", "outcome"])
+chat_seconds = metrics.histogram("chat_request_seconds", "Chat request latency", ["endpoint"])
+chat_stage_seconds = metrics.histogram("chat_stage_seconds", "Time spent in each stage of a chat request",
+                                       ["endpoint", "stage"])
+chat_ttft_seconds = metrics.histogram("chat_ttft_seconds", "Time to the first streamed token")
+model_prompt_tokens = metrics.histogram("model_prompt_eval_tokens", "Prompt tokens Ollama evaluated per call",
+                                        buckets=TOKEN_BUCKETS)
+model_output_tokens = metrics.histogram("model_eval_tokens", "Tokens Ollama generated per call",
+                                        buckets=TOKEN_BUCKETS)
+model_prefill_rate = metrics.histogram("model_prefill_tokens_per_second", "Prompt evaluation speed",
+                                       buckets=RATE_BUCKETS)
+model_generation_rate = metrics.histogram("model_generation_tokens_per_second", "Generation speed",
+                                          buckets=RATE_BUCKETS)
+ontology_gauges = {
+    field: metrics.gauge(f"ontology_{field}", description, ["ontology"])
+    for field, description in (
+        ("load_seconds", "Time the resident version took to load"),
+        ("memory_bytes", "Approximate memory held by a resident ontology"),
+        ("index_bytes", "Memory held by its search index"),
+        ("documents", "Documents in its search index"),
+        ("triples", "Triples in its store")
+    )
+}
+model_in_flight = metrics.gauge("model_in_flight", "Model calls running")
+model_queue_depth = metrics.gauge("model_queue_depth", "Chats waiting for a model slot", ["priority"])
+model_backend_healthy = metrics.gauge("model_backend_healthy", "Whether a model backend is up", ["backend"])
+model_backend_outstanding = metrics.gauge("model_backend_outstanding", "Calls in flight per model backend",
+                                          ["backend"])
+cache_entries = metrics.gauge("response_cache_entries", "Answers held in memory by the response cache")
+cache_hit_ratio = metrics.gauge("response_cache_hit_ratio", "Response cache hits over lookups")
+sessions_active = metrics.gauge("sessions_active", "Live conversation sessions")
+
+def collect_metrics():
+    """Copy current ontology, scheduler, backend, cache and session figures into gauges"""
+    for gauge in ontology_gauges.values():
+        gauge.clear()
+    for name, info in ontology_manager.get_stats()["ontologies"].items():
+        if info["resident"]:
+            for field, gauge in ontology_gauges.items():
+                gauge.set(info.get(field, 0), ontology=name)
+    model_in_flight.set(scheduler.in_flight)
+    for priority, depth in scheduler.queue_depth().items():
+        model_queue_depth.set(depth, priority=priority)
+    for backend in model_client.get_stats()["backends"]:
+        model_backend_healthy.set(backend["healthy"], backend=backend["url"])
+        model_backend_outstanding.set(backend["outstanding"], backend=backend["url"])
+    cache = response_cache.get_stats()
+    cache_entries.set(cache["entries"])
+    cache_hit_ratio.set(cache["hit_ratio"])
+    sessions_active.set(session_store.get_stats()["active"])
+
+metrics.on_collect(collect_metrics)
+# Storage ontologies are registered up front and only loaded when first used
+ontology_manager.discover(STORAGE_PATH)
+# Hot reload of changed storage files, enabled by ONTOLOGY_WATCH_INTERVAL (seconds)
+ontology_watcher = OntologyWatcher(ontology_manager, STORAGE_PATH, DEFAULT_POLL_INTERVAL)
+
+@app.on_event("startup")
+async def start_ontology_watcher():
+    global app_loop
+    app_loop = asyncio.get_running_loop()
+    if PROFILE_TOKEN:
+        track_tasks(app_loop)
+    if ontology_watcher.interval > 0:
+        ontology_watcher.start()
+    model_client.start()
+
+@app.on_event("shutdown")
+async def stop_ontology_watcher():
+    ontology_watcher.stop()
+    workflow_manager.jobs.stop()
+    model_client.stop()
+    await close_model_clients()
 
 class ChatRequest(BaseModel):
     message: str
+    token_budget: Optional[int] = None
+    ontology: Optional[str] = None
+    priority: str = "interactive"
+    # "new" (or an unknown or expired id) starts a session; omit for a one-off question
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
+    context_nodes: Optional[List[str]] = None
+    session_id: Optional[str] = None
+
+class QueryRequest(BaseModel):
+    message: str
+    limit: int = 10
+    offset: int = 0
+    filters: Optional[Dict[str, Any]] = None
+    path_prefix: Optional[str] = None
+    ontology: Optional[str] = None
+
+class ProfileRequest(BaseModel):
+    seconds: float = 10
+    label: str = "window"
+    idle: bool = False
+
+class BulkLoadRequest(BaseModel):
+    # Directory or glob pattern of shards, relative to storage
+    source: str
+    # Merged ontology is stored as "<name>.merged.json", by default "<source>.merged.json"; when set it also
+    # replaces the ontology's declared name, which otherwise comes from the first shard
+    name: Optional[str] = None
+    workers: int = BULK_WORKERS
+    activate: bool = True
+
+class WorkflowJobRequest(BaseModel):
+    inputs: Dict[str, Any] = {}
+
+class GraphQueryRequest(BaseModel):
+    operation: str
+    entity: str
+    transitive: bool = True
+    hops: int = 1
+    relation: Optional[str] = None
+    direction: str = "out"
+    type: Optional[str] = None
+    limit: int = 100
+    offset: int = 0
+    ontology: Optional[str] = None
+
+def response_cache_key(loader: Optional[OntologyLoader], kind: str, question: str,
+                       **parts: Any) -> Optional[Tuple[str, str, str]]:
+    """(key, namespace, version) for a request, or None when no ontology is loaded"""
+    if loader is None:
+        return None
+    state = loader.state
+    key = cache_key(state.path, state.content_version, kind, question=normalize_question(question), **parts)
+    return key, state.path, state.content_version
+
+def chat_cache_key(loader: Optional[OntologyLoader], request: ChatRequest,
+                   session: Optional[Session] = None) -> Optional[Tuple[str, str, str]]:
+    # An answer depends on the conversation so far; a session's first question shares one-off answers
+    history = session.messages() if session is not None else []
+    return response_cache_key(loader, "chat", request.message, model=model_client.model_name,
+                              prompt=text_digest(agent.system_prompt), token_budget=request.token_budget,
+                              history=text_digest(json.dumps(history)) if history else None)
+
+def build_chat_messages(request: ChatRequest, timer: RequestTimer,
+                        session: Optional[Session] = None) -> Dict[str, Any]:
+    """Chat messages for a request plus the ontology nodes its context was drawn from"""
+    # Get the part of the ontology relevant to the question; follow-ups also search with the previous one
+    with timer.stage("context"):
+        retriever = ontology_manager.get_retriever(request.ontology)
+        query = request.message
+        if session is not None and session.turns:
+            query = f"{session.last_question()} {request.message}"
+        if retriever is not None:
+            retrieved = retriever.retrieve(query, token_budget=request.token_budget)
+        else:
+            retrieved = {"context": "No ontology loaded.", "nodes": []}
+    
+    # Prepare the messages with the ontology context ahead of the conversation so far and the question
+    with timer.stage("prompt"):
+        history = session.messages() if session is not None else None
+        messages = agent.build_messages(request.message, retrieved["context"], history)
+    return {"messages": messages, "nodes": retrieved["nodes"]}
+
+async def prepare_chat(request: ChatRequest, timer: RequestTimer,
+                       session: Optional[Session] = None) -> Dict[str, Any]:
+    """build_chat_messages on a worker thread, so ranking and rendering the context never block the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, build_chat_messages, request, timer, session)
+
+def chat_session(request: ChatRequest) -> Optional[Session]:
+    """The request's session, started afresh when unknown or expired, or None for a one-off question"""
+    if request.session_id is None:
+        return None
+    return session_store.get(request.session_id)
+
+def record_model_result(result: Dict[str, Any]):
+    """Prompt size, output size and token rates Ollama reported for one call"""
+    if result.get("prompt_eval_count") is not None:
+        model_prompt_tokens.observe(result["prompt_eval_count"])
+    if result.get("eval_count") is not None:
+        model_output_tokens.observe(result["eval_count"])
+    prefill_rate = tokens_per_second(result.get("prompt_eval_count"), result.get("prompt_eval_duration"))
+    if prefill_rate is not None:
+        model_prefill_rate.observe(prefill_rate)
+    generation_rate = tokens_per_second(result.get("eval_count"), result.get("eval_duration"))
+    if generation_rate is not None:
+        model_generation_rate.observe(generation_rate)
+
+def record_request(endpoint: str, outcome: str, timer: RequestTimer):
+    chat_requests.inc(endpoint=endpoint, outcome=outcome)
+    chat_seconds.observe(timer.elapsed(), endpoint=endpoint)
+    for stage, seconds in timer.stages.items():
+        chat_stage_seconds.observe(seconds, endpoint=endpoint, stage=stage)
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Chat endpoint that uses ontology context with Qwen3"""
+async def chat(request: ChatRequest, http_request: Request, response: Response):
+    """Chat endpoint that uses ontology context with Qwen3
+    
+    The ``Server-Timing`` header breaks the request down into cache
+    lookup, context retrieval, prompt assembly, queueing, the model call
+    and, within it, Ollama's load, prefill and generation times.
+    """
+    timer = RequestTimer()
+    outcome = "error"
     try:
-        # Get ontology context
-        ontology_context = ontology_loader.get_ontology_context()
+        with timer.stage("ontology"):
+            loader = await ontology_ready(request.ontology)
+        with timer.stage("cache"):
+            session = chat_session(request)
+            session_id = session.session_id if session is not None else None
+            cached = chat_cache_key(loader, request, session)
+            hit = response_cache.get(cached[0]) if cached is not None else None
+        if hit is not None:
+            if session is not None:
+                session_store.record(session, request.message, hit["response"])
+            outcome = "cached"
+            return ChatResponse(**hit, session_id=session_id)
         
-        # Prepare the message with ontology context
-        full_message = f"""Context: {ontology_context}
-
-User Question: {request.message}
-
-Please answer the user's question using the provided ontology context when relevant."""
+        prepared = await prepare_chat(request, timer, session)
+        result: Dict[str, Any] = {}
         
-        # Call Ollama API
-        response = requests.post(
-            f"{MODEL_URL}/api/chat",
-            json={
-                "model": "qwen2.5-coder:7b",
-                "messages": [{"role": "user", "content": full_message}],
-                "stream": False
-            },
-            timeout=30
-        )
+        async def generate():
+            queued = time.perf_counter()
+            async with scheduler.slot(request.priority):
+                timer.add("queue", time.perf_counter() - queued)
+                with timer.stage("model"):
+                    return await model_client.chat(prepared["messages"], stats=result)
         
-        if response.status_code == 200:
-            result = response.json()
-            ai_response = result["message"]["content"]
-            return ChatResponse(response=ai_response)
-        else:
-            return ChatResponse(response=f"Error: {response.status_code} - {response.text}")
+        # Call Ollama API without blocking the event loop; abandoned requests leave the queue or stop generating
+        ai_response = await cancel_on_disconnect(generate(), http_request.is_disconnected)
+        timer.add_model_result(result)
+        record_model_result(result)
+        if cached is not None:
+            response_cache.put(cached[0], {"response": ai_response, "context_nodes": prepared["nodes"]},
+                               namespace=cached[1], version=cached[2])
+        if session is not None:
+            session_store.record(session, request.message, ai_response)
+        outcome = "ok"
+        return ChatResponse(response=ai_response, context_nodes=prepared["nodes"], session_id=session_id)
             
+    except SchedulerFull as e:
+        outcome = "rejected"
+        return saturated_response(e)
+    except ClientDisconnected as e:
+        outcome = "disconnected"
+        return ChatResponse(response=f"Error: {str(e)}")
     except Exception as e:
         return ChatResponse(response=f"Error: {str(e)}")
+    finally:
+        response.headers["Server-Timing"] = timer.server_timing()
+        record_request("chat", outcome, timer)
+
+def saturated_response(error: SchedulerFull) -> JSONResponse:
+    """429 telling the client when to retry"""
+    return JSONResponse(
+        status_code=429,
+        content={"response": f"Error: {error}", "retry_after": error.retry_after},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+async def answer_question(request: ChatRequest) -> Dict[str, Any]:
+    """One cached or model-generated answer, queued at the request's priority, for background workflows"""
+    timer = RequestTimer()
+    loader = await ontology_ready(request.ontology)
+    cached = chat_cache_key(loader, request)
+    hit = response_cache.get(cached[0]) if cached is not None else None
+    if hit is not None:
+        return {"question": request.message, **hit}
+    prepared = await prepare_chat(request, timer)
+    result: Dict[str, Any] = {}
+    async with scheduler.slot(request.priority):
+        answer = await model_client.chat(prepared["messages"], stats=result)
+    record_model_result(result)
+    if cached is not None:
+        response_cache.put(cached[0], {"response": answer, "context_nodes": prepared["nodes"]},
+                           namespace=cached[1], version=cached[2])
+    return {"question": request.message, "response": answer, "context_nodes": prepared["nodes"]}
+
+def answer_questions(inputs: Dict[str, Any], job: Optional[Job] = None) -> Dict[str, Any]:
+    """Answer a list of questions against an ontology, one model call at a time at batch priority
+    
+    Runs on a workflow worker thread; the model calls run on the app loop
+    so they share its admission control, and interactive chats go first.
+    """
+    questions = [str(question) for question in inputs.get("questions") or []]
+    answers = []
+    for index, question in enumerate(questions):
+        request = ChatRequest(message=question, ontology=inputs.get("ontology"),
+                              token_budget=inputs.get("token_budget"), priority="batch")
+        while True:
+            if job is not None:
+                job.check()
+            future = asyncio.run_coroutine_threadsafe(answer_question(request), app_loop)
+            try:
+                while True:
+                    try:
+                        answers.append(future.result(timeout=0.5))
+                        break
+                    except TimeoutError:
+                        if job is not None and job.cancelled:
+                            # Stops the model call, or takes the request out of the queue
+                            future.cancel()
+                            job.check()
+                break
+            except SchedulerFull as e:
+                time.sleep(e.retry_after)
+        if job is not None:
+            job.report((index + 1) / len(questions), f"Answered {index + 1} of {len(questions)} questions")
+    return {"answers": answers}
+
+workflow_manager.register_workflow("answer_questions", {
+    "name": "answer_questions",
+    "description": "Answer a list of questions from the ontology",
+    "inputs": {"questions": "list of questions", "ontology": "optional ontology name",
+               "token_budget": "optional context token budget"}
+}, answer_questions)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Chat endpoint that relays the model's tokens as NDJSON lines while they are generated
+    
+    The first line lists the context nodes and the session id, then one
+    ``token`` line per chunk, and a final ``done`` line with time-to-first-token and total
+    time in milliseconds (or an ``error`` line). Cached answers arrive as a
+    single token line and are flagged ``cached`` in the ``done`` line. A
+    saturated backend is reported with 429 before anything is streamed.
+    The ``done`` line also carries the per-stage ``timings``, since the
+    ``Server-Timing`` header is sent before most stages have run.
+    """
+    timer = RequestTimer()
+    try:
+        with timer.stage("ontology"):
+            loader = await ontology_ready(request.ontology)
+        with timer.stage("cache"):
+            session = chat_session(request)
+            session_id = session.session_id if session is not None else None
+            cached = chat_cache_key(loader, request, session)
+            hit = response_cache.get(cached[0]) if cached is not None else None
+        if hit is None:
+            scheduler.check(request.priority)
+    except SchedulerFull as e:
+        record_request("chat_stream", "rejected", timer)
+        return saturated_response(e)
+    except Exception as e:
+        record_request("chat_stream", "error", timer)
+        return JSONResponse(status_code=400, content={"error": f"Error: {str(e)}"})
+    
+    async def events():
+        first_token = None
+        chunk: Dict[str, Any] = {}
+        parts: List[str] = []
+        # Stays so if the client goes away and the generator is closed mid-stream
+        outcome = "disconnected"
+        try:
+            if hit is not None:
+                yield json.dumps({"type": "context", "context_nodes": hit["context_nodes"],
+                                  "session_id": session_id}) + "\n"
+                first_token = time.perf_counter()
+                parts.append(hit["response"])
+                yield json.dumps({"type": "token", "content": hit["response"]}) + "\n"
+                chunk = {"done": True}
+            else:
+                prepared = await prepare_chat(request, timer, session)
+                yield json.dumps({"type": "context", "context_nodes": prepared["nodes"],
+                                  "session_id": session_id}) + "\n"
+                # The stream is closed when the client disconnects, which frees the slot and cancels the generation
+                queued = time.perf_counter()
+                async with scheduler.slot(request.priority):
+                    timer.add("queue", time.perf_counter() - queued)
+                    with timer.stage("model"):
+                        async for chunk in model_client.chat_stream(prepared["messages"]):
+                            content = chunk.get("message", {}).get("content")
+                            if content:
+                                if first_token is None:
+                                    first_token = time.perf_counter()
+                                parts.append(content)
+                                yield json.dumps({"type": "token", "content": content}) + "\n"
+                            if chunk.get("done"):
+                                break
+                if chunk.get("done"):
+                    timer.add_model_result(chunk)
+                    record_model_result(chunk)
+                # Only complete answers are cached
+                if cached is not None and chunk.get("done"):
+                    response_cache.put(cached[0], {"response": "".join(parts), "context_nodes": prepared["nodes"]},
+                                       namespace=cached[1], version=cached[2])
+            # An interrupted answer is left out of the conversation
+            if session is not None and chunk.get("done"):
+                session_store.record(session, request.message, "".join(parts))
+            outcome = "cached" if hit is not None else "ok"
+            if first_token is not None:
+                chat_ttft_seconds.observe(first_token - timer.started)
+        except Exception as e:
+            outcome = "error"
+            yield json.dumps({"type": "error", "error": f"Error: {str(e)}"}) + "\n"
+            return
+        finally:
+            record_request("chat_stream", outcome, timer)
+        yield json.dumps({
+            "type": "done",
+            "ttft_ms": round((first_token - timer.started) * 1000, 1) if first_token is not None else None,
+            "total_ms": round(timer.elapsed() * 1000, 1),
+            "eval_count": chunk.get("eval_count"),
+            "prompt_eval_count": chunk.get("prompt_eval_count"),
+            "prefill_saved_ms": chunk.get("prefill_saved_ms"),
+            "timings": timer.milliseconds(),
+            "cached": hit is not None
+        }) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson",
+                             headers={"Server-Timing": timer.server_timing()})
 
 @app.post("/load-ontology")
 async def load_ontology(file: UploadFile = File(...)):
@@ -61,11 +514,14 @@ async def load_ontology(file: UploadFile = File(...)):
         # Save uploaded file temporarily
         file_path = f"/tmp/{file.filename}"
         with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+            shutil.copyfileobj(file.file, buffer, UPLOAD_CHUNK_SIZE)
         
-        # Load ontology
-        success = ontology_loader.load_ontology(file_path)
+        # Load ontology on a worker thread; parsing a large file would otherwise stall every other request
+        success = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: ontology_manager.load_ontology(file.filename, file_path,
+                                                         progress=progress_printer(file.filename)))
+        if success:
+            ontology_manager.set_active_ontology(file.filename)
         
         if success:
             return {"message": f"Ontology loaded successfully from {file.filename}"}
@@ -76,30 +532,116 @@ async def load_ontology(file: UploadFile = File(...)):
         return {"error": f"Error loading ontology: {str(e)}"}
 
 @app.get("/ontology-context")
-async def get_ontology_context():
+async def get_ontology_context(ontology: Optional[str] = None):
     """Get current ontology context"""
-    return {"context": ontology_loader.get_ontology_context()}
+    loader = await ontology_ready(ontology)
+    if loader is None:
+        return {"context": "No ontology loaded."}
+    return {"context": loader.get_ontology_context()}
 
 @app.get("/ontologies")
 async def list_ontologies():
     """List available ontologies in storage"""
-    import os
-        storage_path = "/app/storage"
-    ontologies = []
-    
-    if os.path.exists(storage_path):
-        for file in os.listdir(storage_path):
-            if file.endswith(('.json', '.ttl', '.rdf', '.owl')):
-                ontologies.append(file)
-    
-    return {"ontologies": ontologies}
+    ontologies = ontology_manager.discover(STORAGE_PATH)
+    return {"ontologies": ontologies, "active": ontology_manager.active_ontology}
+
+@app.get("/ontology-stats")
+async def ontology_stats():
+    """Memory use and cache hit/miss counters of the ontology registry"""
+    return ontology_manager.get_stats()
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """Hit ratio, sizes and eviction counters of the response cache"""
+    return response_cache.get_stats()
+
+@app.get("/model-stats")
+async def model_stats():
+    """Model settings, prefill time saved by prompt prefix reuse, and scheduler queue metrics"""
+    return {**model_client.get_stats(), "scheduler": scheduler.get_stats()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request, stage, token and resource metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/profile")
+async def profile_traffic(request: ProfileRequest, http_request: Request):
+    """Sample all threads for a number of seconds and write their collapsed stacks to PROFILE_DIR"""
+    if not PROFILE_TOKEN:
+        return JSONResponse(status_code=404, content={"error": "Profiling is disabled; set PROFILE_TOKEN"})
+    if http_request.headers.get(PROFILE_HEADER) != PROFILE_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "Missing or wrong X-Profile token"})
+    return await profiler.profile_window(request.seconds, request.label, request.idle)
+
+@app.get("/sessions")
+async def session_stats():
+    """Active conversation sessions and their limits"""
+    return session_store.get_stats()
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Recent turns and the summary of older ones kept for a session"""
+    session = session_store.get(session_id, create=False)
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": f"Session not found: {session_id}"})
+    return session.to_dict()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation"""
+    if session_store.delete(session_id):
+        return {"message": f"Session deleted: {session_id}"}
+    return JSONResponse(status_code=404, content={"error": f"Session not found: {session_id}"})
+
+@app.get("/workflows")
+async def list_workflows():
+    """Registered workflows and the state of the job queue"""
+    return {"workflows": {name: workflow_manager.get_workflow(name) for name in workflow_manager.list_workflows()},
+            "jobs": workflow_manager.jobs.get_stats()}
+
+@app.post("/workflows/{name}/jobs", status_code=202)
+async def submit_workflow_job(name: str, request: WorkflowJobRequest):
+    """Queue a workflow run and return its job id at once; poll /jobs/{job_id} for progress and result"""
+    submitted = workflow_manager.submit_workflow(name, request.inputs)
+    if submitted.get("queue_full"):
+        return JSONResponse(status_code=429, content={"error": submitted["error"]}, headers={"Retry-After": "5"})
+    if "error" in submitted:
+        return JSONResponse(status_code=404, content=submitted)
+    return {**submitted, "poll": f"/jobs/{submitted['job_id']}"}
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, workflow: Optional[str] = None, limit: int = 100):
+    """Recent workflow jobs, newest first"""
+    return {"jobs": workflow_manager.list_jobs(status, workflow, limit)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a workflow job, with its result once it has succeeded"""
+    job = workflow_manager.get_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job not found: {job_id}"})
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = workflow_manager.cancel_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job not found: {job_id}"})
+    return job
 
 @app.post("/load-ontology-from-storage")
 async def load_ontology_from_storage(request: ChatRequest):
     """Load an ontology from storage by filename"""
     try:
-            file_path = f"/app/storage/{request.message}"
-        success = ontology_loader.load_ontology(file_path)
+        file_path = os.path.join(STORAGE_PATH, request.message)
+        ontology_manager.register_ontology(request.message, file_path)
+        loader = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: ontology_manager.get_loader(request.message, progress=progress_printer(request.message)))
+        success = loader is not None
+        if success:
+            ontology_manager.set_active_ontology(request.message)
         
         if success:
             return {"message": f"Ontology loaded successfully from storage: {request.message}"}
@@ -109,24 +651,107 @@ async def load_ontology_from_storage(request: ChatRequest):
     except Exception as e:
         return {"error": f"Error loading ontology: {str(e)}"}
 
+def merged_name(request: BulkLoadRequest) -> str:
+    if request.name:
+        stem = os.path.basename(request.name)
+        for suffix in (MERGED_SUFFIX, '.json'):
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+                break
+        return stem + MERGED_SUFFIX
+    slug = "".join(c if c.isalnum() or c in "-_." else "_" for c in request.source.strip("/")).strip("_")
+    return f"{slug or 'storage'}{MERGED_SUFFIX}"
+
+@app.post("/load-ontologies-bulk")
+async def load_ontologies_bulk(request: BulkLoadRequest):
+    """Parse a directory or glob of shards in parallel processes and load them merged as one ontology"""
+    name = merged_name(request)
+    output = os.path.join(STORAGE_PATH, name)
+    loop = asyncio.get_running_loop()
+    try:
+        # Parsing, merging and indexing take minutes for large shard sets; keep them off the event loop
+        data, stats = await loop.run_in_executor(
+            None, lambda: bulk_ingest(STORAGE_PATH, request.source, output, request.workers, request.name))
+        if data is None:
+            return {"error": f"No shards could be loaded from {request.source}", "stats": stats}
+        started = time.perf_counter()
+        success = await loop.run_in_executor(None, ontology_manager.load_ontology_data, name, output, data)
+        stats["index_seconds"] = round(time.perf_counter() - started, 3)
+        if not success:
+            return {"error": f"Failed to index merged ontology: {name}", "stats": stats}
+        if request.activate:
+            ontology_manager.set_active_ontology(name)
+        return {"message": f"Merged {stats['shards'] - stats['failed']} shards into {name}", "ontology": name,
+                "stats": stats}
+    except Exception as e:
+        return {"error": f"Error loading ontologies: {str(e)}"}
+
 @app.post("/query-ontology")
-async def query_ontology(request: ChatRequest):
+async def query_ontology(request: QueryRequest):
     """Query the loaded ontology"""
-    result = ontology_loader.query_ontology(request.message)
-    return {"result": result}
+    options = {
+        "limit": request.limit,
+        "offset": request.offset,
+        "filters": request.filters,
+        "path_prefix": request.path_prefix
+    }
+    loader = await ontology_ready(request.ontology)
+    if loader is None:
+        return {"result": "No ontology loaded to query.", "total": 0, "results": []}
+    cached = response_cache_key(loader, "query", request.message, **options)
+    hit = response_cache.get(cached[0])
+    if hit is not None:
+        return hit
+    found = loader.search(request.message, **options)
+    answer = {"result": loader.format_search(found), "total": found["total"], "results": found["results"]}
+    response_cache.put(cached[0], answer, namespace=cached[1], version=cached[2])
+    return answer
+
+@app.post("/graph-query")
+async def graph_query(request: GraphQueryRequest):
+    """Structured subclass, instance and neighbour queries over the class hierarchy and relationships"""
+    return await asyncio.get_running_loop().run_in_executor(None, run_graph_query, request)
+
+def run_graph_query(request: GraphQueryRequest) -> Dict[str, Any]:
+    """Graph query on a worker thread, as a cold or evicted ontology is parsed first"""
+    loader = ontology_manager.get_loader(request.ontology)
+    if loader is None:
+        return {"error": "No ontology loaded to query."}
+    return loader.graph_query(
+        request.operation,
+        request.entity,
+        transitive=request.transitive,
+        hops=request.hops,
+        relation=request.relation,
+        direction=request.direction,
+        type=request.type,
+        limit=request.limit,
+        offset=request.offset
+    )
 
 @app.get("/")
 async def root():
     return {
         "message": "Simple AI Agent with Ontology Support", 
-        "model_url": MODEL_URL,
+        "model_url": model_client.model_url,
         "endpoints": {
             "chat": "/chat - Chat with AI using ontology context",
+            "chat_stream": "/chat/stream - Chat with AI, streaming tokens as NDJSON",
             "load_ontology": "/load-ontology - Upload and load an ontology file",
             "load_ontology_from_storage": "/load-ontology-from-storage - Load ontology from storage by filename",
+            "load_ontologies_bulk": "/load-ontologies-bulk - Merge a directory or glob of shards in parallel",
             "ontologies": "/ontologies - List available ontologies in storage",
+            "workflows": "/workflows - Registered workflows and job queue stats",
+            "workflow_jobs": "/workflows/{name}/jobs - Run a workflow in the background; poll or cancel /jobs/{job_id}",
+            "ontology_stats": "/ontology-stats - Memory use and hit/miss stats of loaded ontologies",
+            "cache_stats": "/cache-stats - Response cache hit ratio and sizes",
+            "model_stats": "/model-stats - Prefill savings, in-flight model calls and queue wait times",
+            "metrics": "/metrics - Prometheus metrics: stage latencies, token rates, prompt sizes, ontology sizes",
+            "profile": "/admin/profile - Profile all traffic for N seconds (needs PROFILE_TOKEN)",
+            "sessions": "/sessions - Conversation session stats; GET or DELETE /sessions/{id} for one session",
             "ontology_context": "/ontology-context - Get current ontology context",
-            "query_ontology": "/query-ontology - Query the loaded ontology"
+            "query_ontology": "/query-ontology - Query the loaded ontology",
+            "graph_query": "/graph-query - Subclass, instance and k-hop neighbour queries"
         }
     }
 
@@ -69,6 +69,9 @@ def main():
     # Initialize chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    # The server keeps the conversation history; "new" asks it to start one
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = "new"
     
     # Display chat messages
     for message in st.session_state.messages:
@@ -82,28 +85,67 @@ def main():
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Get AI response, rendering tokens as they stream in
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    response = requests.post(
-                        f"{API_URL}/chat",
-                        json={"message": prompt}
-                    )
-                    data = response.json()
-                    ai_response = data.get('response', 'No response received')
+            placeholder = st.empty()
+            try:
+                parts = []
+                stats = {}
+                failure = None
+                with requests.post(
+                    f"{API_URL}/chat/stream",
+                    json={"message": prompt, "session_id": st.session_state.session_id},
+                    stream=True,
+                    timeout=(5, 120)
+                ) as response:
+                    # A saturated server (429) or a rejected request (400) answers with one JSON object, not events
+                    if response.status_code != 200:
+                        try:
+                            body = response.json()
+                        except ValueError:
+                            body = {}
+                        failure = body.get("response") or body.get("error") or \
+                            f"Error: {response.status_code} - {response.text}"
+                        if body.get("retry_after") is not None:
+                            failure += f" (retry in {body['retry_after']} s)"
+                    for line in response.iter_lines() if failure is None else ():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event["type"] == "context":
+                            st.session_state.session_id = event.get("session_id") or st.session_state.session_id
+                        elif event["type"] == "token":
+                            parts.append(event["content"])
+                            placeholder.markdown("".join(parts) + "▌")
+                        elif event["type"] == "error":
+                            parts.append(event["error"])
+                        elif event["type"] == "done":
+                            stats = event
+                if failure is not None:
+                    placeholder.error(failure)
+                    st.session_state.messages.append({"role": "assistant", "content": failure})
+                else:
+                    ai_response = "".join(parts) or "No response received"
                     
-                    st.markdown(ai_response)
+                    placeholder.markdown(ai_response)
+                    if stats.get("ttft_ms") is not None:
+                        st.caption(f"First token in {stats['ttft_ms']:.0f} ms, total {stats['total_ms']:.0f} ms")
                     st.session_state.messages.append({"role": "assistant", "content": ai_response})
-                    
-                except Exception as e:
-                    error_msg = f"Error: {e}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                
+            except Exception as e:
+                error_msg = f"Error: {e}"
+                placeholder.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
     
     # Clear chat button
     if st.button("🗑️ Clear Chat"):
+        if st.session_state.session_id != "new":
+            try:
+                requests.delete(f"{API_URL}/sessions/{st.session_state.session_id}", timeout=5)
+            except Exception:
+                pass
         st.session_state.messages = []
+        st.session_state.session_id = "new"
         st.rerun()
 
 if __name__ == "__main__":
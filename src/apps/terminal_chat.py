@@ -9,6 +9,8 @@ import json
 class TerminalChat:
     def __init__(self, api_url="http://localhost:8000"):
         self.api_url = api_url
+        # The server keeps the conversation; "new" asks it to start one
+        self.session_id = "new"
         self.load_default_ontology()
     
     def load_default_ontology(self):
@@ -30,25 +32,48 @@ class TerminalChat:
         except Exception as e:
             print(f"⚠️  Could not load default ontology: {e}")
     
-    def chat_with_ai(self, message):
-        """Send message to AI and get response"""
+    def chat_with_ai(self, message, on_token=None):
+        """Send message to AI and stream the response
+        
+        ``on_token`` is called with each piece of text as it arrives. Returns
+        the full response and the final stats line (``ttft_ms``, ``total_ms``).
+        """
+        parts = []
+        stats = {}
         try:
-            response = requests.post(
-                f"{self.api_url}/chat",
-                json={"message": message},
-                timeout=30
-            )
+            # Only the gap between chunks is bounded, so long answers never time out
+            with requests.post(
+                f"{self.api_url}/chat/stream",
+                json={"message": message, "session_id": self.session_id},
+                stream=True,
+                timeout=(5, 120)
+            ) as response:
+                if response.status_code != 200:
+                    return f"Error: {response.status_code} - {response.text}", stats
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "context":
+                        self.session_id = event.get("session_id") or self.session_id
+                    elif event["type"] == "token":
+                        parts.append(event["content"])
+                        if on_token:
+                            on_token(event["content"])
+                    elif event["type"] == "error":
+                        parts.append(event["error"])
+                        if on_token:
+                            on_token(event["error"])
+                    elif event["type"] == "done":
+                        stats = event
             
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('response', 'No response received')
-            else:
-                return f"Error: {response.status_code} - {response.text}"
+            return "".join(parts) or "No response received", stats
                 
         except requests.exceptions.ConnectionError:
-            return "❌ Cannot connect to AI agent. Make sure it's running with 'make up'"
+            return "❌ Cannot connect to AI agent. Make sure it's running with 'make up'", stats
         except Exception as e:
-            return f"❌ Error: {str(e)}"
+            return f"❌ Error: {str(e)}", stats
     
     def run(self):
         """Main chat loop"""
@@ -80,13 +105,25 @@ class TerminalChat:
                     self.show_status()
                     continue
                 
+                if user_input.lower() == 'new':
+                    self.new_conversation()
+                    continue
+                
                 if not user_input:
                     continue
                 
-                # Send to AI and get response
+                # Send to AI and print the response as it streams in
                 print("🤖 AI: ", end="", flush=True)
-                response = self.chat_with_ai(user_input)
-                print(response)
+                streamed = []
+                def show(text):
+                    streamed.append(text)
+                    print(text, end="", flush=True)
+                response, stats = self.chat_with_ai(user_input, on_token=show)
+                if not streamed:
+                    print(response, end="")
+                print()
+                if stats.get("ttft_ms") is not None:
+                    print(f"   ⏱️  first token {stats['ttft_ms']:.0f} ms, total {stats['total_ms']:.0f} ms")
                 
             except KeyboardInterrupt:
                 print("\n\n👋 Goodbye!")
@@ -101,9 +138,20 @@ class TerminalChat:
         print("  help     - Show this help message")
         print("  context  - Show current ontology context")
         print("  status   - Check AI agent status")
+        print("  new      - Start a new conversation")
         print("  quit     - Exit the chat")
         print("\n💡 Just type your question to chat with the AI!")
     
+    def new_conversation(self):
+        """Forget the current conversation on the server and start afresh"""
+        if self.session_id != "new":
+            try:
+                requests.delete(f"{self.api_url}/sessions/{self.session_id}", timeout=5)
+            except Exception:
+                pass
+        self.session_id = "new"
+        print("\n🆕 Started a new conversation")
+    
     def show_context(self):
         """Show current ontology context"""
         try:
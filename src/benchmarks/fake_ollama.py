@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama API, for benchmarks without a real model
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import click
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_LATENCY = float(os.getenv("FAKE_OLLAMA_LATENCY", "0.05"))
+DEFAULT_TOKEN_RATE = float(os.getenv("FAKE_OLLAMA_TOKEN_RATE", "50"))
+DEFAULT_PREFILL_RATE = float(os.getenv("FAKE_OLLAMA_PREFILL_RATE", "2000"))
+DEFAULT_TOKENS = int(os.getenv("FAKE_OLLAMA_TOKENS", "32"))
+DEFAULT_MODEL = os.getenv("MODEL_NAME", "qwen2.5-coder:7b")
+CHARS_PER_TOKEN = 4
+WORDS = ("the", "ontology", "lists", "this", "entity", "under", "its", "class", "and", "it", "relates", "to",
+         "another", "instance", "in", "that", "department")
+
+
+class FakeOllama:
+    """Answers like Ollama, with configurable speed
+
+    Every reply waits ``latency`` seconds, then prefills the prompt at
+    ``prefill_rate`` tokens/s and generates ``tokens`` tokens (or the
+    request's ``num_predict``) at ``token_rate`` tokens/s. Like Ollama, the
+    prompt tokens shared with the previous request are not evaluated again,
+    so prompt prefix reuse shows up in ``prompt_eval_count``.
+    """
+
+    def __init__(self, latency: float = DEFAULT_LATENCY, token_rate: float = DEFAULT_TOKEN_RATE,
+                 prefill_rate: float = DEFAULT_PREFILL_RATE, tokens: int = DEFAULT_TOKENS,
+                 model: str = DEFAULT_MODEL):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.prefill_rate = prefill_rate
+        self.tokens = tokens
+        self.model = model
+        self.requests = 0
+        self._last_prompt = ""
+
+    def _prefill(self, messages: List[Dict[str, str]]) -> Dict[str, int]:
+        """Token counts of the prompt and of the part not shared with the previous one"""
+        prompt = "".join(f"{message.get('role')}:{message.get('content', '')}\n" for message in messages)
+        shared = 0
+        for ours, theirs in zip(prompt, self._last_prompt):
+            if ours != theirs:
+                break
+            shared += 1
+        self._last_prompt = prompt
+        total = len(prompt) // CHARS_PER_TOKEN + 1
+        return {"total": total, "evaluated": max(total - shared // CHARS_PER_TOKEN, 1)}
+
+    def _words(self, count: int) -> List[str]:
+        return [(" " if index else "") + WORDS[index % len(WORDS)] for index in range(count)]
+
+    def _stats(self, started: float, evaluated: int, prefill_s: float, count: int, eval_s: float) -> Dict[str, Any]:
+        return {
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(prefill_s * 1e9),
+            "eval_count": count,
+            "eval_duration": int(eval_s * 1e9)
+        }
+
+    async def chat(self, body: Dict[str, Any]):
+        started = time.perf_counter()
+        self.requests += 1
+        options = body.get("options") or {}
+        count = max(int(options.get("num_predict", self.tokens)), 0)
+        prompt = self._prefill(body.get("messages") or [])
+        prefill_s = prompt["evaluated"] / self.prefill_rate if self.prefill_rate > 0 else 0.0
+        token_s = 1 / self.token_rate if self.token_rate > 0 else 0.0
+        model = body.get("model") or self.model
+        await asyncio.sleep(self.latency + prefill_s)
+        words = self._words(count)
+
+        if not body.get("stream", True):
+            await asyncio.sleep(token_s * count)
+            return JSONResponse({
+                "model": model,
+                "message": {"role": "assistant", "content": "".join(words)},
+                "done": True,
+                **self._stats(started, prompt["evaluated"], prefill_s, count, token_s * count)
+            })
+
+        async def chunks():
+            generated = time.perf_counter()
+            for word in words:
+                await asyncio.sleep(token_s)
+                yield json.dumps({"model": model, "message": {"role": "assistant", "content": word},
+                                  "done": False}) + "\n"
+            yield json.dumps({
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                **self._stats(started, prompt["evaluated"], prefill_s, count, time.perf_counter() - generated)
+            }) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+def create_app(fake: Optional[FakeOllama] = None) -> FastAPI:
+    fake = fake or FakeOllama()
+    app = FastAPI(title="Fake Ollama")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        # Ollama streams unless told otherwise
+        return await fake.chat(await request.json())
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": fake.model, "model": fake.model}]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": fake.requests, "latency": fake.latency, "token_rate": fake.token_rate,
+                "prefill_rate": fake.prefill_rate, "tokens": fake.tokens}
+
+    return app
+
+
+@click.command()
+@click.option('--host', default='0.0.0.0', help='Interface to listen on')
+@click.option('--port', default=11434, help='Port to listen on (Ollama uses 11434)')
+@click.option('--latency', default=DEFAULT_LATENCY, help='Seconds before prefill starts')
+@click.option('--token-rate', default=DEFAULT_TOKEN_RATE, help='Generated tokens per second')
+@click.option('--prefill-rate', default=DEFAULT_PREFILL_RATE, help='Prompt tokens evaluated per second')
+@click.option('--tokens', default=DEFAULT_TOKENS, help='Tokens per reply')
+def main(host, port, latency, token_rate, prefill_rate, tokens):
+    """Serve /api/chat and /api/tags like Ollama"""
+    import uvicorn
+    fake = FakeOllama(latency=latency, token_rate=token_rate, prefill_rate=prefill_rate, tokens=tokens)
+    uvicorn.run(create_app(fake), host=host, port=port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Synthetic ontologies in the shape of storage/example_ontology.json
+"""
+
+import json
+import os
+import random
+from typing import Dict, Iterator, Tuple
+
+import click
+
+BASE_CLASSES = {
+    "Person": {"description": "A human being", "properties": ["name", "email", "department", "role"],
+               "subclasses": ["Employee"]},
+    "Employee": {"description": "A person who works for the company",
+                 "properties": ["employee_id", "salary", "start_date"], "parent": "Person",
+                 "subclasses": ["Manager"]},
+    "Manager": {"description": "An employee who manages other employees",
+                "properties": ["team_size", "direct_reports"], "parent": "Employee"},
+    "Department": {"description": "An organizational unit within the company",
+                   "properties": ["name", "budget", "head_count"], "subclasses": []},
+    "Project": {"description": "A work initiative with specific goals",
+                "properties": ["name", "description", "start_date", "end_date", "status"],
+                "relationships": {"managed_by": "Manager", "belongs_to": "Department"}}
+}
+RELATIONSHIPS = {
+    "works_in": {"description": "A person works in a department", "domain": "Person", "range": "Department"},
+    "manages": {"description": "A manager manages a project", "domain": "Manager", "range": "Project"}
+}
+FIRST_NAMES = ("Ada", "Alan", "Grace", "Linus", "Barbara", "Edsger", "Donald", "Frances", "Ken", "Margaret")
+LAST_NAMES = ("Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Dijkstra", "Knuth", "Allen", "Thompson")
+AREAS = ("Engineering", "Marketing", "Sales", "Research", "Finance", "Support", "Operations", "Legal")
+STATUSES = ("active", "planned", "completed", "on_hold")
+
+
+def plan(nodes: int) -> Dict[str, int]:
+    """How many of each entity kind make up an ontology of ``nodes`` classes and instances"""
+    nodes = max(nodes, 20)
+    departments = max(nodes // 100, 1)
+    department_classes = max(departments // 10, 1)
+    managers = max(nodes // 10, 1)
+    projects = max(nodes // 20, 1)
+    return {
+        "classes": len(BASE_CLASSES) + department_classes,
+        "department_classes": department_classes,
+        "departments": departments,
+        "managers": managers,
+        "projects": projects,
+        "employees": nodes - len(BASE_CLASSES) - department_classes - departments - managers - projects
+    }
+
+
+def department_class(index: int) -> str:
+    return f"{AREAS[index % len(AREAS)]}{index}"
+
+
+def classes(counts: Dict[str, int]) -> Dict[str, Dict]:
+    generated = json.loads(json.dumps(BASE_CLASSES))
+    for index in range(counts["department_classes"]):
+        name = department_class(index)
+        generated["Department"]["subclasses"].append(name)
+        generated[name] = {"description": f"{AREAS[index % len(AREAS)]} unit {index}",
+                           "properties": ["name", "budget"], "parent": "Department"}
+    return generated
+
+
+def instances(counts: Dict[str, int], rng: random.Random) -> Iterator[Tuple[str, Dict]]:
+    """Instances in dependency order, referring to each other by key like the example"""
+    for index in range(counts["departments"]):
+        yield f"dept_{index}", {
+            "type": department_class(index % counts["department_classes"]),
+            "name": f"{AREAS[index % len(AREAS)]} {index}",
+            "budget": rng.randrange(100_000, 10_000_000, 1000),
+            "head_count": rng.randrange(5, 500)
+        }
+    people = (("manager", "Manager", counts["managers"]), ("employee", "Employee", counts["employees"]))
+    for prefix, kind, count in people:
+        for index in range(count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            person = {
+                "type": kind,
+                "name": f"{first} {last}",
+                "email": f"{first.lower()}.{last.lower()}{index}@company.com",
+                "department": f"dept_{rng.randrange(counts['departments'])}",
+                "employee_id": f"{prefix[:3].upper()}{index:07d}"
+            }
+            if kind == "Manager":
+                person["team_size"] = rng.randrange(2, 15)
+            yield f"{prefix}_{index}", person
+    for index in range(counts["projects"]):
+        yield f"project_{index}", {
+            "type": "Project",
+            "name": f"Project {index}",
+            "description": f"Initiative {index} of the {rng.choice(AREAS).lower()} group",
+            "status": rng.choice(STATUSES),
+            "managed_by": f"manager_{rng.randrange(counts['managers'])}",
+            "belongs_to": f"dept_{rng.randrange(counts['departments'])}"
+        }
+
+
+def generate(path: str, nodes: int, seed: int = 0) -> Dict[str, int]:
+    """Write an ontology of ``nodes`` classes and instances to ``path``; returns the entity counts
+
+    Instances are written one at a time, so even 10^7-node files are
+    generated in constant memory.
+    """
+    rng = random.Random(seed)
+    counts = plan(nodes)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        header = {"name": f"Synthetic ontology ({nodes} nodes)", "version": "1.0",
+                  "description": f"Generated with seed {seed}"}
+        file.write('{"ontology": ' + json.dumps(header)[:-1])
+        file.write(', "classes": ' + json.dumps(classes(counts)))
+        file.write(', "instances": {')
+        for position, (key, instance) in enumerate(instances(counts, rng)):
+            file.write((", " if position else "") + json.dumps(key) + ": " + json.dumps(instance))
+        file.write('}, "relationships": ' + json.dumps(RELATIONSHIPS) + "}}\n")
+    return counts
+
+
+@click.command()
+@click.option('--nodes', '-n', multiple=True, type=int, default=[1000],
+              help='Number of classes and instances (repeatable)')
+@click.option('--output-dir', default='storage', help='Directory to write bench_<nodes>.json files to')
+@click.option('--seed', default=0, help='Random seed, so runs are comparable')
+def main(nodes, output_dir, seed):
+    """Generate synthetic ontologies for benchmarks"""
+    for count in nodes:
+        path = os.path.join(output_dir, f"bench_{count}.json")
+        counts = generate(path, count, seed)
+        click.echo(f"✅ {path}: {count} entities ({counts['classes']} classes), {os.path.getsize(path)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Load-test benchmarks for the agent API and the ontology loader
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ontologies.ontology_loader import OntologyLoader
+
+SCENARIOS = ("chat", "query", "load")
+# Relative slack before a change counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles (milliseconds) of one scenario"""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(ordered) / seconds, 2) if seconds > 0 else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 0.5), 1),
+        "p90_ms": round(1000 * percentile(ordered, 0.9), 1),
+        "p99_ms": round(1000 * percentile(ordered, 0.99), 1),
+        "max_ms": round(1000 * ordered[-1], 1) if ordered else 0.0
+    }
+
+
+async def drive(url: str, path: str, payload: Callable[[int], Dict[str, Any]], requests: int,
+                concurrency: int, timeout: float) -> Dict[str, Any]:
+    """POST ``requests`` payloads with at most ``concurrency`` in flight
+
+    A request counts as an error on a non-200 status or an ``Error:``
+    answer, since the API reports model failures in the response body.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal next_index, errors
+            while next_index < requests:
+                index = next_index
+                next_index += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload(index))
+                    answer = str(response.json().get("response", ""))
+                    failed = response.status_code != 200 or answer.startswith("Error")
+                except (httpx.HTTPError, ValueError):
+                    failed = True
+                if failed:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def bench_chat(url: str, requests: int, concurrency: int, ontology: Optional[str], cached: bool,
+               timeout: float) -> Dict[str, Any]:
+    """/chat with a distinct question per request, unless ``cached`` repeats one to measure cache hits
+
+    Questions are tagged with a per-run id so that a rerun is not served
+    from the response cache filled by the previous one.
+    """
+    run = uuid.uuid4().hex[:8]
+
+    def payload(index: int) -> Dict[str, Any]:
+        question = "Who manages project_0?" if cached else f"Who manages project_{index}? (run {run})"
+        return {"message": question, "ontology": ontology}
+    return asyncio.run(drive(url, "/chat", payload, requests, concurrency, timeout))
+
+
+def bench_query(url: str, requests: int, concurrency: int, ontology: Optional[str],
+                timeout: float) -> Dict[str, Any]:
+    """/query-ontology over a rotating set of searches, each distinct so none is a cache hit"""
+    queries = ("manager", "engineering department", "project status active", "employee email", "budget")
+    run = uuid.uuid4().hex[:8]
+
+    def payload(index: int) -> Dict[str, Any]:
+        return {"message": f"{queries[index % len(queries)]} {index} {run}", "ontology": ontology}
+    return asyncio.run(drive(url, "/query-ontology", payload, requests, concurrency, timeout))
+
+
+def bench_load(path: str, repeat: int) -> Dict[str, Any]:
+    """Parse a file from scratch, then map its snapshot, ``repeat`` times each
+
+    Loads run in this process on a copy next to a temporary snapshot, so
+    the storage directory is left alone and no server is needed.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        copy = os.path.join(directory, os.path.basename(path))
+        os.symlink(os.path.abspath(path), copy)
+        for mode, snapshots in (("parse", False), ("snapshot", True)):
+            if snapshots:
+                # Writes the snapshot the timed loads then map
+                OntologyLoader().load_ontology(copy)
+            latencies = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(repeat):
+                loader = OntologyLoader(snapshots=snapshots)
+                if loader.load_ontology(copy):
+                    latencies.append(loader.state.load_seconds)
+                else:
+                    errors += 1
+            results[mode] = summarize(latencies, errors, time.perf_counter() - started)
+        results["memory_bytes"] = loader.memory_usage()
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            prefix: str = "") -> List[str]:
+    """Regressions against a baseline: slower percentiles or lower throughput beyond the tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            continue
+        if "throughput" not in current:
+            regressions.extend(compare(current, previous, tolerance, f"{prefix}{name}."))
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{prefix}{name}.{metric}: {previous[metric]} -> {current[metric]}")
+        if previous.get("throughput") and current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{prefix}{name}.throughput: {previous['throughput']} -> {current['throughput']}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{prefix}{name}.errors: {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def report(results: Dict[str, Any], prefix: str = ""):
+    for name, result in results.items():
+        if isinstance(result, dict) and "throughput" in result:
+            click.echo(f"{prefix + name:<16} {result['requests']:>7} req {result['errors']:>5} err "
+                       f"{result['throughput']:>9.2f}/s  p50 {result['p50_ms']:>9.1f} ms  "
+                       f"p90 {result['p90_ms']:>9.1f} ms  p99 {result['p99_ms']:>9.1f} ms")
+        elif isinstance(result, dict):
+            report(result, f"{prefix}{name}.")
+        else:
+            click.echo(f"{prefix + name:<16} {result}")
+
+
+@click.command()
+@click.option('--url', default='http://localhost:8000', help='API base URL')
+@click.option('--scenario', '-s', multiple=True, type=click.Choice(SCENARIOS), help='Scenarios to run (default all)')
+@click.option('--requests', '-r', default=200, help='Requests per API scenario')
+@click.option('--concurrency', '-c', default=8, help='Requests in flight at once')
+@click.option('--ontology', default=None, help='Ontology name for API requests (default: the active one)')
+@click.option('--ontology-file', default='storage/example_ontology.json', help='File the load scenario reads')
+@click.option('--repeat', default=5, help='Loads per mode in the load scenario')
+@click.option('--cached', is_flag=True, help='Repeat one chat question, measuring response cache hits')
+@click.option('--timeout', default=300.0, help='Per-request timeout in seconds')
+@click.option('--output', default=None, help='Write the results to this JSON file')
+@click.option('--baseline', default=None, help='Compare with this JSON results file; exit 1 on regressions')
+@click.option('--save-baseline', is_flag=True, help='Write the results to --baseline instead of comparing')
+@click.option('--tolerance', default=DEFAULT_TOLERANCE, help='Relative change allowed before flagging')
+def main(url, scenario, requests, concurrency, ontology, ontology_file, repeat, cached, timeout, output,
+         baseline, save_baseline, tolerance):
+    """Drive /chat, /query-ontology and ontology loading; report throughput and p50/p99 latency"""
+    scenarios = scenario or SCENARIOS
+    results: Dict[str, Any] = {"config": {"requests": requests, "concurrency": concurrency, "ontology": ontology,
+                                          "ontology_file": ontology_file, "cached": cached}}
+    if "chat" in scenarios:
+        results["chat"] = bench_chat(url, requests, concurrency, ontology, cached, timeout)
+    if "query" in scenarios:
+        results["query"] = bench_query(url, requests, concurrency, ontology, timeout)
+    if "load" in scenarios:
+        results["load"] = bench_load(ontology_file, repeat)
+    report({name: result for name, result in results.items() if name != "config"})
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if baseline and save_baseline:
+        with open(baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        click.echo(f"📌 Baseline saved to {baseline}")
+    elif baseline:
+        if not os.path.exists(baseline):
+            click.echo(f"⚠️  No baseline at {baseline}; run with --save-baseline first")
+            return
+        with open(baseline, encoding="utf-8") as file:
+            previous = json.load(file)
+        if previous.get("config") != results["config"]:
+            click.echo("⚠️  Baseline was recorded with different settings; comparison may be meaningless")
+        regressions = compare(results, previous, tolerance)
+        if regressions:
+            click.echo("❌ Regressions:")
+            for regression in regressions:
+                click.echo(f"  - {regression}")
+            sys.exit(1)
+        click.echo(f"✅ No regressions beyond {tolerance:.0%} of {baseline}")
+
+
+if __name__ == '__main__':
+    main()
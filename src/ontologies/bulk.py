@@ -0,0 +1,237 @@
+"""
+Parallel ingestion of ontology shards into one merged ontology
+"""
+
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rdf_parser import RDF_EXTENSIONS, load_rdf
+
+SHARD_EXTENSIONS = ('.json',) + RDF_EXTENSIONS
+BULK_WORKERS = int(os.getenv("ONTOLOGY_BULK_WORKERS", str(os.cpu_count() or 1)))
+# Conflicts listed in a result; all of them are counted
+MAX_REPORTED_CONFLICTS = 20
+# Merged outputs end with this, so a later bulk load over the same files never reads them back as shards
+MERGED_SUFFIX = '.merged.json'
+
+
+def resolve_shards(storage: str, source: str, exclude: Tuple[str, ...] = ()) -> List[str]:
+    """Shard files named by a directory or glob pattern relative to ``storage``, sorted
+
+    Directories are searched recursively for ontology files. Matches
+    outside ``storage``, merged outputs and paths in ``exclude`` are left out.
+    """
+    root = os.path.realpath(storage)
+    pattern = os.path.join(root, source)
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*")
+    excluded = {os.path.realpath(path) for path in exclude}
+    shards = []
+    for path in glob.glob(pattern, recursive=True):
+        real = os.path.realpath(path)
+        if (os.path.isfile(real) and real.endswith(SHARD_EXTENSIONS) and not real.endswith(MERGED_SUFFIX)
+                and real not in excluded
+                and os.path.commonpath([root, real]) == root):
+            shards.append(real)
+    return sorted(shards)
+
+
+def parse_shard(path: str) -> Dict[str, Any]:
+    """Parse one shard in a worker process; failures are returned, not raised"""
+    started = time.perf_counter()
+    try:
+        if path.endswith('.json'):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        else:
+            data = load_rdf(path)
+        if not isinstance(data, dict) or not isinstance(data.get("ontology"), dict):
+            raise ValueError("no top-level 'ontology' object")
+        return {"path": path, "ontology": data["ontology"], "bytes": os.path.getsize(path),
+                "seconds": time.perf_counter() - started}
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - started}
+
+
+def _merge_value(current: Any, incoming: Any) -> Tuple[Any, bool]:
+    """Combine two values of one field: lists are unioned, dicts merged key by key
+
+    Returns the merged value and whether a scalar disagreed (the current
+    value is kept then).
+    """
+    if isinstance(current, list) and isinstance(incoming, list):
+        merged = list(current)
+        merged.extend(item for item in incoming if item not in current)
+        return merged, False
+    if isinstance(current, dict) and isinstance(incoming, dict):
+        merged = dict(current)
+        conflict = False
+        for key, value in incoming.items():
+            if key in merged:
+                merged[key], disagreed = _merge_value(merged[key], value)
+                conflict = conflict or disagreed
+            else:
+                merged[key] = value
+        return merged, conflict
+    return current, current != incoming
+
+
+class ShardMerger:
+    """Merges parsed shards, in the order given, into one ontology
+
+    Sections holding entities by key (``classes``, ``instances``,
+    ``relationships`` and any other object-valued one) are merged entity
+    by entity. An entity seen again unchanged is a duplicate. Otherwise
+    the two are merged: fields missing so far are added and lists are
+    unioned, while a field with a different value keeps the first shard's
+    value and is reported as a conflict. Other top-level values are merged
+    the same way: lists are unioned and scalars such as ``name`` come from
+    the first shard that has them. A section that is an object in one shard
+    but not in another keeps its first value and is reported as a conflict
+    with no key.
+    """
+
+    def __init__(self):
+        self.ontology: Dict[str, Any] = {}
+        # (section, key) -> first shard defining it; key None for the section itself
+        self.origins: Dict[Tuple[str, str], str] = {}
+        self.entities = 0
+        self.duplicates = 0
+        self.merged = 0
+        self.conflicts: List[Dict[str, Any]] = []
+        self.conflict_count = 0
+
+    def add(self, path: str, ontology: Dict[str, Any]):
+        for section, value in ontology.items():
+            if section not in self.ontology:
+                self.ontology[section] = {} if isinstance(value, dict) else value
+                self.origins[(section, None)] = path
+                if not isinstance(value, dict):
+                    continue
+            target = self.ontology[section]
+            if not isinstance(target, dict) or not isinstance(value, dict):
+                if isinstance(target, dict) or isinstance(value, dict) \
+                        or isinstance(target, list) != isinstance(value, list):
+                    self._conflict(section, None, path, target, value)
+                else:
+                    self.ontology[section], _ = _merge_value(target, value)
+                continue
+            for key, entity in value.items():
+                if key not in target:
+                    target[key] = entity
+                    self.origins[(section, key)] = path
+                    self.entities += 1
+                    continue
+                if target[key] == entity:
+                    self.duplicates += 1
+                    continue
+                merged, conflict = _merge_value(target[key], entity)
+                target[key] = merged
+                if conflict:
+                    self._conflict(section, key, path, target[key], entity)
+                else:
+                    self.merged += 1
+
+    def _conflict(self, section: str, key: Optional[str], path: str, kept: Any, rejected: Any):
+        self.conflict_count += 1
+        if len(self.conflicts) >= MAX_REPORTED_CONFLICTS:
+            return
+        fields = sorted(field for field in rejected if field in kept and kept[field] != rejected[field]) \
+            if isinstance(kept, dict) and isinstance(rejected, dict) else []
+        self.conflicts.append({"section": section, "key": key, "kept_from": self.origins[(section, key)],
+                               "rejected_from": path, "fields": fields})
+
+
+def bulk_parse(shards: List[str], workers: int = BULK_WORKERS) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Parse shards on ``workers`` processes and merge them; returns the ontology data and stats
+
+    Shards are merged in path order as their results arrive, so the merge
+    overlaps with parsing and conflict resolution does not depend on which
+    worker finishes first.
+    """
+    started = time.perf_counter()
+    merger = ShardMerger()
+    errors: List[Dict[str, str]] = []
+    parsed_bytes = 0
+    parse_seconds = 0.0
+    merge_seconds = 0.0
+    workers = max(min(workers, len(shards)), 1)
+
+    def consume(result: Dict[str, Any]):
+        nonlocal parsed_bytes, parse_seconds, merge_seconds
+        parse_seconds += result["seconds"]
+        if "error" in result:
+            errors.append({"path": result["path"], "error": result["error"]})
+            return
+        clock = time.perf_counter()
+        merger.add(result["path"], result["ontology"])
+        merge_seconds += time.perf_counter() - clock
+        parsed_bytes += result["bytes"]
+
+    if workers == 1:
+        for shard in shards:
+            consume(parse_shard(shard))
+    else:
+        # Spawned workers do not inherit the server's threads and locks, as forked ones would
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for result in pool.map(parse_shard, shards, chunksize=max(len(shards) // (workers * 4), 1)):
+                consume(result)
+
+    seconds = time.perf_counter() - started
+    stats = {
+        "shards": len(shards),
+        "failed": len(errors),
+        "errors": errors,
+        "workers": workers,
+        "bytes": parsed_bytes,
+        "entities": merger.entities,
+        "duplicates": merger.duplicates,
+        "merged": merger.merged,
+        "conflict_count": merger.conflict_count,
+        "conflicts": merger.conflicts,
+        "parse_seconds": round(seconds, 3),
+        "worker_seconds": round(parse_seconds, 3),
+        "merge_seconds": round(merge_seconds, 3),
+        "shards_per_second": round(len(shards) / seconds, 2) if seconds > 0 else 0.0,
+        "mb_per_second": round(parsed_bytes / seconds / 1e6, 2) if seconds > 0 else 0.0
+    }
+    return {"ontology": merger.ontology}, stats
+
+
+def write_merged(path: str, data: Dict[str, Any]):
+    """Write a merged ontology next to the shards, via a temporary file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def bulk_ingest(storage: str, source: str, output: str, workers: int = BULK_WORKERS,
+                name: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """Parse and merge the shards ``source`` names and write the result to ``output``
+
+    ``name`` replaces the ontology's declared name, which otherwise is the
+    first shard's. Returns the merged data (None when no shard could be
+    read) and the ingestion stats.
+    """
+    shards = resolve_shards(storage, source, exclude=(output,))
+    if not shards:
+        return None, {"shards": 0, "errors": [{"path": source, "error": "No ontology files matched"}]}
+    data, stats = bulk_parse(shards, workers)
+    if stats["failed"] == len(shards):
+        return None, stats
+    if name:
+        data["ontology"]["name"] = name
+    data["ontology"].setdefault("description", f"Merged from {len(shards) - stats['failed']} shards of {source}")
+    clock = time.perf_counter()
+    write_merged(output, data)
+    stats["write_seconds"] = round(time.perf_counter() - clock, 3)
+    return data, stats
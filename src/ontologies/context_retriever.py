@@ -0,0 +1,136 @@
+"""
+Question-aware context retrieval for the AI Module Framework
+"""
+
+import os
+from itertools import islice
+from typing import Dict, List, Optional, Set
+
+from .ontology_loader import LoadedOntology, OntologyLoader
+from .search_index import MAX_FIELD_VALUE_LENGTH
+from .triple_store import DICT_NODE, LIST_NODE
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CHARS_PER_TOKEN = 4
+# Fewest characters one triple renders to ("k: v" plus a newline)
+MIN_CHARS_PER_TRIPLE = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate used for budgeting prompts"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ContextRetriever:
+    """Selects the part of an ontology that is relevant to a question
+
+    Nodes matching the question are taken from the loader's search index,
+    then expanded to their graph neighbours: nodes they reference by name
+    (``type``, ``parent``, ``managed_by``, ...) and nodes that reference
+    them. Nodes are rendered best-first until the token budget runs out.
+
+    The whole ontology is only rendered when its triple count shows it
+    could fit the budget, and each node is rendered under the budget that
+    is left, stopping early, so a large subtree is never rendered whole.
+    """
+
+    def __init__(self, loader: OntologyLoader, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 max_hits: int = 10, hops: int = 1, max_neighbours: int = 25):
+        self.loader = loader
+        self.token_budget = token_budget
+        self.max_hits = max_hits
+        self.hops = hops
+        self.max_neighbours = max_neighbours
+
+    def retrieve(self, question: str, token_budget: Optional[int] = None) -> Dict:
+        """Build a context for the question within the token budget"""
+        budget = token_budget or self.token_budget
+        loader = self.loader
+        # One state for the whole request, so a concurrent reload cannot mix versions
+        state = loader.state
+
+        store = state.store
+        # Every triple renders to at least MIN_CHARS_PER_TRIPLE characters, so this rules out large ontologies
+        # without rendering them; a small one is rendered once per version and cached on the state
+        if store is None or len(store) * MIN_CHARS_PER_TRIPLE <= budget * CHARS_PER_TOKEN:
+            full_context = loader.get_ontology_context(state)
+            if estimate_tokens(full_context) <= budget:
+                return {"context": full_context, "nodes": ["*"], "tokens": estimate_tokens(full_context),
+                        "truncated": False}
+
+        index = state.search_index
+        _, ranked = index.rank(question, limit=self.max_hits)
+        ordered = self._expand([doc_id for doc_id, _ in ranked], state)
+
+        header = f"Relevant Ontology Context:\nLoaded from: {state.path}\n\n"
+        parts = [header]
+        used = estimate_tokens(header)
+        included: List[int] = []
+        truncated = False
+        for doc_id in ordered:
+            if any(store.is_descendant(doc_id, parent) for parent in included):
+                continue
+            title = f"{store.path(doc_id)}:\n"
+            room = (budget - used) * CHARS_PER_TOKEN - len(title)
+            body = loader.format_node(doc_id, 1, store, max_chars=room) if room > 0 else None
+            if body is None:
+                truncated = True
+                continue
+            block = title + body
+            cost = estimate_tokens(block)
+            if used + cost > budget:
+                truncated = True
+                continue
+            parts.append(block)
+            used += cost
+            included.append(doc_id)
+
+        return {"context": "".join(parts), "nodes": [store.path(doc_id) for doc_id in included],
+                "tokens": used, "truncated": truncated}
+
+    def _expand(self, seeds: List[int], state: LoadedOntology) -> List[int]:
+        """Breadth-first expansion of seed nodes to their neighbours"""
+        ordered = list(dict.fromkeys(seeds))
+        seen: Set[int] = set(ordered)
+        frontier = ordered
+        for _ in range(self.hops):
+            next_frontier = []
+            for doc_id in frontier:
+                for neighbour in self._neighbours(doc_id, state):
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+            ordered.extend(next_frontier)
+            frontier = next_frontier
+        return ordered
+
+    def _neighbours(self, doc_id: int, state: LoadedOntology) -> List[int]:
+        index = state.search_index
+        store = state.store
+        neighbours = []
+
+        # Read the node's columns directly; a section such as ``instances`` has one field per entity
+        start = store.node_start[doc_id]
+        objects = store.objects[start:start + store.node_size[doc_id]]
+        children = [obj >> 1 for obj in objects if obj & 1]
+        scalars = [obj >> 1 for obj in objects if not obj & 1]
+        for child in children:
+            if store.node_kind[child] == LIST_NODE:
+                item_start = store.node_start[child]
+                scalars.extend(item >> 1 for item in store.objects[item_start:item_start + store.node_size[child]]
+                               if not item & 1)
+
+        # Outgoing references: scalar values naming another node, resolved through the index's name field
+        for term in scalars:
+            item = store.terms[term]
+            if isinstance(item, str) and len(item) <= MAX_FIELD_VALUE_LENGTH:
+                neighbours.extend(index.named(item))
+
+        # Incoming references: nodes whose fields name this node
+        neighbours.extend(index.referrers(store.terms[store.node_key[doc_id]], limit=self.max_neighbours))
+
+        # Nested nodes, e.g. a class's relationships block
+        neighbours.extend(islice((child for child in children if store.node_kind[child] == DICT_NODE),
+                                 self.max_neighbours + 1))
+
+        return [neighbour for neighbour in neighbours if neighbour != doc_id][:self.max_neighbours]
@@ -0,0 +1,357 @@
+"""
+Class hierarchy and relationship graph index for ontology data
+"""
+
+from array import array
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .triple_store import DICT_NODE, LIST_NODE, NO_PARENT, NodeView, TripleStore
+
+CLASS_ENTITY = 0
+INSTANCE_ENTITY = 1
+RELATIONSHIP_ENTITY = 2
+IMPLICIT_CLASS = 3
+
+ENTITY_KINDS = {CLASS_ENTITY: "class", INSTANCE_ENTITY: "instance",
+                RELATIONSHIP_ENTITY: "relationship", IMPLICIT_CLASS: "class"}
+SECTIONS = (("classes", CLASS_ENTITY), ("instances", INSTANCE_ENTITY), ("relationships", RELATIONSHIP_ENTITY))
+# Fields that shape the class hierarchy rather than naming a relationship
+STRUCTURAL_FIELDS = ("type", "parent", "subclasses")
+DIRECTIONS = ("out", "in", "both")
+OPERATIONS = ("subclasses", "superclasses", "instances", "types", "neighbours")
+
+
+class GraphIndex:
+    """Class hierarchy, type map and relationship adjacency compiled from an ontology
+
+    Entities are the children of ``classes``, ``instances`` and
+    ``relationships`` plus any class only named in ``parent``,
+    ``subclasses`` or ``type``. They get dense integer ids. Any other field
+    whose value names an entity (by key, or an instance by its ``name``)
+    becomes an edge labelled with the field, including fields one level down
+    such as a class's ``relationships`` block. Edges are stored in CSR form
+    in both directions. Subclass closures and per-class instance lists,
+    including instances of subclasses, are precomputed, so queries are
+    lookups plus a short walk. Lookups return the index's own arrays, which
+    callers must treat as read-only.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.kinds = bytearray()
+        self.nodes = array("I")
+        self.ids: Dict[str, int] = {}
+        self.implicit: Dict[str, int] = {}
+        self.aliases: Dict[str, int] = {}
+        self.relations: List[str] = []
+        self.relation_ids: Dict[str, int] = {}
+        self.parents: Dict[int, List[int]] = {}
+        self.children: Dict[int, List[int]] = {}
+        self.types: Dict[int, List[int]] = {}
+        self.ancestors: Dict[int, array] = {}
+        self.descendants: Dict[int, array] = {}
+        self.direct_instances: Dict[int, array] = {}
+        self.instances_of: Dict[int, array] = {}
+        self.out_offsets = array("I", [0])
+        self.out_targets = array("I")
+        self.out_relations = array("I")
+        self.in_offsets = array("I", [0])
+        self.in_sources = array("I")
+        self.in_relations = array("I")
+
+    @classmethod
+    def build(cls, store: TripleStore) -> "GraphIndex":
+        """Compile the graph of a store laid out like ``storage/example_ontology.json``"""
+        graph = cls()
+        root = store.root
+        if not isinstance(root, NodeView) or root.is_list:
+            return graph
+        ontology = root.get("ontology")
+        if not isinstance(ontology, NodeView) or ontology.is_list:
+            ontology = root
+
+        for section, kind in SECTIONS:
+            node = ontology.get(section)
+            if isinstance(node, NodeView) and not node.is_list:
+                for child in store.children(node.node_id):
+                    if store.node_kind[child] == DICT_NODE:
+                        graph._add_entity(str(store.terms[store.node_key[child]]), kind, child)
+
+        for entity in range(len(graph.names)):
+            if graph.kinds[entity] != INSTANCE_ENTITY:
+                continue
+            node_id = graph.nodes[entity]
+            name = store.node(node_id).get("name")
+            if isinstance(name, str):
+                graph.aliases.setdefault(name.lower(), entity)
+
+        # Values repeat heavily (types, departments, field names), so decode and resolve each term once
+        terms = store.terms
+        decoded: Dict[int, Any] = {}
+        resolved: Dict[int, Optional[int]] = {}
+        sources, relations, targets = array("I"), array("I"), array("I")
+        for entity in range(len(graph.names)):
+            node_id = graph.nodes[entity]
+            if node_id == NO_PARENT:
+                continue
+            kind = graph.kinds[entity]
+            for field_term, value_term, nested in _fields(store, node_id):
+                value = decoded.get(value_term)
+                if value is None:
+                    value = decoded[value_term] = terms[value_term]
+                if not isinstance(value, str):
+                    continue
+                field = decoded.get(field_term)
+                if field is None:
+                    field = decoded[field_term] = str(terms[field_term])
+                if nested or field not in STRUCTURAL_FIELDS:
+                    if value_term in resolved:
+                        target = resolved[value_term]
+                    else:
+                        target = resolved[value_term] = graph.resolve(value)
+                    if target is not None and target != entity:
+                        sources.append(entity)
+                        relations.append(graph._relation_id(field))
+                        targets.append(target)
+                elif field == "type" and kind == INSTANCE_ENTITY:
+                    graph.types.setdefault(entity, []).append(graph._class_id(value))
+                elif field == "parent" and kind == CLASS_ENTITY:
+                    graph._add_subclass(graph._class_id(value), entity)
+                elif field == "subclasses" and kind == CLASS_ENTITY:
+                    graph._add_subclass(entity, graph._class_id(value))
+
+        count = len(graph.names)
+        graph.out_offsets, (graph.out_targets, graph.out_relations) = _csr(count, sources, [targets, relations])
+        graph.in_offsets, (graph.in_sources, graph.in_relations) = _csr(count, targets, [sources, relations])
+        graph._close_hierarchy()
+        return graph
+
+    def _add_entity(self, name: str, kind: int, node_id: int) -> int:
+        entity = len(self.names)
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.nodes.append(node_id)
+        self.ids.setdefault(name, entity)
+        return entity
+
+    def _class_id(self, name: str) -> int:
+        entity = self.ids.get(name)
+        if entity is not None and self.kinds[entity] in (CLASS_ENTITY, IMPLICIT_CLASS):
+            return entity
+        entity = self.implicit.get(name)
+        if entity is None:
+            # Kept apart from ids so an implicit class never shadows a declared entity
+            entity = self.implicit[name] = len(self.names)
+            self.names.append(name)
+            self.kinds.append(IMPLICIT_CLASS)
+            self.nodes.append(NO_PARENT)
+        return entity
+
+    def _relation_id(self, relation: str) -> int:
+        relation_id = self.relation_ids.get(relation)
+        if relation_id is None:
+            relation_id = self.relation_ids[relation] = len(self.relations)
+            self.relations.append(relation)
+        return relation_id
+
+    def _add_subclass(self, parent: int, child: int):
+        if parent == child:
+            return
+        if child not in self.parents.setdefault(parent, []) and parent not in self.parents.get(child, []):
+            self.parents.setdefault(child, []).append(parent)
+            self.children.setdefault(parent, []).append(child)
+
+    def _close_hierarchy(self):
+        """Precompute transitive subclass/superclass sets and instances per class"""
+        for adjacency, closure in ((self.children, self.descendants), (self.parents, self.ancestors)):
+            for start in adjacency:
+                seen = {start}
+                stack = list(adjacency[start])
+                ordered = []
+                while stack:
+                    entity = stack.pop()
+                    if entity in seen:
+                        continue
+                    seen.add(entity)
+                    ordered.append(entity)
+                    stack.extend(adjacency.get(entity, ()))
+                closure[start] = array("I", ordered)
+
+        direct: Dict[int, List[int]] = {}
+        for instance, classes in self.types.items():
+            for class_id in classes:
+                direct.setdefault(class_id, []).append(instance)
+        for class_id, members in direct.items():
+            self.direct_instances[class_id] = array("I", sorted(members))
+        for class_id in set(direct) | set(self.descendants):
+            members = set(direct.get(class_id, ()))
+            for subclass in self.descendants.get(class_id, ()):
+                members.update(direct.get(subclass, ()))
+            if members:
+                self.instances_of[class_id] = array("I", sorted(members))
+
+    def resolve(self, name: Any) -> Optional[int]:
+        """Entity id for a key, an instance name (case-insensitive) or an implicit class"""
+        name = str(name)
+        entity = self.ids.get(name)
+        if entity is None:
+            entity = self.aliases.get(name.lower())
+        if entity is None:
+            entity = self.implicit.get(name)
+        return entity
+
+    def subclasses(self, entity: int, transitive: bool = True) -> Sequence[int]:
+        if transitive:
+            return self.descendants.get(entity, ())
+        return self.children.get(entity, ())
+
+    def superclasses(self, entity: int, transitive: bool = True) -> Sequence[int]:
+        if transitive:
+            return self.ancestors.get(entity, ())
+        return self.parents.get(entity, ())
+
+    def instances(self, entity: int, transitive: bool = True) -> Sequence[int]:
+        """Instances of a class, including instances of its subclasses when transitive"""
+        if transitive:
+            return self.instances_of.get(entity, ())
+        return self.direct_instances.get(entity, ())
+
+    def instance_of(self, instance: int, class_id: int) -> bool:
+        """Whether an instance's type is class_id or one of its subclasses"""
+        for type_id in self.types.get(instance, ()):
+            if type_id == class_id or class_id in self.ancestors.get(type_id, ()):
+                return True
+        return False
+
+    def edges(self, entity: int, direction: str = "out") -> Iterator[Tuple[int, int, str]]:
+        """(neighbour, relation id, direction) for every edge of an entity"""
+        if direction in ("out", "both"):
+            for position in range(self.out_offsets[entity], self.out_offsets[entity + 1]):
+                yield self.out_targets[position], self.out_relations[position], "out"
+        if direction in ("in", "both"):
+            for position in range(self.in_offsets[entity], self.in_offsets[entity + 1]):
+                yield self.in_sources[position], self.in_relations[position], "in"
+
+    def neighbours(self, entity: int, hops: int = 1, relation: Optional[str] = None,
+                   direction: str = "out") -> List[Tuple[int, int, str, str]]:
+        """Breadth-first k-hop neighbourhood as (entity, hops, relation, direction) tuples"""
+        relation_id = None
+        if relation is not None:
+            relation_id = self.relation_ids.get(relation)
+            if relation_id is None:
+                return []
+        found = []
+        seen = {entity}
+        queue = deque([(entity, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            if depth == hops:
+                continue
+            for neighbour, edge_relation, edge_direction in self.edges(current, direction):
+                if neighbour in seen or (relation_id is not None and edge_relation != relation_id):
+                    continue
+                seen.add(neighbour)
+                found.append((neighbour, depth + 1, self.relations[edge_relation], edge_direction))
+                queue.append((neighbour, depth + 1))
+        return found
+
+    def describe(self, entity: int) -> Dict[str, Any]:
+        return {"name": self.names[entity], "kind": ENTITY_KINDS[self.kinds[entity]]}
+
+    def query(self, operation: str, entity: str, transitive: bool = True, hops: int = 1,
+              relation: Optional[str] = None, direction: str = "out", type: Optional[str] = None,
+              limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """Answer a structured query; errors are reported in the result dict"""
+        if operation not in OPERATIONS:
+            return {"error": f"Unknown operation '{operation}', expected one of {', '.join(OPERATIONS)}"}
+        if direction not in DIRECTIONS:
+            return {"error": f"Unknown direction '{direction}', expected one of {', '.join(DIRECTIONS)}"}
+        entity_id = self.resolve(entity)
+        if entity_id is None:
+            return {"error": f"Unknown entity '{entity}'"}
+        type_id = None
+        if type is not None:
+            type_id = self.resolve(type)
+            if type_id is None:
+                return {"error": f"Unknown type '{type}'"}
+
+        if operation == "neighbours":
+            hits = self.neighbours(entity_id, hops=max(hops, 1), relation=relation, direction=direction)
+            if type_id is not None:
+                hits = [hit for hit in hits if self.instance_of(hit[0], type_id)]
+            results = [{**self.describe(hit[0]), "hops": hit[1], "relation": hit[2], "direction": hit[3]}
+                       for hit in hits[offset:offset + limit]]
+            total = len(hits)
+        else:
+            if operation == "subclasses":
+                found = self.subclasses(entity_id, transitive)
+            elif operation == "superclasses":
+                found = self.superclasses(entity_id, transitive)
+            elif operation == "types":
+                found = list(self.types.get(entity_id, ()))
+                if transitive:
+                    for direct in list(found):
+                        found.extend(ancestor for ancestor in self.ancestors.get(direct, ()) if ancestor not in found)
+            else:
+                found = self.instances(entity_id, transitive)
+            if type_id is not None:
+                found = [hit for hit in found if hit == type_id or self.instance_of(hit, type_id)
+                         or type_id in self.ancestors.get(hit, ())]
+            results = [self.describe(hit) for hit in found[offset:offset + limit]]
+            total = len(found)
+
+        return {"operation": operation, "entity": self.names[entity_id], "total": total, "results": results}
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the CSR arrays and closures"""
+        arrays = [self.nodes, self.out_offsets, self.out_targets, self.out_relations,
+                  self.in_offsets, self.in_sources, self.in_relations]
+        arrays.extend(self.ancestors.values())
+        arrays.extend(self.descendants.values())
+        arrays.extend(self.direct_instances.values())
+        arrays.extend(self.instances_of.values())
+        return (sum(len(column) * column.itemsize for column in arrays) + len(self.kinds)
+                + sum(len(name) + 49 for name in self.names) + 104 * (len(self.ids) + len(self.aliases)))
+
+
+def _fields(store: TripleStore, node_id: int) -> Iterator[Tuple[int, int, bool]]:
+    """(field term, scalar term, nested) for an entity's scalars, list items and one nested dict level"""
+    predicates, objects = store.predicates, store.objects
+    start = store.node_start[node_id]
+    for position in range(start, start + store.node_size[node_id]):
+        obj = objects[position]
+        if not obj & 1:
+            yield predicates[position], obj >> 1, False
+            continue
+        child = obj >> 1
+        is_list = store.node_kind[child] == LIST_NODE
+        child_start = store.node_start[child]
+        for child_position in range(child_start, child_start + store.node_size[child]):
+            item = objects[child_position]
+            if item & 1:
+                continue
+            if is_list:
+                yield predicates[position], item >> 1, False
+            else:
+                yield predicates[child_position], item >> 1, True
+
+
+def _csr(count: int, keys: array, value_columns: List[array]) -> Tuple[array, List[array]]:
+    """Group rows by an integer key in [0, count) into offsets plus value columns"""
+    counts = array("I", bytes(4 * count))
+    for key in keys:
+        counts[key] += 1
+    offsets = array("I", [0])
+    total = 0
+    for value in counts:
+        total += value
+        offsets.append(total)
+    cursor = offsets[:-1]
+    columns = [array(column.typecode, bytes(column.itemsize * len(column))) for column in value_columns]
+    for row, key in enumerate(keys):
+        position = cursor[key]
+        cursor[key] = position + 1
+        for column, target in zip(value_columns, columns):
+            target[position] = column[row]
+    return offsets, columns
@@ -0,0 +1,148 @@
+"""
+Incremental re-indexing of reloaded ontologies
+"""
+
+import copy
+from array import array
+from typing import Dict, Tuple
+
+from .search_index import NO_DOC, LayeredSearchIndex, SearchIndex, SearchIndexBuilder
+from .triple_store import DICT_NODE, LIST_NODE, TripleStore
+
+# Once this share of documents lives in the delta, the next reload rebuilds the full index
+COMPACT_RATIO = 0.25
+
+
+def _term(store: TripleStore, term_id: int) -> Tuple[int, bytes]:
+    terms = store.terms
+    return terms.kinds[term_id], bytes(terms.blob[terms.offsets[term_id]:terms.offsets[term_id + 1]])
+
+
+def _same_slot(old: TripleStore, old_obj: int, new: TripleStore, new_obj: int) -> bool:
+    """Whether two objects render the same text into their parent's document"""
+    if old_obj & 1 != new_obj & 1:
+        return False
+    if not old_obj & 1:
+        return _term(old, old_obj >> 1) == _term(new, new_obj >> 1)
+    old_child, new_child = old_obj >> 1, new_obj >> 1
+    if old.node_kind[old_child] != new.node_kind[new_child]:
+        return False
+    if old.node_kind[old_child] == DICT_NODE:
+        # Nested dicts are documents of their own
+        return True
+    size = old.node_size[old_child]
+    if size != new.node_size[new_child]:
+        return False
+    old_start, new_start = old.node_start[old_child], new.node_start[new_child]
+    for offset in range(size):
+        old_item, new_item = old.objects[old_start + offset], new.objects[new_start + offset]
+        if old_item & 1 != new_item & 1:
+            return False
+        if not old_item & 1 and _term(old, old_item >> 1) != _term(new, new_item >> 1):
+            return False
+    return True
+
+
+def _same_document(old: TripleStore, old_id: int, new: TripleStore, new_id: int) -> bool:
+    """Whether two dict nodes produce identical search index entries"""
+    size = old.node_size[old_id]
+    if size != new.node_size[new_id]:
+        return False
+    old_start, new_start = old.node_start[old_id], new.node_start[new_id]
+    for offset in range(size):
+        if _term(old, old.predicates[old_start + offset]) != _term(new, new.predicates[new_start + offset]):
+            return False
+        if not _same_slot(old, old.objects[old_start + offset], new, new.objects[new_start + offset]):
+            return False
+    return True
+
+
+def match_documents(old: TripleStore, new: TripleStore) -> array:
+    """Map each unchanged document of old to its node id in new
+
+    Nodes are paired by walking both trees from the root, matching dict
+    children by key and list children by position. Paired nodes with the
+    same content digest (set by the JSON loader per entity) are mapped
+    wholesale; otherwise a paired dict node whose own fields are identical
+    keeps its index entries. Every other slot is ``NO_DOC``.
+    """
+    node_map = array("I", [NO_DOC]) * old.node_count
+    if not old.node_count or not new.node_count or old.node_kind[0] != new.node_kind[0]:
+        return node_map
+
+    stack = [(0, 0)]
+    while stack:
+        old_id, new_id = stack.pop()
+        digest = old.node_digest[old_id]
+        if digest and digest == new.node_digest[new_id]:
+            # Same source text: the whole subtree is unchanged and numbered alike
+            _map_subtree(old, old_id, new_id, node_map)
+            continue
+        kind = old.node_kind[old_id]
+        if kind == DICT_NODE and old_id and _same_document(old, old_id, new, new_id):
+            node_map[old_id] = new_id
+
+        old_start, new_start = old.node_start[old_id], new.node_start[new_id]
+        if kind == LIST_NODE:
+            pairs = zip(old.objects[old_start:old_start + old.node_size[old_id]],
+                        new.objects[new_start:new_start + new.node_size[new_id]])
+        else:
+            old_children: Dict[bytes, int] = {}
+            for position in range(old_start, old_start + old.node_size[old_id]):
+                if old.objects[position] & 1:
+                    old_children[_term(old, old.predicates[position])] = old.objects[position]
+            pairs = []
+            for position in range(new_start, new_start + new.node_size[new_id]):
+                old_obj = old_children.get(_term(new, new.predicates[position]))
+                if old_obj is not None:
+                    pairs.append((old_obj, new.objects[position]))
+
+        for old_obj, new_obj in pairs:
+            if old_obj & 1 and new_obj & 1 and old.node_kind[old_obj >> 1] == new.node_kind[new_obj >> 1]:
+                stack.append((old_obj >> 1, new_obj >> 1))
+    return node_map
+
+
+def _map_subtree(old: TripleStore, old_id: int, new_id: int, node_map: array):
+    """Map every dict node of identical subtrees, relying on matching pre-order numbering"""
+    offset = 0
+    while True:
+        if old.node_kind[old_id + offset] == DICT_NODE:
+            node_map[old_id + offset] = new_id + offset
+        offset += 1
+        if old_id + offset >= old.node_count or not old.is_descendant(old_id + offset, old_id):
+            return
+
+
+def update_index(index: SearchIndex, old: TripleStore, new: TripleStore) -> SearchIndex:
+    """Index for new that reuses the postings of every unchanged document
+
+    Only documents that are new or changed are tokenized, into a delta
+    index layered over the existing postings. When the delta outgrows
+    ``COMPACT_RATIO`` of the documents, a full index is built instead.
+    """
+    node_map = match_documents(old, new)
+    if isinstance(index, LayeredSearchIndex):
+        # Compose the previous base -> old mapping with old -> new
+        base = index.base
+        remap = array("I", (NO_DOC if old_id == NO_DOC else node_map[old_id] for old_id in index.remap))
+    else:
+        base = copy.copy(index)
+        base.store = None
+        remap = node_map
+
+    covered = bytearray(new.node_count)
+    for new_id in remap:
+        if new_id != NO_DOC:
+            covered[new_id] = 1
+
+    changed = [node_id for node_id in range(1, new.node_count)
+               if new.node_kind[node_id] == DICT_NODE and not covered[node_id]]
+    documents = len(changed) + covered.count(1)
+    if len(changed) > COMPACT_RATIO * max(documents, 1):
+        return SearchIndex.build(new)
+
+    builder = SearchIndexBuilder(new, k1=index.k1, b=index.b)
+    for node_id in changed:
+        builder.add_document(node_id)
+    return LayeredSearchIndex(new, base, remap, builder.finish())
@@ -0,0 +1,223 @@
+"""
+Incremental JSON ontology loader for the AI Module Framework
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import re
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from .search_index import SearchIndex, SearchIndexBuilder
+from .triple_store import DICT_NODE, TripleStore, TripleStoreBuilder
+
+CHUNK_SIZE = 1 << 20
+# A scalar ending this close to the end of the buffer may continue in the next chunk
+LOOKAHEAD = 8
+# Containers this deep (root = 0) are decoded whole, e.g. one class or
+# instance under ``ontology.classes`` / ``ontology.instances``.
+ENTITY_DEPTH = 3
+# Largest single value decoded whole; malformed input stops here instead of reading the rest of the file
+MAX_VALUE_CHARS = int(os.getenv("ONTOLOGY_MAX_ENTITY_MB", "256")) << 20
+
+ProgressCallback = Callable[[int, int], None]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class StreamingJSONLoader:
+    """Loads a JSON ontology in fixed-size chunks into a TripleStore
+
+    Only the shallow layout (root, ``ontology``, ``classes``...) is walked
+    token by token. Every value at ``ENTITY_DEPTH`` or deeper is decoded
+    with ``json.JSONDecoder.raw_decode`` as soon as it is complete, written
+    to the store and indexed, then dropped. Peak memory is therefore the
+    store plus the largest single entity, not a multiple of the file size.
+    """
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE, entity_depth: int = ENTITY_DEPTH,
+                 progress: Optional[ProgressCallback] = None, build_index: bool = True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.entity_depth = entity_depth
+        self.progress = progress
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.builder = TripleStoreBuilder()
+        self.index_builder = SearchIndexBuilder(self.builder.store) if build_index else None
+        self._decoder = json.JSONDecoder()
+        self._stream = None
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def load(self) -> Tuple[TripleStore, Optional[SearchIndex]]:
+        """Parse the whole file, returning the store and its search index (None when not built)"""
+        for _ in self.entities():
+            pass
+        store = self.builder.finish()
+        return store, self.index_builder.finish() if self.index_builder else None
+
+    def entities(self) -> Iterator[int]:
+        """Yield the node id of each entity as soon as it has been stored and indexed"""
+        with open(self.path, "rb") as stream:
+            self._stream = stream
+            # Each frame is [node_id, is_dict, entries_seen]
+            stack: List[list] = []
+            yield from self._value(None, None, stack)
+
+            while stack:
+                frame = stack[-1]
+                node_id, is_dict, seen = frame
+                char = self._skip()
+                if char is None:
+                    raise ValueError(f"Unexpected end of JSON input in {self.path}")
+                if char == ("}" if is_dict else "]"):
+                    self._position += 1
+                    stack.pop()
+                    self._close(node_id)
+                    continue
+                if seen:
+                    if char != ",":
+                        raise ValueError(f"Expected ',' at offset {self._offset()} in {self.path}")
+                    self._position += 1
+                if is_dict:
+                    self._skip()
+                    key = self._decode()
+                    if not isinstance(key, str) or self._skip() != ":":
+                        raise ValueError(f"Expected a key at offset {self._offset()} in {self.path}")
+                    self._position += 1
+                else:
+                    key = seen
+                frame[2] += 1
+                yield from self._value(node_id, key, stack)
+
+            if self._skip() is not None:
+                raise ValueError(f"Extra data at offset {self._offset()} in {self.path}")
+        self._stream = None
+
+    def _value(self, parent: Optional[int], key: Any, stack: List[list]) -> Iterator[int]:
+        """Store the value starting at the current position under parent"""
+        char = self._skip()
+        if char is None:
+            raise ValueError(f"Unexpected end of JSON input in {self.path}")
+        builder = self.builder
+
+        if char in "{[" and len(stack) < self.entity_depth:
+            self._position += 1
+            if char == "{":
+                node_id = builder.begin_dict(parent, key)
+            else:
+                node_id = builder.begin_list(parent, key)
+            if parent is not None:
+                builder.add(parent, key, child=node_id)
+            stack.append([node_id, char == "{", 0])
+            return
+
+        value, text = self._decode(keep_text=True)
+        if not isinstance(value, (dict, list)):
+            if parent is None:
+                builder.add_value(value)
+            else:
+                builder.add(parent, key, value)
+            return
+
+        first = builder.store.node_count
+        node_id = builder.add_value(value, parent, key)
+        builder.store.node_digest[node_id] = content_digest(text)
+        del value, text
+        for child in range(first, builder.store.node_count):
+            self._index(child)
+        yield node_id
+
+    def _close(self, node_id: int):
+        self.builder.end(node_id)
+        self._index(node_id)
+
+    def _index(self, node_id: int):
+        if self.index_builder and node_id and self.builder.store.node_kind[node_id] == DICT_NODE:
+            self.index_builder.add_document(node_id)
+
+    def _skip(self) -> Optional[str]:
+        """Skip whitespace and return the next character, or None at end of input"""
+        while True:
+            self._position = _WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return None
+
+    def _decode(self, keep_text: bool = False) -> Any:
+        """Decode one complete JSON value at the current position, reading more input as needed
+
+        With ``keep_text`` the value's source text is returned alongside it.
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer, or a string still open there, can be cut-off input
+                pending = len(self._buffer) - self._position
+                truncated = e.pos >= len(self._buffer) - LOOKAHEAD or e.msg.startswith("Unterminated string")
+                if truncated and pending <= MAX_VALUE_CHARS and self._fill(pending):
+                    continue
+                if truncated and pending > MAX_VALUE_CHARS:
+                    raise ValueError(f"Invalid JSON in {self.path}: a value exceeds {MAX_VALUE_CHARS} characters "
+                                     f"at byte {self._offset()}") from e
+                raise ValueError(f"Invalid JSON in {self.path}: {e}") from e
+            # "1." | "5" decodes as 1, so a value ending near the buffer's end is retried with more input
+            if end > len(self._buffer) - LOOKAHEAD and self._fill():
+                continue
+            start, self._position = self._position, end
+            if keep_text:
+                return value, self._buffer[start:end]
+            return value
+
+    def _fill(self, minimum: int = 0) -> bool:
+        """Append at least one more chunk to the buffer; False at end of file
+
+        ``minimum`` grows the read with the pending value, so a value
+        spanning many chunks is re-decoded a logarithmic number of times.
+        """
+        if self._eof:
+            return False
+        raw = self._stream.read(max(self.chunk_size, minimum))
+        self.bytes_read += len(raw)
+        text = self._text_decoder.decode(raw, final=not raw)
+        if not raw:
+            self._eof = True
+        if text:
+            # Positions held by callers stay valid when nothing was appended
+            self._buffer = self._buffer[self._position:] + text
+            self._position = 0
+        if self.progress:
+            self.progress(self.bytes_read, self.total_bytes)
+        return bool(raw) or bool(text)
+
+    def _offset(self) -> int:
+        return self.bytes_read - len(self._buffer.encode("utf-8")) + len(self._buffer[:self._position].encode("utf-8"))
+
+
+def content_digest(text: str) -> int:
+    """Non-zero 64-bit digest of an entity's source text"""
+    digest = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest or 1
+
+
+def progress_printer(label: str, step: int = 10) -> ProgressCallback:
+    """Progress callback that prints every ``step`` percent"""
+    last = [-step]
+
+    def report(bytes_read: int, total_bytes: int):
+        percent = bytes_read * 100 // total_bytes if total_bytes else 100
+        if percent // step != last[0] // step:
+            print(f"Loading {label}: {percent}% ({bytes_read}/{total_bytes} bytes)")
+        last[0] = percent
+    return report
+
+
+def load_json(path: str, progress: Optional[ProgressCallback] = None) -> Tuple[TripleStore, SearchIndex]:
+    """Stream a JSON ontology file into a store and search index"""
+    return StreamingJSONLoader(path, progress=progress).load()
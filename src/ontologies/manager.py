@@ -2,61 +2,284 @@
 Ontology Manager for the AI Module Framework
 """
 
-from .ontology_loader import OntologyLoader
-from typing import Dict, List, Optional
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .context_retriever import ContextRetriever
+from .json_stream import ProgressCallback
+from .ontology_loader import LoadedOntology, OntologyLoader
+from .rdf_parser import RDF_EXTENSIONS
+
+ONTOLOGY_EXTENSIONS = ('.json',) + RDF_EXTENSIONS
+DEFAULT_MEMORY_BUDGET = int(os.getenv("ONTOLOGY_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024
 
 class OntologyManager:
-    """Manages multiple ontologies and their contexts"""
+    """Manages multiple ontologies and their contexts
+    
+    Ontologies are registered by name and file path and loaded lazily on
+    first use. Resident loaders are kept in least-recently-used order; when
+    their combined size exceeds the memory budget, the least recently used
+    ones are evicted and reloaded (usually from their snapshot) when next
+    requested. ``on_publish`` is passed on to every loader.
+    
+    The manager lock only guards bookkeeping: files are parsed outside it,
+    so a cold load never holds up requests for resident ontologies.
+    """
     
-    def __init__(self):
-        self.ontologies: Dict[str, OntologyLoader] = {}
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 on_publish: Optional[Callable[[LoadedOntology], None]] = None):
+        self.memory_budget = memory_budget
+        self.on_publish = on_publish
+        self.sources: Dict[str, str] = {}
+        self.ontologies: "OrderedDict[str, OntologyLoader]" = OrderedDict()
+        self.retrievers: Dict[str, ContextRetriever] = {}
+        self.sizes: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
         self.active_ontology: Optional[str] = None
+        # name -> loader being parsed; concurrent requests for it wait on the same load
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.RLock()
     
-    def load_ontology(self, name: str, file_path: str) -> bool:
+    def register_ontology(self, name: str, file_path: str):
+        """Register an ontology file without loading it"""
+        with self._lock:
+            if self.sources.get(name) != file_path:
+                self.unload_ontology(name)
+                # A load of the old file still running is not waited on, and not installed
+                self._loading.pop(name, None)
+            self.sources[name] = file_path
+            self.stats.setdefault(name, {"hits": 0, "misses": 0, "loads": 0, "reloads": 0, "evictions": 0})
+    
+    def discover(self, directory: str) -> List[str]:
+        """Register every ontology file in a directory under its file name"""
+        names = []
+        if os.path.isdir(directory):
+            for file in sorted(os.listdir(directory)):
+                if file.endswith(ONTOLOGY_EXTENSIONS):
+                    self.register_ontology(file, os.path.join(directory, file))
+                    names.append(file)
+        return names
+    
+    def load_ontology(self, name: str, file_path: str, progress: Optional[ProgressCallback] = None) -> bool:
         """Load an ontology with a given name"""
         try:
-            loader = OntologyLoader()
-            success = loader.load_ontology(file_path)
-            if success:
-                self.ontologies[name] = loader
+            with self._lock:
+                self.register_ontology(name, file_path)
+                self.unload_ontology(name)
+            if self.get_loader(name, progress=progress) is None:
+                return False
+            with self._lock:
                 if not self.active_ontology:
                     self.active_ontology = name
-                return True
+            return True
+        except Exception as e:
+            print(f"Error loading ontology {name}: {e}")
             return False
+    
+    def load_ontology_data(self, name: str, file_path: str, data: Any) -> bool:
+        """Install parsed data already written to ``file_path``, e.g. a bulk-merged ontology
+        
+        The ontology is registered under ``file_path`` like any other, so
+        after an eviction it reloads from the file's snapshot. Indexing runs
+        outside the manager lock, which is only taken to install the loader.
+        """
+        try:
+            loader = OntologyLoader(on_publish=self.on_publish, on_grow=lambda: self._resized(name))
+            if not loader.load_data(file_path, data):
+                return False
+            with self._lock:
+                self.register_ontology(name, file_path)
+                self.unload_ontology(name)
+                self.stats[name]["loads"] += 1
+                self.ontologies[name] = loader
+                self.sizes[name] = loader.memory_usage()
+                self._evict(keep=name)
+                if not self.active_ontology:
+                    self.active_ontology = name
+            return True
         except Exception as e:
             print(f"Error loading ontology {name}: {e}")
             return False
     
+    def get_loader(self, name: Optional[str] = None, progress: Optional[ProgressCallback] = None,
+                   load: bool = True) -> Optional[OntologyLoader]:
+        """Return a resident loader, loading it on first use; defaults to the active ontology
+        
+        A cold or evicted ontology is parsed on the calling thread without
+        the manager lock; other callers asking for it meanwhile wait for
+        that load instead of starting their own. With ``load`` false it is
+        not loaded and None is returned, so async code can take a resident
+        loader on the event loop and load through an executor otherwise.
+        """
+        name = name or self.active_ontology
+        with self._lock:
+            if name not in self.sources:
+                return None
+            stats = self.stats[name]
+            loader = self.ontologies.get(name)
+            if loader is not None:
+                stats["hits"] += 1
+                self.ontologies.move_to_end(name)
+                return loader
+            if not load:
+                return None
+            pending = self._loading.get(name)
+            if pending is None:
+                stats["misses"] += 1
+                pending = self._loading[name] = Future()
+                path = self.sources[name]
+            else:
+                path = None
+        if path is None:
+            return pending.result()
+        
+        loaded = None
+        try:
+            loader = OntologyLoader(on_publish=self.on_publish, on_grow=lambda: self._resized(name))
+            if loader.load_ontology(path, progress=progress):
+                loaded = loader
+        finally:
+            with self._lock:
+                if self._loading.get(name) is pending:
+                    del self._loading[name]
+                # Skip installing a load that was superseded while it ran
+                if loaded is not None and self.sources.get(name) == path:
+                    if name in self.ontologies:
+                        loaded = self.ontologies[name]
+                    else:
+                        stats["loads"] += 1
+                        self.ontologies[name] = loaded
+                        self.sizes[name] = loaded.memory_usage()
+                        self._evict(keep=name)
+            pending.set_result(loaded)
+        return loaded
+    
+    def is_resident(self, name: Optional[str] = None) -> bool:
+        """Whether ``get_loader`` would return without parsing anything"""
+        name = name or self.active_ontology
+        with self._lock:
+            return name in self.ontologies or name not in self.sources
+    
+    def get_retriever(self, name: Optional[str] = None) -> Optional[ContextRetriever]:
+        """Context retriever bound to a resident loader"""
+        name = name or self.active_ontology
+        loader = self.get_loader(name)
+        if loader is None:
+            return None
+        with self._lock:
+            retriever = self.retrievers.get(name)
+            if retriever is None or retriever.loader is not loader:
+                retriever = self.retrievers[name] = ContextRetriever(loader)
+            return retriever
+    
+    def reload_ontology(self, name: str) -> bool:
+        """Re-read a resident ontology whose file changed; others reload lazily on next use
+        
+        The manager lock is only held to look the loader up, so the reload
+        does not block requests for this or any other ontology.
+        """
+        with self._lock:
+            loader = self.ontologies.get(name)
+        if loader is None:
+            return False
+        if not loader.reload():
+            return False
+        with self._lock:
+            if self.ontologies.get(name) is loader:
+                self.stats[name]["reloads"] += 1
+                self.sizes[name] = loader.memory_usage()
+                self._evict(keep=name)
+        return True
+    
+    def unload_ontology(self, name: str) -> bool:
+        """Drop a resident ontology; it stays registered and reloads on next use"""
+        with self._lock:
+            self.retrievers.pop(name, None)
+            self.sizes.pop(name, None)
+            return self.ontologies.pop(name, None) is not None
+    
+    def _resized(self, name: str):
+        """Re-measure a resident ontology after its loader filled a cache, evicting others if it grew past the budget"""
+        with self._lock:
+            loader = self.ontologies.get(name)
+            if loader is not None:
+                self.sizes[name] = loader.memory_usage()
+                self._evict(keep=name)
+    
+    def _evict(self, keep: str):
+        """Evict least recently used ontologies until the budget is met"""
+        for name in list(self.ontologies):
+            if self.memory_usage() <= self.memory_budget:
+                return
+            if name != keep:
+                self.unload_ontology(name)
+                self.stats[name]["evictions"] += 1
+    
+    def resident(self) -> List[Tuple[str, OntologyLoader]]:
+        """(name, loader) pairs currently in memory, least recently used first"""
+        with self._lock:
+            return list(self.ontologies.items())
+    
+    def memory_usage(self) -> int:
+        """Approximate bytes held by all resident ontologies"""
+        return sum(self.sizes.values())
+    
     def set_active_ontology(self, name: str) -> bool:
         """Set the active ontology"""
-        if name in self.ontologies:
+        if name in self.sources:
             self.active_ontology = name
             return True
         return False
     
     def get_active_ontology_context(self) -> str:
         """Get context from the active ontology"""
-        if self.active_ontology and self.active_ontology in self.ontologies:
-            return self.ontologies[self.active_ontology].get_ontology_context()
+        loader = self.get_loader()
+        if loader is not None:
+            return loader.get_ontology_context()
         return "No active ontology loaded."
     
     def query_active_ontology(self, query: str) -> str:
         """Query the active ontology"""
-        if self.active_ontology and self.active_ontology in self.ontologies:
-            return self.ontologies[self.active_ontology].query_ontology(query)
+        loader = self.get_loader()
+        if loader is not None:
+            return loader.query_ontology(query)
         return "No active ontology loaded to query."
     
     def list_ontologies(self) -> List[str]:
-        """List all loaded ontologies"""
-        return list(self.ontologies.keys())
+        """List all registered ontologies"""
+        return list(self.sources.keys())
     
     def get_ontology_info(self, name: str) -> Optional[Dict]:
         """Get information about a specific ontology"""
-        if name in self.ontologies:
-            loader = self.ontologies[name]
+        loader = self.get_loader(name)
+        if loader is not None:
             return {
                 "name": name,
                 "context": loader.get_ontology_context(),
+                "memory_bytes": self.sizes.get(name, 0),
                 "is_active": name == self.active_ontology
             }
         return None
+    
+    def get_stats(self) -> Dict:
+        """Memory use and hit/miss counters for every registered ontology"""
+        with self._lock:
+            return {
+                "memory_budget": self.memory_budget,
+                "memory_bytes": self.memory_usage(),
+                "active": self.active_ontology,
+                "resident": list(self.ontologies.keys()),
+                "ontologies": {
+                    name: {
+                        "path": path,
+                        "resident": name in self.ontologies,
+                        "memory_bytes": self.sizes.get(name, 0),
+                        **self.stats[name],
+                        **(self.ontologies[name].get_stats() if name in self.ontologies else {})
+                    }
+                    for name, path in self.sources.items()
+                }
+            }
@@ -1,100 +1,394 @@
 import os
-import json
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .graph_index import GraphIndex
+from .incremental import update_index
+from .json_stream import ProgressCallback, StreamingJSONLoader
+from .rdf_parser import RDF_EXTENSIONS, load_rdf_store
+from .search_index import LayeredSearchIndex, SearchIndex
+from .snapshot import load_snapshot, save_snapshot, source_stamp
+from .triple_store import LIST_NODE, NodeView, TripleStore
+
+# Characters of each search hit that are rendered into its preview
+SEARCH_PREVIEW_CHARS = 500
+
+class LoadedOntology:
+    """One loaded version of an ontology: source path, store, search index and rendered context
+    
+    States are never modified after they are published (apart from filling
+    the context cache), so a reader that takes ``loader.state`` once sees a
+    store, index and context that belong together even if a reload swaps in
+    a new state meanwhile.
+    """
+    
+    def __init__(self, path: Optional[str] = None, store: Optional[TripleStore] = None,
+                 search_index: Optional[SearchIndex] = None, version: int = 0,
+                 fingerprint: Optional[Tuple[int, int]] = None):
+        self.path = path
+        self.store = store
+        self.search_index = search_index if search_index is not None else SearchIndex(store)
+        self.version = version
+        self.fingerprint = fingerprint
+        self.context: Optional[str] = None
+        self.graph: Optional[GraphIndex] = None
+        # How this version was produced ("snapshot", "parse", "reload" or "bulk") and how long it took
+        self.loaded_from = ""
+        self.load_seconds = 0.0
+    
+    @property
+    def content_version(self) -> str:
+        """Identifies the loaded file content across processes, e.g. for cache keys"""
+        if self.fingerprint is None:
+            return ""
+        return f"{self.fingerprint[0]}-{self.fingerprint[1]}"
+
+class RenderLimitExceeded(Exception):
+    """A node's rendered text would exceed the character limit it was given"""
+
+def file_fingerprint(path: str) -> Tuple[int, int]:
+    """(size, mtime_ns) of a file, used to notice changes"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
 
 class OntologyLoader:
-    """Simple ontology loader for context management"""
+    """Simple ontology loader for context management
+    
+    ``on_publish`` is called with every newly published state, e.g. to
+    invalidate caches derived from the previous version. ``on_grow`` is
+    called after a cache is filled, so the owner can re-measure
+    ``memory_usage`` then rather than on every access.
+    """
+    
+    def __init__(self, snapshots: bool = True,
+                 on_publish: Optional[Callable[[LoadedOntology], None]] = None,
+                 on_grow: Optional[Callable[[], None]] = None):
+        self.snapshots = snapshots
+        self.on_publish = on_publish
+        self.on_grow = on_grow
+        self.state = LoadedOntology()
+        # Serializes loads and reloads; readers never take it
+        self._lock = threading.Lock()
+    
+    @property
+    def store(self) -> Optional[TripleStore]:
+        return self.state.store
+    
+    @property
+    def search_index(self) -> SearchIndex:
+        return self.state.search_index
+    
+    @property
+    def current_ontology(self) -> Optional[str]:
+        return self.state.path
     
-    def __init__(self):
-        self.ontology_data = {}
-        self.current_ontology = None
+    @property
+    def version(self) -> int:
+        return self.state.version
     
-    def load_ontology(self, ontology_path: str) -> bool:
-        """Load ontology from file"""
+    def load_ontology(self, ontology_path: str, progress: Optional[ProgressCallback] = None) -> bool:
+        """Load ontology from file
+
+        JSON files are streamed in chunks; ``progress`` is called with
+        ``(bytes_read, total_bytes)`` as the file is consumed. When snapshots
+        are enabled, a current ``.snap`` sidecar is mapped instead of parsing,
+        and a fresh one is written after a full parse.
+        """
         try:
-            if ontology_path.endswith('.json'):
-                with open(ontology_path, 'r') as f:
-                    self.ontology_data = json.load(f)
-            elif ontology_path.endswith('.ttl') or ontology_path.endswith('.rdf'):
-                # For now, just store the file path for RDF files
-                self.ontology_data = {"file_path": ontology_path, "type": "rdf"}
-            else:
-                return False
-            
-            self.current_ontology = ontology_path
-            return True
+            with self._lock:
+                started = time.perf_counter()
+                fingerprint = file_fingerprint(ontology_path)
+                loaded = self._load_snapshot(ontology_path) if self.snapshots else None
+                if loaded is not None:
+                    store, search_index = loaded
+                else:
+                    # Stamped before parsing, so a file edited meanwhile is not snapshotted as current
+                    source = source_stamp(ontology_path) if self.snapshots else None
+                    store, search_index = self._parse(ontology_path, progress)
+                    if store is None:
+                        return False
+                    if search_index is None:
+                        search_index = SearchIndex.build(store)
+                    if self.snapshots:
+                        self._save_snapshot(ontology_path, store, search_index, source)
+                
+                self._publish(ontology_path, store, search_index, fingerprint,
+                              "snapshot" if loaded is not None else "parse", time.perf_counter() - started)
+                return True
         except Exception as e:
             print(f"Error loading ontology: {e}")
             return False
     
-    def get_ontology_context(self) -> str:
-        """Get ontology as context string"""
+    def load_data(self, ontology_path: str, data: Any) -> bool:
+        """Publish already parsed data that has been written to ``ontology_path``
+        
+        Used for ontologies assembled in memory, such as merged shards: the
+        store and index are built from ``data`` directly rather than parsing
+        the file again, and the snapshot written for the file lets later
+        loads map it.
+        """
+        try:
+            with self._lock:
+                started = time.perf_counter()
+                fingerprint = file_fingerprint(ontology_path)
+                source = source_stamp(ontology_path) if self.snapshots else None
+                store = TripleStore.from_python(data)
+                search_index = SearchIndex.build(store)
+                if self.snapshots:
+                    self._save_snapshot(ontology_path, store, search_index, source)
+                
+                self._publish(ontology_path, store, search_index, fingerprint, "bulk", time.perf_counter() - started)
+                return True
+        except Exception as e:
+            print(f"Error loading ontology data: {e}")
+            return False
+    
+    def reload(self, progress: Optional[ProgressCallback] = None) -> bool:
+        """Re-read the current file if it changed, re-indexing only changed documents
+        
+        The new store is parsed in full, then diffed against the current one;
+        postings of unchanged documents are reused and only new or changed
+        documents are tokenized. The new state replaces the old one in a
+        single assignment.
+        """
+        try:
+            with self._lock:
+                state = self.state
+                if state.path is None:
+                    return False
+                started = time.perf_counter()
+                fingerprint = file_fingerprint(state.path)
+                if fingerprint == state.fingerprint:
+                    return True
+                
+                source = source_stamp(state.path) if self.snapshots else None
+                store, _ = self._parse(state.path, progress, build_index=False)
+                if store is None:
+                    return False
+                if state.store is None:
+                    search_index = SearchIndex.build(store)
+                else:
+                    search_index = update_index(state.search_index, state.store, store)
+                # Layered indexes are not snapshotted; the next full rebuild writes one
+                if self.snapshots and not isinstance(search_index, LayeredSearchIndex):
+                    self._save_snapshot(state.path, store, search_index, source)
+                
+                self._publish(state.path, store, search_index, fingerprint, "reload", time.perf_counter() - started)
+                return True
+        except Exception as e:
+            print(f"Error reloading ontology: {e}")
+            return False
+    
+    def _parse(self, ontology_path: str, progress: Optional[ProgressCallback],
+               build_index: bool = True) -> Tuple[Optional[TripleStore], Optional[SearchIndex]]:
+        """Parse a source file into a store, and for JSON also its index"""
+        if ontology_path.endswith('.json'):
+            return StreamingJSONLoader(ontology_path, progress=progress, build_index=build_index).load()
+        if ontology_path.endswith(RDF_EXTENSIONS):
+            return load_rdf_store(ontology_path), None
+        return None, None
+    
+    def _publish(self, ontology_path: str, store: TripleStore, search_index: SearchIndex,
+                 fingerprint: Tuple[int, int], loaded_from: str = "", load_seconds: float = 0.0):
+        """Swap in a new state; a single attribute assignment, so readers see old or new
+        
+        The graph index is compiled here, on the loading thread, so it is
+        ready with the state and counted in its memory usage.
+        """
+        state = LoadedOntology(ontology_path, store, search_index, self.state.version + 1, fingerprint)
+        state.graph = GraphIndex.build(store)
+        state.loaded_from = loaded_from
+        state.load_seconds = load_seconds
+        self.state = state
+        if self.on_publish is not None:
+            try:
+                self.on_publish(self.state)
+            except Exception as e:
+                print(f"Error in ontology publish callback: {e}")
+    
+    def _load_snapshot(self, ontology_path: str) -> Optional[Tuple[TripleStore, SearchIndex]]:
+        """Map a current snapshot of the file, treating unreadable ones as missing"""
+        try:
+            return load_snapshot(ontology_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading ontology snapshot: {e}")
+            return None
+    
+    def _save_snapshot(self, ontology_path: str, store: TripleStore, search_index: SearchIndex,
+                       source: Optional[Dict[str, Any]] = None):
+        """Write a snapshot sidecar; a read-only storage directory only costs the next cold start"""
+        try:
+            if save_snapshot(ontology_path, store, search_index, source) is None:
+                print(f"Skipped ontology snapshot: {ontology_path} changed while it was parsed")
+        except OSError as e:
+            print(f"Error writing ontology snapshot: {e}")
+    
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the store, search index, graph and cached context"""
+        state = self.state
+        size = state.search_index.memory_usage()
+        if state.store is not None:
+            size += state.store.memory_usage()
+        if state.context is not None:
+            size += len(state.context)
+        if state.graph is not None:
+            size += state.graph.memory_usage()
+        return size
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Load time and sizes of the current version"""
+        state = self.state
+        return {
+            "version": state.version,
+            "loaded_from": state.loaded_from,
+            "load_seconds": round(state.load_seconds, 4),
+            "triples": len(state.store) if state.store is not None else 0,
+            "documents": len(state.search_index),
+            "index_bytes": state.search_index.memory_usage(),
+            "graph_bytes": state.graph.memory_usage() if state.graph is not None else 0
+        }
+    
+    @property
+    def ontology_data(self) -> Any:
+        """Read-only dict-like view of the loaded ontology"""
+        if self.store is None or not self.store.node_count:
+            return {}
+        return self.store.root
+    
+    def get_ontology_context(self, state: Optional[LoadedOntology] = None) -> str:
+        """Get ontology as context string, rendered once per loaded version"""
+        state = state or self.state
+        if state.context is None:
+            state.context = self._render_context(state)
+            if self.on_grow is not None:
+                self.on_grow()
+        return state.context
+    
+    def get_graph_index(self, state: Optional[LoadedOntology] = None) -> GraphIndex:
+        """Class hierarchy and relationship graph, compiled when the version was published"""
+        state = state or self.state
+        return state.graph if state.graph is not None else GraphIndex()
+    
+    def graph_query(self, operation: str, entity: str, **options: Any) -> Dict[str, Any]:
+        """Structured subclass, instance and neighbour queries; see ``GraphIndex.query``"""
         if not self.ontology_data:
+            return {"error": "No ontology loaded to query."}
+        return self.get_graph_index().query(operation, entity, **options)
+    
+    def _render_context(self, state: LoadedOntology) -> str:
+        """Render a loaded ontology as a context string"""
+        root = state.store.root if state.store is not None else None
+        if not root:
             return "No ontology loaded."
         
-        if isinstance(self.ontology_data, dict) and "file_path" in self.ontology_data:
-            return f"Ontology loaded from: {self.ontology_data['file_path']}"
-        
         # Convert JSON ontology to readable context
-        context = "Current Ontology Context:\n"
-        context += f"Loaded from: {self.current_ontology}\n\n"
+        parts = ["Current Ontology Context:\n", f"Loaded from: {state.path}\n\n"]
         
-        if isinstance(self.ontology_data, dict):
-            context += self._format_json_ontology(self.ontology_data)
+        if not root.is_list:
+            self._render_node(0, 0, parts, state.store)
         
-        return context
+        return "".join(parts)
+    
+    def format_node(self, node_id: int, indent: int = 0, store: Optional[TripleStore] = None,
+                    max_chars: Optional[int] = None, truncate: bool = False) -> Optional[str]:
+        """Format one node of the ontology as readable text
+    
+        With ``max_chars`` rendering stops as soon as the text would grow
+        past it, and None is returned (or, with ``truncate``, the first
+        ``max_chars`` characters followed by "..."), so a huge subtree costs
+        no more than the limit.
+        """
+        parts: List[str] = []
+        remaining = [max_chars] if max_chars is not None else None
+        try:
+            self._render_node(node_id, indent, parts, store or self.store, remaining)
+        except RenderLimitExceeded:
+            if truncate:
+                return "".join(parts)[:max_chars] + "..."
+            return None
+        return "".join(parts)
+    
+    def _render_node(self, node_id: int, indent: int, parts: List[str], store: TripleStore,
+                     remaining: Optional[List[int]] = None):
+        """Append the formatted lines for a dict node to parts, reading the store's columns directly
     
-    def _format_json_ontology(self, data: Dict, indent: int = 0) -> str:
-        """Format JSON ontology data as readable text"""
-        result = ""
+        ``remaining`` holds the characters still allowed; it is charged per
+        line and ``RenderLimitExceeded`` is raised once it runs out.
+        """
+        terms, predicates, objects = store.terms, store.predicates, store.objects
         spaces = "  " * indent
         
-        for key, value in data.items():
-            if isinstance(value, dict):
-                result += f"{spaces}{key}:\n"
-                result += self._format_json_ontology(value, indent + 1)
-            elif isinstance(value, list):
-                result += f"{spaces}{key}:\n"
-                for item in value:
-                    if isinstance(item, dict):
-                        result += self._format_json_ontology(item, indent + 1)
-                    else:
-                        result += f"{spaces}  - {item}\n"
+        start = store.node_start[node_id]
+        for position in range(start, start + store.node_size[node_id]):
+            key = terms[predicates[position]]
+            obj = objects[position]
+            if not obj & 1:
+                parts.append(f"{spaces}{key}: {terms[obj >> 1]}\n")
             else:
-                result += f"{spaces}{key}: {value}\n"
-        
-        return result
+                parts.append(f"{spaces}{key}:\n")
+            if remaining is not None:
+                remaining[0] -= len(parts[-1])
+                if remaining[0] < 0:
+                    raise RenderLimitExceeded()
+            if not obj & 1:
+                continue
+            child = obj >> 1
+            if store.node_kind[child] != LIST_NODE:
+                self._render_node(child, indent + 1, parts, store, remaining)
+                continue
+            item_start = store.node_start[child]
+            for item_position in range(item_start, item_start + store.node_size[child]):
+                item = objects[item_position]
+                if not item & 1:
+                    parts.append(f"{spaces}  - {terms[item >> 1]}\n")
+                elif store.node_kind[item >> 1] != LIST_NODE:
+                    self._render_node(item >> 1, indent + 1, parts, store, remaining)
+                    continue
+                else:
+                    parts.append(f"{spaces}  - {NodeView(store, item >> 1)}\n")
+                if remaining is not None:
+                    remaining[0] -= len(parts[-1])
+                    if remaining[0] < 0:
+                        raise RenderLimitExceeded()
     
-    def query_ontology(self, query: str) -> str:
-        """Simple ontology query (placeholder for more complex queries)"""
+    def search(self, query: str, limit: int = 10, offset: int = 0,
+               filters: Optional[Dict[str, Any]] = None,
+               path_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Ranked search over the loaded ontology
+    
+        Each hit carries a text preview of at most ``SEARCH_PREVIEW_CHARS``,
+        so a hit on a whole section never materializes its subtree.
+        """
+        state = self.state
+        total, hits = state.search_index.search(query, limit=limit, offset=offset,
+                                                filters=filters, path_prefix=path_prefix)
+        return {
+            "query": query,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": [{"path": path, "score": round(score, 4),
+                         "preview": self.format_node(node.node_id, 1, state.store,
+                                                     max_chars=SEARCH_PREVIEW_CHARS, truncate=True)}
+                        for path, node, score in hits]
+        }
+    
+    def query_ontology(self, query: str, limit: int = 10, offset: int = 0,
+                       filters: Optional[Dict[str, Any]] = None,
+                       path_prefix: Optional[str] = None) -> str:
+        """Keyword query against the ontology's search index"""
         if not self.ontology_data:
             return "No ontology loaded to query."
         
-        # Simple keyword search in the ontology data
-        query_lower = query.lower()
-        results = []
-        
-        def search_in_data(data, path=""):
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    current_path = f"{path}.{key}" if path else key
-                    if query_lower in key.lower():
-                        results.append(f"{current_path}: {value}")
-                    if isinstance(value, (dict, list)):
-                        search_in_data(value, current_path)
-            elif isinstance(data, list):
-                for i, item in enumerate(data):
-                    current_path = f"{path}[{i}]"
-                    if isinstance(item, (dict, list)):
-                        search_in_data(item, current_path)
-                    elif query_lower in str(item).lower():
-                        results.append(f"{current_path}: {item}")
-            elif query_lower in str(data).lower():
-                results.append(f"{path}: {data}")
-        
-        search_in_data(self.ontology_data)
-        
-        if results:
-            return f"Found {len(results)} matches for '{query}':\n" + "\n".join(results[:10])
+        return self.format_search(self.search(query, limit=limit, offset=offset, filters=filters,
+                                              path_prefix=path_prefix))
+    
+    def format_search(self, found: Dict[str, Any]) -> str:
+        """Text answer for a ``search`` result, so callers needing both rank only once"""
+        query = found["query"]
+        if found["total"]:
+            lines = [f"{hit['path']}:\n{hit['preview'].rstrip()}" for hit in found["results"]]
+            return f"Found {found['total']} matches for '{query}':\n" + "\n".join(lines)
         else:
             return f"No matches found for '{query}' in the ontology."
@@ -0,0 +1,749 @@
+"""
+Streaming RDF parsers (Turtle, N-Triples, RDF/XML) for the AI Module Framework
+"""
+
+import os
+import re
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from .triple_store import TripleStore, TripleStoreBuilder
+
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+OWL = "http://www.w3.org/2002/07/owl#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+RDF_TYPE = RDF + "type"
+CHUNK_SIZE = 1 << 16
+LOOKAHEAD = 8
+# Subjects whose triples are still being collected while streaming into a store
+GROUP_WINDOW = 1024
+
+CLASS_TYPES = {OWL + "Class", RDFS + "Class"}
+PROPERTY_TYPES = {OWL + "ObjectProperty", OWL + "DatatypeProperty", OWL + "AnnotationProperty",
+                  RDF + "Property"}
+SCHEMA_NAMESPACES = (RDF, RDFS, OWL, XSD)
+
+RDF_EXTENSIONS = ('.ttl', '.nt', '.rdf', '.owl')
+
+
+class IRI(str):
+    """An IRI term"""
+
+
+class BNode(str):
+    """A blank node term"""
+
+
+RDF_TYPE_IRI = IRI(RDF_TYPE)
+
+
+Triple = Tuple[str, str, Any]
+
+
+def local_name(term: Any) -> Any:
+    """Shorten an IRI to the part after its last '#', '/' or ':'"""
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    if isinstance(term, IRI):
+        for separator in ("#", "/", ":"):
+            if separator in term:
+                tail = term.rsplit(separator, 1)[1]
+                if tail:
+                    return tail
+        return str(term)
+    return term
+
+
+def _typed_literal(value: str, datatype: Optional[str]) -> Any:
+    """Convert a lexical form to a Python value based on its XSD datatype"""
+    if not datatype or not datatype.startswith(XSD):
+        return value
+    kind = datatype[len(XSD):]
+    try:
+        if kind in ("integer", "int", "long", "short", "byte", "nonNegativeInteger",
+                    "positiveInteger", "negativeInteger", "nonPositiveInteger",
+                    "unsignedInt", "unsignedLong", "unsignedShort", "unsignedByte"):
+            return int(value)
+        if kind in ("decimal", "double", "float"):
+            return float(value)
+        if kind == "boolean":
+            return value.strip() in ("true", "1")
+    except ValueError:
+        pass
+    return value
+
+
+_ESCAPE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)", re.S)
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+
+    def replace(match):
+        code = match.group(1)
+        if code[0] in "uU" and len(code) > 1:
+            return chr(int(code[1:], 16))
+        return _ESCAPES.get(code, code)
+
+    return _ESCAPE.sub(replace, text)
+
+
+# Turtle / N-Triples
+
+_TOKEN_PATTERNS = [
+    ("WS", r"(?:\s+|#[^\n]*)+"),
+    ("IRI", r"<[^>\s]*>"),
+    ("LONG_STRING", r'"""(?:[^"\\]|\\.|"(?!""))*"""' "|" r"'''(?:[^'\\]|\\.|'(?!''))*'''"),
+    ("STRING", r'"(?:[^"\\\n]|\\.)*"' "|" r"'(?:[^'\\\n]|\\.)*'"),
+    ("AT", r"@[A-Za-z]+(?:-[A-Za-z0-9]+)*"),
+    ("DATATYPE", r"\^\^"),
+    ("NUMBER", r"[+-]?(?:\d+\.\d*[eE][+-]?\d+|\.?\d+[eE][+-]?\d+|\d*\.\d+|\d+)"),
+    ("BNODE", r"_:[\w.-]*"),
+    ("PNAME", r"(?:[A-Za-z][\w.-]*)?:(?:[\w.%:-]|\\.)*"),
+    ("WORD", r"[A-Za-z]+"),
+    ("PUNCT", r"[.;,\[\]()]"),
+]
+_TOKEN = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _TOKEN_PATTERNS), re.S)
+
+
+class TurtleSyntaxError(ValueError):
+    """Raised when a Turtle document cannot be parsed"""
+
+
+class _TurtleLexer:
+    """Tokenizer over a text stream that only buffers the statement being read"""
+
+    def __init__(self, stream: IO[str], chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.line = 1
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.position:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        self.buffer += chunk
+        return True
+
+    def next(self) -> Optional[Tuple[str, Any]]:
+        """Return the next (kind, value) token, or None at end of input"""
+        while True:
+            if len(self.buffer) - self.position < max(self.chunk_size // 2, LOOKAHEAD):
+                self._fill()
+            if self.position >= len(self.buffer):
+                return None
+            match = _TOKEN.match(self.buffer, self.position)
+            # A token near the end of the buffer may continue in the next chunk
+            if (match is None or match.end() > len(self.buffer) - LOOKAHEAD) and self._fill():
+                continue
+            if match is None:
+                snippet = self.buffer[self.position:self.position + 20]
+                raise TurtleSyntaxError(f"Unexpected input at line {self.line}: {snippet!r}")
+
+            kind = match.lastgroup
+            text = match.group()
+            end = match.end()
+            if kind == "WS":
+                self.line += text.count("\n")
+                self.position = end
+                continue
+            if kind == "STRING" and len(text) == 2 and self.buffer.startswith(text[0], end):
+                # The start of an unterminated long string, not an empty short one
+                if self._fill():
+                    continue
+                raise TurtleSyntaxError(f"Unterminated string at line {self.line}")
+            if kind == "PNAME" or kind == "BNODE":
+                # A trailing '.' ends the statement rather than the name
+                stripped = text.rstrip(".")
+                end -= len(text) - len(stripped)
+                text = stripped
+            self.position = end
+            if kind == "IRI" or kind == "STRING":
+                return kind, text[1:-1]
+            if kind == "LONG_STRING":
+                self.line += text.count("\n")
+                return "STRING", text[3:-3]
+            return kind, text
+
+
+class TurtleParser:
+    """Incremental Turtle parser; N-Triples is parsed as a subset of Turtle"""
+
+    def __init__(self, stream: IO[str], base: str = "", chunk_size: int = CHUNK_SIZE):
+        self.lexer = _TurtleLexer(stream, chunk_size)
+        self.base = base
+        self.prefixes: Dict[str, str] = {}
+        self._lookahead: Optional[Tuple[str, Any]] = None
+        self._bnode_count = 0
+
+    def _peek(self):
+        if self._lookahead is None:
+            self._lookahead = self.lexer.next()
+        return self._lookahead
+
+    def _take(self):
+        token = self._lookahead
+        if token is None:
+            token = self.lexer.next()
+            if token is None:
+                raise TurtleSyntaxError(f"Unexpected end of input at line {self.lexer.line}")
+        self._lookahead = None
+        return token
+
+    def _expect(self, value: str):
+        token = self._take()
+        if token[1] != value:
+            raise TurtleSyntaxError(f"Expected '{value}' at line {self.lexer.line}, got {token!r}")
+
+    def _new_bnode(self) -> BNode:
+        self._bnode_count += 1
+        return BNode(f"b{self._bnode_count}")
+
+    def _resolve(self, iri: str) -> IRI:
+        iri = _unescape(iri)
+        if self.base and not re.match(r"[A-Za-z][\w+.-]*:", iri):
+            if iri.startswith("#"):
+                return IRI(self.base.split("#")[0] + iri)
+            return IRI(self.base.rsplit("/", 1)[0] + "/" + iri if iri else self.base)
+        return IRI(iri)
+
+    def _pname(self, text: str) -> IRI:
+        prefix, _, local = text.partition(":")
+        if prefix not in self.prefixes:
+            raise TurtleSyntaxError(f"Unknown prefix '{prefix}:' at line {self.lexer.line}")
+        return IRI(self.prefixes[prefix] + re.sub(r"\\(.)", r"\1", local))
+
+    def triples(self) -> Iterator[Triple]:
+        """Yield (subject, predicate, object) triples as they are parsed"""
+        while True:
+            token = self._peek()
+            if token is None:
+                return
+            kind, value = token
+            if kind == "AT" and value in ("@prefix", "@base"):
+                self._take()
+                self._directive(value[1:])
+                self._expect(".")
+            elif kind == "WORD" and value.upper() in ("PREFIX", "BASE"):
+                self._take()
+                self._directive(value.lower())
+            else:
+                # Only the triples of the current statement are buffered
+                statement: List[Triple] = []
+                self._statement(statement)
+                yield from statement
+
+    def _directive(self, name: str):
+        if name == "prefix":
+            kind, value = self._take()
+            if kind != "PNAME" or not value.endswith(":"):
+                raise TurtleSyntaxError(f"Invalid prefix declaration at line {self.lexer.line}")
+            kind, iri = self._take()
+            self.prefixes[value[:-1]] = self._resolve(iri)
+        else:
+            kind, iri = self._take()
+            self.base = self._resolve(iri)
+
+    def _statement(self, out: List[Triple]):
+        if self._peek() == ("PUNCT", "["):
+            self._take()
+            subject = self._new_bnode()
+            if self._peek() != ("PUNCT", "]"):
+                self._predicate_objects(subject, out)
+            self._expect("]")
+            if self._peek() != ("PUNCT", "."):
+                self._predicate_objects(subject, out)
+        else:
+            subject = self._term(out)
+            self._predicate_objects(subject, out)
+        self._expect(".")
+
+    def _predicate_objects(self, subject, out: List[Triple]):
+        while True:
+            token = self._take()
+            predicate = RDF_TYPE_IRI if token == ("WORD", "a") else self._iri(*token)
+            while True:
+                out.append((subject, predicate, self._term(out)))
+                if self._peek() != ("PUNCT", ","):
+                    break
+                self._take()
+            if self._peek() != ("PUNCT", ";"):
+                return
+            while self._peek() == ("PUNCT", ";"):
+                self._take()
+            if self._peek() in (("PUNCT", "."), ("PUNCT", "]")):
+                return
+
+    def _iri(self, kind: str, value: str) -> IRI:
+        if kind == "IRI":
+            return self._resolve(value)
+        if kind == "PNAME":
+            return self._pname(value)
+        raise TurtleSyntaxError(f"Expected an IRI at line {self.lexer.line}, got {value!r}")
+
+    def _term(self, out: List[Triple]):
+        """Parse a subject or object; nested blank nodes append their triples to out"""
+        token = self._take()
+        kind, value = token
+        if kind == "IRI" or kind == "PNAME":
+            return self._iri(kind, value)
+        if kind == "STRING":
+            text = _unescape(value)
+            following = self._peek()
+            if following and following[0] == "AT":
+                self._take()
+            elif following and following[0] == "DATATYPE":
+                self._take()
+                return _typed_literal(text, self._iri(*self._take()))
+            return text
+        if kind == "BNODE":
+            return BNode(value[2:])
+        if kind == "NUMBER":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if kind == "WORD" and value in ("true", "false"):
+            return value == "true"
+        if token == ("PUNCT", "["):
+            node = self._new_bnode()
+            if self._peek() != ("PUNCT", "]"):
+                self._predicate_objects(node, out)
+            self._expect("]")
+            return node
+        if token == ("PUNCT", "("):
+            # Collections are kept as plain lists instead of rdf:first/rdf:rest chains
+            items = []
+            while self._peek() != ("PUNCT", ")"):
+                items.append(self._term(out))
+            self._take()
+            return items
+        raise TurtleSyntaxError(f"Unexpected token {value!r} at line {self.lexer.line}")
+
+
+_NTRIPLE = re.compile(r'\s*(<[^>]*>|_:\S+)\s+<([^>]*)>\s+(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[\w-]+|\^\^<[^>]*>)?)\s*\.\s*$')
+
+
+def iter_ntriples(stream: IO[str]) -> Iterator[Triple]:
+    """Yield triples from an N-Triples stream, one line at a time
+
+    Lines are matched with a single regular expression, which is several
+    times faster than the general Turtle parser for this line-based format.
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = _NTRIPLE.match(line)
+        if match is None:
+            raise TurtleSyntaxError(f"Invalid N-Triples statement at line {number}")
+        subject, predicate, obj = match.groups()
+        yield _nt_term(subject), IRI(_unescape(predicate)), _nt_term(obj)
+
+
+def _nt_term(text: str) -> Any:
+    if text[0] == "<":
+        return IRI(_unescape(text[1:-1]))
+    if text[0] == "_":
+        return BNode(text[2:])
+    end = text.rindex('"')
+    value = _unescape(text[1:end])
+    suffix = text[end + 1:]
+    if suffix.startswith("^^"):
+        return _typed_literal(value, suffix[3:-1])
+    return value
+
+
+# RDF/XML
+
+def _expand_tag(tag: str) -> str:
+    return tag[1:].replace("}", "", 1) if tag.startswith("{") else tag
+
+
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+_SYNTAX_ATTRIBUTES = {RDF + name for name in ("about", "ID", "nodeID", "resource", "datatype", "parseType")}
+
+
+def iter_rdfxml(stream: IO[bytes], base: str = "") -> Iterator[Triple]:
+    """Yield triples from an RDF/XML document using iterparse
+
+    Elements are cleared as soon as they are processed, so memory stays
+    bounded by the nesting depth rather than the document size.
+    """
+    stack: List[list] = []
+    root = None
+    bnode_count = 0
+
+    def new_bnode():
+        nonlocal bnode_count
+        bnode_count += 1
+        return BNode(f"x{bnode_count}")
+
+    def resolve(value: str) -> IRI:
+        if value.startswith("#") or not re.match(r"[A-Za-z][\w+.-]*:", value):
+            return IRI(base.split("#")[0] + ("" if value.startswith("#") else "#") + value)
+        return IRI(value)
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = _expand_tag(elem.tag)
+        if event == "start":
+            if root is None:
+                root = elem
+                base = elem.get(f"{{{XML_NS}}}base", base)
+                if tag == RDF + "RDF":
+                    stack.append(["root"])
+                    continue
+            parent = stack[-1] if stack else ["root"]
+
+            if parent[0] in ("literal", "xml"):
+                stack.append(["xml"])
+            elif parent[0] in ("root", "prop", "collection"):
+                # Node element
+                about = elem.get(f"{{{RDF}}}about")
+                identifier = elem.get(f"{{{RDF}}}ID")
+                node_id = elem.get(f"{{{RDF}}}nodeID")
+                if about is not None:
+                    subject = resolve(about)
+                elif identifier is not None:
+                    subject = resolve("#" + identifier)
+                elif node_id is not None:
+                    subject = BNode(node_id)
+                else:
+                    subject = new_bnode()
+                if parent[0] == "prop":
+                    parent[4] = True
+                    yield parent[1], parent[2], subject
+                elif parent[0] == "collection":
+                    parent[3].append(subject)
+                if tag != RDF + "Description":
+                    yield subject, RDF_TYPE_IRI, IRI(tag)
+                for name, value in elem.attrib.items():
+                    attribute = _expand_tag(name)
+                    if attribute not in _SYNTAX_ATTRIBUTES and not attribute.startswith(XML_NS):
+                        yield subject, IRI(attribute), value
+                stack.append(["node", subject])
+            else:
+                # Property element
+                subject = parent[1]
+                resource = elem.get(f"{{{RDF}}}resource")
+                node_id = elem.get(f"{{{RDF}}}nodeID")
+                parse_type = elem.get(f"{{{RDF}}}parseType")
+                if resource is not None or node_id is not None:
+                    obj = resolve(resource) if resource is not None else BNode(node_id)
+                    yield subject, IRI(tag), obj
+                    stack.append(["prop", subject, IRI(tag), None, True])
+                elif parse_type == "Resource":
+                    node = new_bnode()
+                    yield subject, IRI(tag), node
+                    stack.append(["node", node])
+                elif parse_type == "Literal":
+                    # The content is kept as XML text; its elements are not nodes
+                    stack.append(["literal", subject, IRI(tag)])
+                elif parse_type == "Collection":
+                    # Like Turtle collections, kept as a plain list of the node elements inside
+                    stack.append(["collection", subject, IRI(tag), []])
+                else:
+                    stack.append(["prop", subject, IRI(tag), elem.get(f"{{{RDF}}}datatype"), False])
+        else:
+            frame = stack.pop() if stack else ["root"]
+            if frame[0] == "xml":
+                # Cleared with the literal that contains it
+                continue
+            if frame[0] == "prop" and not frame[4]:
+                yield frame[1], frame[2], _typed_literal((elem.text or "").strip(), frame[3])
+            elif frame[0] == "literal":
+                yield frame[1], frame[2], (elem.text or "") + "".join(
+                    ET.tostring(child, encoding="unicode") for child in elem)
+            elif frame[0] == "collection":
+                yield frame[1], frame[2], frame[3]
+            elem.clear()
+            if len(stack) <= 1 and root is not None:
+                root.clear()
+
+
+# Assembly into the framework's ontology shape
+
+def sniff_format(path: str) -> str:
+    """Guess the RDF serialization of a file from its extension and first bytes"""
+    if path.endswith(".nt"):
+        return "ntriples"
+    with open(path, "rb") as f:
+        head = f.read(512).lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith(b"<?xml") or re.match(rb"<[A-Za-z][\w.-]*:[A-Za-z]", head):
+        return "xml"
+    return "turtle"
+
+
+def iter_file_triples(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Triple]:
+    """Stream triples from an RDF file in Turtle, N-Triples or RDF/XML"""
+    base = "file://" + os.path.abspath(path)
+    serialization = sniff_format(path)
+    if serialization == "xml":
+        with open(path, "rb") as f:
+            yield from iter_rdfxml(f, base=base)
+    elif serialization == "ntriples":
+        with open(path, "r", encoding="utf-8") as f:
+            yield from iter_ntriples(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from TurtleParser(f, base=base, chunk_size=chunk_size).triples()
+
+
+class SubjectsNotGrouped(Exception):
+    """A subject's triples reappeared after it had already been written out"""
+
+
+class _KeyFingerprints:
+    """Set of 64-bit key hashes in one open-addressing array
+
+    Holds 16 bytes or less per key instead of a Python string and set slot.
+    Two keys with the same hash are reported as one; callers treat that
+    like a real duplicate.
+    """
+
+    def __init__(self):
+        self.slots = array("Q", bytes(8 * 1024))
+        self.count = 0
+
+    def __contains__(self, key: str) -> bool:
+        return self.slots[self._slot(key)] != 0
+
+    def add(self, key: str):
+        slot = self._slot(key)
+        if self.slots[slot]:
+            return
+        self.slots[slot] = _fingerprint(key)
+        self.count += 1
+        if self.count * 2 > len(self.slots):
+            old = self.slots
+            self.slots = array("Q", bytes(16 * len(old)))
+            for fingerprint in old:
+                if fingerprint:
+                    self.slots[self._probe(fingerprint)] = fingerprint
+
+    def _slot(self, key: str) -> int:
+        return self._probe(_fingerprint(key))
+
+    def _probe(self, fingerprint: int) -> int:
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = fingerprint & mask
+        while slots[slot] and slots[slot] != fingerprint:
+            slot = (slot + 1) & mask
+        return slot
+
+
+def _fingerprint(key: str) -> int:
+    # Never 0, which marks a free slot
+    return (hash(key) & 0xFFFFFFFFFFFFFFFF) or 1
+
+
+class _Assembler:
+    """Sorts subjects, each with all its properties, into the classes/instances/relationships layout
+
+    Classes and relationships are kept until ``finish`` since later
+    subjects add subclasses and domain relationships to them. Instances
+    are final once assembled and returned to the caller.
+
+    Entities are keyed by the local name of their IRI, or by the full IRI
+    when the local name is taken. With ``strict`` a taken name raises
+    ``SubjectsNotGrouped`` instead, so no subject has to be remembered:
+    a subject seen twice and two IRIs sharing a local name look alike.
+    """
+
+    def __init__(self, name: str, strict: bool = False):
+        self.meta: Dict[str, Any] = {"name": name}
+        self.classes: Dict[str, Dict] = {}
+        self.relationships: Dict[str, Dict] = {}
+        self.strict = strict
+        self.instance_keys = _KeyFingerprints() if strict else set()
+
+    def _key_for(self, term, used) -> str:
+        short = local_name(term)
+        if not isinstance(short, str):
+            short = str(short)
+        if short in used:
+            if self.strict:
+                raise SubjectsNotGrouped(f"Key {short!r} of {term} was already written out")
+            short = str(term)
+        return short
+
+    def add(self, subject, properties: Dict[str, List]) -> Optional[Tuple[str, Dict]]:
+        """File one subject; returns ``(key, entry)`` when it is an instance"""
+        types = set(properties.get(RDF_TYPE, ()))
+        if OWL + "Ontology" in types:
+            for predicate, field in ((RDFS + "label", "name"), (RDFS + "comment", "description"),
+                                     (OWL + "versionInfo", "version")):
+                if predicate in properties:
+                    self.meta[field] = _single(properties[predicate])
+            return None
+
+        instance = None
+        if types & CLASS_TYPES or RDFS + "subClassOf" in properties:
+            if isinstance(subject, BNode):
+                return None
+            entry = self.classes[self._key_for(subject, self.classes)] = {}
+            section = "class"
+        elif types & PROPERTY_TYPES:
+            entry = self.relationships[self._key_for(subject, self.relationships)] = {}
+            section = "relationship"
+        else:
+            if isinstance(subject, BNode) and types and all(str(t).startswith(SCHEMA_NAMESPACES) for t in types):
+                return None
+            key = self._key_for(subject, self.instance_keys)
+            self.instance_keys.add(key)
+            entry = {}
+            instance = (key, entry)
+            section = "instance"
+
+        for predicate, values in properties.items():
+            if predicate == RDF_TYPE:
+                if section == "instance":
+                    entry["type"] = _single(values)
+                continue
+            if predicate == RDFS + "comment":
+                entry["description"] = _single(values)
+            elif predicate == RDFS + "label":
+                entry["label" if section != "instance" else "name"] = _single(values)
+            elif predicate == RDFS + "subClassOf":
+                parents = [_plain(v) for v in values if not isinstance(v, BNode)]
+                if parents:
+                    entry["parent"] = parents[0] if len(parents) == 1 else parents
+            else:
+                entry[local_name(predicate)] = _single(values)
+        return instance
+
+    def finish(self):
+        """Link subclasses to their parents and relationships to their domain classes"""
+        classes = self.classes
+        for name_key, entry in list(classes.items()):
+            parents = entry.get("parent", [])
+            for parent in parents if isinstance(parents, list) else [parents]:
+                classes.setdefault(parent, {}).setdefault("subclasses", []).append(name_key)
+
+        for name_key, entry in self.relationships.items():
+            domains = entry.get("domain")
+            for domain in domains if isinstance(domains, list) else [domains]:
+                if domain not in classes:
+                    continue
+                if "range" in entry and not str(entry["range"]).startswith(("string", "integer", "decimal")):
+                    classes[domain].setdefault("relationships", {})[name_key] = entry["range"]
+                else:
+                    classes[domain].setdefault("properties", []).append(name_key)
+
+
+def _plain(value):
+    if isinstance(value, list) and not isinstance(value, str):
+        return [_plain(item) for item in value]
+    return local_name(value)
+
+
+def _single(values):
+    values = [_plain(value) for value in values]
+    return values[0] if len(values) == 1 else values
+
+
+def build_ontology(triples: Iterator[Triple], name: str = "") -> Dict:
+    """Assemble triples into the classes/instances/relationships layout
+
+    The result has the same shape as ``storage/example_ontology.json`` so
+    search and context rendering treat RDF and JSON ontologies alike. All
+    triples are grouped by subject in memory first; ``build_store`` streams
+    instead when a store is all that is needed.
+    """
+    subjects: Dict[str, Dict[str, List]] = {}
+    for subject, predicate, obj in triples:
+        subjects.setdefault(subject, {}).setdefault(predicate, []).append(obj)
+
+    assembler = _Assembler(name)
+    instances: Dict[str, Dict] = {}
+    for subject, properties in subjects.items():
+        instance = assembler.add(subject, properties)
+        if instance is not None:
+            instances[instance[0]] = instance[1]
+    assembler.finish()
+
+    ontology = dict(assembler.meta)
+    ontology["classes"] = assembler.classes
+    ontology["instances"] = instances
+    ontology["relationships"] = assembler.relationships
+    return {"ontology": ontology}
+
+
+def build_store(triples: Iterator[Triple], name: str = "", window: int = GROUP_WINDOW) -> TripleStore:
+    """Stream triples into a TripleStore with the same layout as ``build_ontology``
+
+    Triples are grouped by subject incrementally: the ``window`` most
+    recently started subjects are held, and the oldest is written out,
+    instances straight into the store, once the window is full. Only the
+    schema (classes and relationships, which later triples still amend)
+    stays in memory until the end, so peak memory is the store plus the
+    schema and a fingerprint per instance key rather than several copies
+    of every triple. Serializations list a subject's triples together in
+    practice; a subject seen again after it was written out, or an entity
+    whose local name is already taken, raises ``SubjectsNotGrouped``.
+    """
+    builder = TripleStoreBuilder()
+    root = builder.begin_dict()
+    ontology = builder.begin_dict(root, "ontology")
+    instances = builder.begin_dict(ontology, "instances")
+    assembler = _Assembler(name, strict=True)
+    pending: "OrderedDict[str, Dict[str, List]]" = OrderedDict()
+
+    def write(subject, properties):
+        instance = assembler.add(subject, properties)
+        if instance is not None:
+            builder.add_value(instance[1], instances, instance[0])
+
+    for subject, predicate, obj in triples:
+        properties = pending.get(subject)
+        if properties is None:
+            properties = pending[subject] = {}
+            if len(pending) > window:
+                write(*pending.popitem(last=False))
+        properties.setdefault(predicate, []).append(obj)
+    while pending:
+        write(*pending.popitem(last=False))
+    assembler.finish()
+
+    for field, value in assembler.meta.items():
+        builder.add_value(value, ontology, field)
+    builder.add_value(assembler.classes, ontology, "classes")
+    builder.add(ontology, "instances", child=instances)
+    builder.end(instances)
+    builder.add_value(assembler.relationships, ontology, "relationships")
+    builder.end(ontology)
+    builder.add(root, "ontology", child=ontology)
+    builder.end(root)
+    return builder.finish()
+
+
+def load_rdf(path: str) -> Dict:
+    """Parse an RDF file into the framework's ontology layout"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return build_ontology(iter_file_triples(path), name=name)
+
+
+def load_rdf_store(path: str) -> TripleStore:
+    """Parse an RDF file straight into a TripleStore
+
+    Streams with ``build_store``; a file whose subjects are scattered, or
+    whose entities share local names, is parsed again and grouped in
+    memory instead.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        return build_store(iter_file_triples(path), name=name)
+    except SubjectsNotGrouped:
+        return TripleStore.from_python(load_rdf(path))
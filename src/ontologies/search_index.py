@@ -0,0 +1,420 @@
+"""
+Inverted search index for ontology data
+"""
+
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .triple_store import DICT_NODE, NodeView, TripleStore
+
+# Runs of Unicode letters and digits; underscores still split, so ``employee_0`` matches ``employee``
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+MAX_FIELD_VALUE_LENGTH = 128
+FIELD_SEPARATOR = "\x1f"
+# Reserved field under which every document is also indexed by its own name
+NAME_FIELD = FIELD_SEPARATOR
+NO_DOC = 0xFFFFFFFF
+# Query tokens not in the vocabulary match terms they prefix: at least this long, and at most this many terms
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_TERMS = 32
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case-folded alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(str(text).casefold())
+
+
+class PackedStrings:
+    """Sorted strings packed into one UTF-8 buffer
+
+    Supports ``len`` and indexing, so it can be searched with ``bisect``
+    without keeping a Python object per string. ``blob`` and ``offsets``
+    may also be read-only memoryviews over a snapshot.
+    """
+
+    def __init__(self, strings: Optional[List[str]] = None):
+        self.blob = bytearray()
+        self.offsets = array("Q", [0])
+        for string in strings or ():
+            self.blob += string.encode("utf-8")
+            self.offsets.append(len(self.blob))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return str(self.blob[self.offsets[position]:self.offsets[position + 1]], "utf-8")
+
+    def find(self, string: str) -> Optional[int]:
+        position = bisect_left(self, string)
+        if position < len(self) and self[position] == string:
+            return position
+        return None
+
+    def prefixed(self, prefix: str) -> Iterator[int]:
+        """Positions of all strings starting with prefix"""
+        position = bisect_left(self, prefix)
+        while position < len(self) and self[position].startswith(prefix):
+            yield position
+            position += 1
+
+    def memory_usage(self) -> int:
+        return len(self.blob) + len(self.offsets) * self.offsets.itemsize
+
+
+class SearchIndex:
+    """Inverted token index with BM25 ranking over ontology nodes
+
+    Every dict node in the ontology's TripleStore becomes one document,
+    identified by its node id and shown by its dotted path (e.g.
+    ``ontology.instances.john_doe``). A document's text is its key name plus
+    its scalar values, so string values under dicts are searchable as well
+    as keys. Short scalar fields are also indexed verbatim so results can
+    be filtered, e.g. ``{"type": "Manager"}``.
+
+    The index is built once and then stored in CSR form: a packed, sorted
+    vocabulary plus flat ``array`` columns of posting offsets, document ids
+    and term frequencies.
+    """
+
+    def __init__(self, store: Optional[TripleStore] = None, k1: float = 1.5, b: float = 0.75):
+        self.store = store if store is not None else TripleStore()
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = PackedStrings()
+        self.posting_offsets = array("I", [0])
+        self.posting_docs = array("I")
+        self.posting_tfs = array("I")
+        self.field_keys = PackedStrings()
+        self.field_offsets = array("I", [0])
+        self.field_docs = array("I")
+        self.doc_lengths = array("I")
+        self.doc_count = 0
+        self.total_length = 0
+
+    @classmethod
+    def build(cls, store: TripleStore) -> "SearchIndex":
+        """Build an index over every dict node of a store"""
+        builder = SearchIndexBuilder(store)
+        for node_id in range(1, store.node_count):
+            if store.node_kind[node_id] == DICT_NODE:
+                builder.add_document(node_id)
+        return builder.finish()
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the index"""
+        columns = (self.posting_offsets, self.posting_docs, self.posting_tfs,
+                   self.field_offsets, self.field_docs, self.doc_lengths)
+        return (sum(len(column) * column.itemsize for column in columns)
+                + self.vocabulary.memory_usage() + self.field_keys.memory_usage())
+
+    def postings(self, term: int) -> Iterator[Tuple[int, int]]:
+        """(doc id, term frequency) pairs for a vocabulary position"""
+        docs, tfs = self.posting_docs, self.posting_tfs
+        for position in range(self.posting_offsets[term], self.posting_offsets[term + 1]):
+            yield docs[position], tfs[position]
+
+    def _segments(self) -> List[Tuple["SearchIndex", Optional[array]]]:
+        """(index, doc id remap) pairs that make up this index; a plain index is one segment"""
+        return [(self, None)]
+
+    def field_matches(self, field: str, value: Any) -> List[int]:
+        """Documents whose field equals value (case-insensitive)"""
+        key = f"{str(value).lower()}{FIELD_SEPARATOR}{field}"
+        found: List[int] = []
+        for segment, remap in self._segments():
+            position = segment.field_keys.find(key)
+            if position is not None:
+                found.extend(_remapped(segment.field_docs[segment.field_offsets[position]:
+                                                          segment.field_offsets[position + 1]], remap))
+        return found
+
+    def named(self, name: Any) -> List[int]:
+        """Documents whose own name equals name (case-insensitive)"""
+        return self.field_matches(NAME_FIELD, name)
+
+    def referrers(self, value: Any, limit: Optional[int] = None) -> List[int]:
+        """Documents with any field equal to value (case-insensitive)"""
+        prefix = f"{str(value).lower()}{FIELD_SEPARATOR}"
+        name_key = prefix + NAME_FIELD
+        found: List[int] = []
+        for segment, remap in self._segments():
+            for position in segment.field_keys.prefixed(prefix):
+                if segment.field_keys[position] == name_key:
+                    continue
+                found.extend(_remapped(segment.field_docs[segment.field_offsets[position]:
+                                                          segment.field_offsets[position + 1]], remap))
+                if limit is not None and len(found) >= limit:
+                    return found[:limit]
+        return found
+
+    def search(self, query: str, limit: int = 10, offset: int = 0,
+               filters: Optional[Dict[str, Any]] = None,
+               path_prefix: Optional[str] = None) -> Tuple[int, List[Tuple[str, NodeView, float]]]:
+        """Rank documents against a query
+
+        Returns the total number of matching documents and the requested
+        page of ``(path, node, score)`` tuples, best match first. An empty query
+        with filters lists every matching document in load order.
+        """
+        total, ranked = self.rank(query, limit=limit, offset=offset, filters=filters, path_prefix=path_prefix)
+        store = self.store
+        return total, [(store.path(doc_id), NodeView(store, doc_id), score) for doc_id, score in ranked]
+
+    def rank(self, query: str, limit: int = 10, offset: int = 0,
+             filters: Optional[Dict[str, Any]] = None,
+             path_prefix: Optional[str] = None) -> Tuple[int, List[Tuple[int, float]]]:
+        """Like search, but returns ``(doc_id, score)`` pairs"""
+        allowed = self._filter(filters)
+        prefix_node = None
+        if path_prefix:
+            prefix_node = self.store.resolve(path_prefix)
+            if prefix_node is None:
+                return 0, []
+        query_tokens = tokenize(query)
+
+        if not query_tokens:
+            if allowed is None and prefix_node is None:
+                return 0, []
+            if allowed is None:
+                allowed = self._descendants(prefix_node)
+            elif prefix_node is not None:
+                allowed = {doc_id for doc_id in allowed if self.store.is_descendant(doc_id, prefix_node)}
+            ordered = sorted(allowed)
+            return len(ordered), [(doc_id, 0.0) for doc_id in ordered[offset:offset + limit]]
+
+        scores = self._score(query_tokens, allowed)
+
+        if prefix_node is not None:
+            scores = {doc_id: score for doc_id, score in scores.items()
+                      if self.store.is_descendant(doc_id, prefix_node)}
+
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return len(scores), top[offset:]
+
+    def _score(self, query_tokens: List[str], allowed: Optional[set]) -> Dict[int, float]:
+        """BM25 scores of every document matching any query token"""
+        scores: Dict[int, float] = {}
+        doc_count = self.doc_count
+        avg_length = self.total_length / doc_count if doc_count else 0.0
+        k1, b = self.k1, self.b
+        segments = self._segments()
+
+        for token in query_tokens:
+            for term in self._expand(token, segments):
+                # (doc id, tf, doc length) of every live posting of the term
+                postings: List[Tuple[int, int, int]] = []
+                for segment, remap in segments:
+                    position = segment.vocabulary.find(term)
+                    if position is None:
+                        continue
+                    start, end = segment.posting_offsets[position], segment.posting_offsets[position + 1]
+                    docs = segment.posting_docs[start:end]
+                    lengths = map(segment.doc_lengths.__getitem__, docs)
+                    if remap is not None:
+                        docs = map(remap.__getitem__, docs)
+                    postings.extend(zip(docs, segment.posting_tfs[start:end], lengths))
+                if len(segments) > 1:
+                    postings = [posting for posting in postings if posting[0] != NO_DOC]
+
+                matches = len(postings)
+                idf = math.log(1 + (doc_count - matches + 0.5) / (matches + 0.5))
+                for doc_id, tf, length in postings:
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = k1 * (1 - b + b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def _expand(self, token: str, segments: List[Tuple["SearchIndex", Optional[array]]]) -> List[str]:
+        """Resolve a query token to vocabulary terms, falling back to prefix matches"""
+        if any(segment.vocabulary.find(token) is not None for segment, _ in segments):
+            return [token]
+        if len(token) < MIN_PREFIX_LENGTH:
+            return []
+        # Only the most frequent completions, so a short prefix cannot pull in most of the vocabulary
+        frequencies: Counter = Counter()
+        for segment, _ in segments:
+            offsets = segment.posting_offsets
+            for position in segment.vocabulary.prefixed(token):
+                frequencies[segment.vocabulary[position]] += offsets[position + 1] - offsets[position]
+        return sorted(term for term, _ in frequencies.most_common(MAX_PREFIX_TERMS))
+
+    def _filter(self, filters: Optional[Dict[str, Any]]) -> Optional[set]:
+        """Return the set of allowed document ids, or None when unrestricted"""
+        allowed = None
+        for field, value in (filters or {}).items():
+            matches = set(self.field_matches(field, value))
+            allowed = matches if allowed is None else allowed & matches
+        return allowed
+
+    def _descendants(self, ancestor: int) -> set:
+        """Document ids below a node; pre-order ids make this a contiguous scan"""
+        store = self.store
+        found = set()
+        for node_id in range(ancestor + 1, store.node_count):
+            if not store.is_descendant(node_id, ancestor):
+                break
+            if store.node_kind[node_id] == DICT_NODE:
+                found.add(node_id)
+        return found
+
+
+class LayeredSearchIndex(SearchIndex):
+    """A frozen base index seen through a doc id remap, plus a delta index
+
+    Used after an incremental reload: documents that did not change keep
+    their postings in ``base`` and are translated to their id in the new
+    store through ``remap`` (``NO_DOC`` for changed or removed ones), while
+    changed and new documents are indexed into the small ``delta``.
+    """
+
+    def __init__(self, store: TripleStore, base: SearchIndex, remap: array, delta: SearchIndex):
+        super().__init__(store, k1=base.k1, b=base.b)
+        self.base = base
+        self.remap = remap
+        self.delta = delta
+        live = [old_id for old_id, new_id in enumerate(remap) if new_id != NO_DOC]
+        self.doc_count = len(live) + delta.doc_count
+        self.total_length = sum(map(base.doc_lengths.__getitem__, live)) + delta.total_length
+
+    def _segments(self) -> List[Tuple[SearchIndex, Optional[array]]]:
+        return [(self.base, self.remap), (self.delta, None)]
+
+    def memory_usage(self) -> int:
+        return self.base.memory_usage() + self.delta.memory_usage() + len(self.remap) * self.remap.itemsize
+
+
+class SearchIndexBuilder:
+    """Collects postings as flat columns, then sorts them into CSR form
+
+    Documents may be added in any order once their node is complete, so an
+    index can be built while a store is still being loaded.
+    """
+
+    def __init__(self, store: TripleStore, k1: float = 1.5, b: float = 0.75):
+        self.store = store
+        self.k1 = k1
+        self.b = b
+        self.token_ids: Dict[str, int] = {}
+        self.token_column = array("I")
+        self.doc_column = array("I")
+        self.tf_column = array("I")
+        self.field_ids: Dict[str, int] = {}
+        self.field_key_column = array("I")
+        self.field_doc_column = array("I")
+        self.doc_lengths = array("I")
+        self.doc_count = 0
+        self.total_length = 0
+
+    def add_document(self, node_id: int):
+        store = self.store
+        terms = store.terms
+        key = str(terms[store.node_key[node_id]])
+        # The node's own name is repeated so key matches outrank value matches
+        parts = [key, key]
+        if len(key) <= MAX_FIELD_VALUE_LENGTH:
+            self._add_field(f"{key.lower()}{FIELD_SEPARATOR}{NAME_FIELD}", node_id)
+
+        start = store.node_start[node_id]
+        for position in range(start, start + store.node_size[node_id]):
+            field = terms[store.predicates[position]]
+            obj = store.objects[position]
+            if obj & 1:
+                child = obj >> 1
+                if store.node_kind[child] == DICT_NODE:
+                    # Nested dicts are indexed as documents of their own
+                    continue
+                parts.append(str(field))
+                parts.extend(str(item) for item in NodeView(store, child).values()
+                             if not isinstance(item, NodeView))
+                continue
+            text = str(terms[obj >> 1])
+            parts.append(str(field))
+            parts.append(text)
+            if len(text) <= MAX_FIELD_VALUE_LENGTH:
+                self._add_field(f"{text.lower()}{FIELD_SEPARATOR}{field}", node_id)
+
+        tokens = tokenize(" ".join(parts))
+        token_ids = self.token_ids
+        for token, count in Counter(tokens).items():
+            self.token_column.append(token_ids.setdefault(token, len(token_ids)))
+            self.doc_column.append(node_id)
+            self.tf_column.append(count)
+
+        self._pad_lengths(node_id + 1)
+        self.doc_lengths[node_id] = len(tokens)
+        self.doc_count += 1
+        self.total_length += len(tokens)
+
+    def _add_field(self, field_key: str, node_id: int):
+        self.field_key_column.append(self.field_ids.setdefault(field_key, len(self.field_ids)))
+        self.field_doc_column.append(node_id)
+
+    def _pad_lengths(self, size: int):
+        missing = size - len(self.doc_lengths)
+        if missing > 0:
+            self.doc_lengths.frombytes(bytes(4 * missing))
+
+    def finish(self) -> SearchIndex:
+        """Freeze the collected postings into a SearchIndex"""
+        index = SearchIndex(self.store, k1=self.k1, b=self.b)
+        self._pad_lengths(self.store.node_count)
+        index.vocabulary, index.posting_offsets, (index.posting_docs, index.posting_tfs) = _to_csr(
+            self.token_ids, self.token_column, [self.doc_column, self.tf_column])
+        self.token_ids, self.token_column, self.doc_column, self.tf_column = {}, array("I"), array("I"), array("I")
+        index.field_keys, index.field_offsets, (index.field_docs,) = _to_csr(
+            self.field_ids, self.field_key_column, [self.field_doc_column])
+        self.field_ids, self.field_key_column, self.field_doc_column = {}, array("I"), array("I")
+        index.doc_lengths = self.doc_lengths
+        index.doc_count = self.doc_count
+        index.total_length = self.total_length
+        return index
+
+
+def _remapped(doc_ids: Any, remap: Optional[array]) -> Any:
+    """Translate segment doc ids, dropping ones that no longer exist"""
+    if remap is None:
+        return doc_ids
+    return [remap[doc_id] for doc_id in doc_ids if remap[doc_id] != NO_DOC]
+
+
+def _to_csr(keys: Dict[str, int], key_column: array, value_columns: List[array]):
+    """Counting-sort rows by key string into (PackedStrings, offsets, columns)
+
+    Rows keep the order they were added in within each key, and all
+    intermediate state lives in flat arrays rather than Python lists.
+    """
+    ordered_keys = sorted(keys)
+    rank = array("I", bytes(4 * len(keys)))
+    for position, key in enumerate(ordered_keys):
+        rank[keys[key]] = position
+    packed = PackedStrings(ordered_keys)
+    del ordered_keys
+
+    counts = array("I", bytes(4 * len(rank)))
+    for key_id in key_column:
+        counts[rank[key_id]] += 1
+    offsets = array("I", [0])
+    total = 0
+    for count in counts:
+        total += count
+        offsets.append(total)
+
+    cursor = offsets[:-1]
+    sorted_columns = [array(column.typecode, bytes(column.itemsize * len(column))) for column in value_columns]
+    pairs = list(zip(value_columns, sorted_columns))
+    for row, key_id in enumerate(key_column):
+        position = cursor[rank[key_id]]
+        cursor[rank[key_id]] = position + 1
+        for column, target in pairs:
+            target[position] = column[row]
+    return packed, offsets, sorted_columns
@@ -0,0 +1,219 @@
+"""
+Binary snapshot sidecars for parsed and indexed ontologies
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from .search_index import PackedStrings, SearchIndex
+from .triple_store import TermTable, TripleStore
+
+SNAPSHOT_MAGIC = b"ONTOSNAP"
+SNAPSHOT_VERSION = 4
+SNAPSHOT_SUFFIX = ".snap"
+HASH_CHUNK_SIZE = 1 << 20
+ALIGNMENT = 8
+# Spare header bytes, so the source stamp can be rewritten in place when only the mtime changed
+HEADER_SLACK = 64
+
+_PREFIX = struct.Struct("<8sII")
+
+# (section name, owner, attribute); owners are resolved against the store and index
+STORE_SECTIONS = [
+    ("terms.blob", "terms", "blob"),
+    ("terms.offsets", "terms", "offsets"),
+    ("terms.kinds", "terms", "kinds"),
+    ("subjects", "store", "subjects"),
+    ("predicates", "store", "predicates"),
+    ("objects", "store", "objects"),
+    ("node_kind", "store", "node_kind"),
+    ("node_start", "store", "node_start"),
+    ("node_size", "store", "node_size"),
+    ("node_parent", "store", "node_parent"),
+    ("node_key", "store", "node_key"),
+    ("node_digest", "store", "node_digest"),
+]
+INDEX_SECTIONS = [
+    ("vocabulary.blob", "vocabulary", "blob"),
+    ("vocabulary.offsets", "vocabulary", "offsets"),
+    ("posting_offsets", "index", "posting_offsets"),
+    ("posting_docs", "index", "posting_docs"),
+    ("posting_tfs", "index", "posting_tfs"),
+    ("field_keys.blob", "field_keys", "blob"),
+    ("field_keys.offsets", "field_keys", "offsets"),
+    ("field_offsets", "index", "field_offsets"),
+    ("field_docs", "index", "field_docs"),
+    ("doc_lengths", "index", "doc_lengths"),
+]
+
+
+def snapshot_path(source_path: str) -> str:
+    """Sidecar path for a source file, e.g. ``storage/company.json.snap``"""
+    return source_path + SNAPSHOT_SUFFIX
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_stamp(path: str) -> Dict[str, Any]:
+    """Size and mtime of a source file; take it before parsing and pass it to ``save_snapshot``"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _owners(store: TripleStore, index: SearchIndex) -> Dict[str, Any]:
+    return {"store": store, "terms": store.terms, "index": index,
+            "vocabulary": index.vocabulary, "field_keys": index.field_keys}
+
+
+def save_snapshot(source_path: str, store: TripleStore, index: SearchIndex,
+                  source: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Write a snapshot of store and index next to source_path
+
+    ``source`` is the ``source_stamp`` of the file taken before it was
+    parsed. If the file has changed since, nothing is written and None is
+    returned: the snapshot would record the new file but hold the old
+    content, and validate as current. Without it the file is stamped now.
+    The source is hashed here, only when a snapshot is written, and is
+    stamped again afterwards to catch a change during hashing. The file is
+    written under a temporary name and renamed into place, so readers never
+    see a partial snapshot.
+    """
+    if source is None:
+        source = source_stamp(source_path)
+    digest = file_digest(source_path)
+    if source_stamp(source_path) != {"size": source["size"], "mtime_ns": source["mtime_ns"]}:
+        return None
+    source = {"size": source["size"], "mtime_ns": source["mtime_ns"], "sha256": digest}
+    owners = _owners(store, index)
+    columns: List[Tuple[str, memoryview]] = []
+    for name, owner, attribute in STORE_SECTIONS + INDEX_SECTIONS:
+        columns.append((name, memoryview(getattr(owners[owner], attribute))))
+    columns.append(("key_terms", memoryview(array("I", store.key_ids.values()))))
+
+    sections: Dict[str, List[Any]] = {}
+    offset = 0
+    for name, column in columns:
+        sections[name] = [offset, column.nbytes, column.format]
+        offset += _padded(column.nbytes)
+
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "itemsizes": {code: array(code).itemsize for code in "IQ"},
+        "source": source,
+        "index": {"doc_count": index.doc_count, "total_length": index.total_length,
+                  "k1": index.k1, "b": index.b},
+        "sections": sections,
+    }).encode("utf-8") + b" " * HEADER_SLACK
+    data_start = _padded(_PREFIX.size + len(header))
+
+    path = snapshot_path(source_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            f.write(bytes(data_start - _PREFIX.size - len(header)))
+            for name, column in columns:
+                f.write(column.cast("B") if column.format != "B" else column)
+                f.write(bytes(_padded(column.nbytes) - column.nbytes))
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path
+
+
+def load_snapshot(source_path: str) -> Optional[Tuple[TripleStore, SearchIndex]]:
+    """Map a snapshot of source_path, or return None if it is missing or stale
+
+    A snapshot is current when its recorded size and mtime match the source.
+    If only the mtime differs, the source is re-hashed and the snapshot is
+    still used when the content is unchanged; its stamp is then updated to
+    the new mtime, so the next load does not hash again. Sections are
+    ``memoryview`` casts over a read-only mmap, so nothing is copied until
+    it is read.
+    """
+    path = snapshot_path(source_path)
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return None
+
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            return None
+        magic, version, header_length = _PREFIX.unpack(prefix)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        header = json.loads(f.read(header_length))
+        if (header["byteorder"] != sys.byteorder
+                or header["itemsizes"] != {code: array(code).itemsize for code in "IQ"}):
+            return None
+
+        source = header["source"]
+        stat = os.stat(source_path)
+        if stat.st_size != source["size"]:
+            return None
+        if stat.st_mtime_ns != source["mtime_ns"]:
+            if file_digest(source_path) != source["sha256"]:
+                return None
+            _restamp(path, header, header_length, stat.st_mtime_ns)
+
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data_start = _padded(_PREFIX.size + header_length)
+    view = memoryview(mapped)
+
+    def section(name: str) -> memoryview:
+        offset, length, code = header["sections"][name]
+        start = data_start + offset
+        return view[start:start + length].cast(code)
+
+    store = TripleStore()
+    index = SearchIndex(store, k1=header["index"]["k1"], b=header["index"]["b"])
+    index.vocabulary = PackedStrings()
+    index.field_keys = PackedStrings()
+    store.terms = TermTable()
+    owners = _owners(store, index)
+    for name, owner, attribute in STORE_SECTIONS + INDEX_SECTIONS:
+        setattr(owners[owner], attribute, section(name))
+    index.doc_count = header["index"]["doc_count"]
+    index.total_length = header["index"]["total_length"]
+
+    for term_id in section("key_terms"):
+        key = store.terms[term_id]
+        store.key_ids[key] = term_id
+        store.terms.pin(term_id, key)
+    return store, index
+
+
+def _restamp(path: str, header: Dict[str, Any], header_length: int, mtime_ns: int):
+    """Record a new source mtime in a snapshot's header, in place, when it still fits"""
+    header = dict(header, source=dict(header["source"], mtime_ns=mtime_ns))
+    encoded = json.dumps(header).encode("utf-8")
+    if len(encoded) > header_length:
+        return
+    try:
+        with open(path, "r+b") as f:
+            f.seek(_PREFIX.size)
+            f.write(encoded.ljust(header_length))
+    except OSError:
+        # A read-only storage directory only costs a hash per load
+        pass
+
+
+def _padded(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
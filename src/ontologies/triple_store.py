@@ -0,0 +1,396 @@
+"""
+Compact interned triple store for ontology data
+"""
+
+import re
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DICT_NODE = 0
+LIST_NODE = 1
+NO_PARENT = 0xFFFFFFFF
+
+STR_TERM = 0
+INT_TERM = 1
+FLOAT_TERM = 2
+TRUE_TERM = 3
+FALSE_TERM = 4
+NULL_TERM = 5
+
+# Bound on the builder's intern table; once full it is reset, so very large
+# loads keep bounded memory at the cost of some duplicate terms.
+INTERN_LIMIT = 1 << 16
+
+
+class TermTable:
+    """Append-only table of scalar terms packed into one UTF-8 buffer
+
+    Terms are decoded on access. Keys are pinned as decoded Python values
+    because they are read far more often than values.
+    """
+
+    def __init__(self):
+        self.blob = bytearray()
+        self.offsets = array("Q", [0])
+        self.kinds = bytearray()
+        self.pinned: Dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def append(self, value: Any) -> int:
+        term_id = len(self.kinds)
+        if isinstance(value, str):
+            kind, raw = STR_TERM, value.encode("utf-8")
+        elif value is True:
+            kind, raw = TRUE_TERM, b""
+        elif value is False:
+            kind, raw = FALSE_TERM, b""
+        elif value is None:
+            kind, raw = NULL_TERM, b""
+        elif isinstance(value, int):
+            kind, raw = INT_TERM, str(value).encode("ascii")
+        elif isinstance(value, float):
+            kind, raw = FLOAT_TERM, repr(value).encode("ascii")
+        else:
+            kind, raw = STR_TERM, str(value).encode("utf-8")
+        self.blob += raw
+        self.offsets.append(len(self.blob))
+        self.kinds.append(kind)
+        return term_id
+
+    def __getitem__(self, term_id: int) -> Any:
+        pinned = self.pinned.get(term_id)
+        if pinned is not None:
+            return pinned
+        kind = self.kinds[term_id]
+        raw = self.blob[self.offsets[term_id]:self.offsets[term_id + 1]]
+        if kind == STR_TERM:
+            return str(raw, "utf-8")
+        if kind == INT_TERM:
+            return int(str(raw, "ascii"))
+        if kind == FLOAT_TERM:
+            return float(str(raw, "ascii"))
+        if kind == TRUE_TERM:
+            return True
+        if kind == FALSE_TERM:
+            return False
+        return None
+
+    def pin(self, term_id: int, value: Any):
+        self.pinned[term_id] = value
+
+    def memory_usage(self) -> int:
+        return (len(self.blob) + len(self.offsets) * self.offsets.itemsize + len(self.kinds)
+                + sys.getsizeof(self.pinned))
+
+
+class NodeView:
+    """Read-only, dict/list-like view of one node in a TripleStore"""
+
+    __slots__ = ("store", "node_id")
+
+    def __init__(self, store: "TripleStore", node_id: int):
+        self.store = store
+        self.node_id = node_id
+
+    @property
+    def is_list(self) -> bool:
+        return self.store.node_kind[self.node_id] == LIST_NODE
+
+    def __len__(self) -> int:
+        return self.store.node_size[self.node_id]
+
+    def __iter__(self):
+        if self.is_list:
+            return iter(self.values())
+        return iter(self.keys())
+
+    def __repr__(self) -> str:
+        return repr(self.to_python())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, NodeView):
+            return self.store is other.store and self.node_id == other.node_id
+        return self.to_python() == other
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.node_id))
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        store = self.store
+        terms = store.terms
+        start = store.node_start[self.node_id]
+        for position in range(start, start + store.node_size[self.node_id]):
+            yield terms[store.predicates[position]], store.decode(store.objects[position])
+
+    def keys(self) -> List[Any]:
+        return [key for key, _ in self.items()]
+
+    def values(self) -> List[Any]:
+        return [value for _, value in self.items()]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        store = self.store
+        start = store.node_start[self.node_id]
+        positions = range(start, start + store.node_size[self.node_id])
+        key_id = store.key_ids.get(key)
+        if key_id is not None:
+            for position in positions:
+                if store.predicates[position] == key_id:
+                    return store.decode(store.objects[position])
+        # Keys of nested dicts (e.g. instance names) are not registered,
+        # so fall back to comparing decoded keys
+        for position in positions:
+            if store.terms[store.predicates[position]] == key:
+                return store.decode(store.objects[position])
+        return default
+
+    def __getitem__(self, key: Any) -> Any:
+        if self.is_list:
+            store = self.store
+            if not 0 <= key < len(self):
+                raise IndexError(key)
+            return store.decode(store.objects[store.node_start[self.node_id] + key])
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Any) -> bool:
+        missing = object()
+        return self.get(key, missing) is not missing
+
+    @property
+    def key(self) -> Any:
+        """The key (or list index) this node is stored under in its parent"""
+        return self.store.terms[self.store.node_key[self.node_id]]
+
+    @property
+    def parent(self) -> Optional["NodeView"]:
+        parent_id = self.store.node_parent[self.node_id]
+        return None if parent_id == NO_PARENT else NodeView(self.store, parent_id)
+
+    def to_python(self) -> Any:
+        """Materialize this node as plain dicts and lists"""
+        if self.is_list:
+            return [value.to_python() if isinstance(value, NodeView) else value for value in self.values()]
+        return {key: value.to_python() if isinstance(value, NodeView) else value for key, value in self.items()}
+
+
+class TripleStore:
+    """Interned, column-oriented storage for a JSON-shaped ontology
+
+    Every dict and list in the ontology is a node. Each key/value pair is a
+    (subject node, predicate term, object) triple held in three parallel
+    ``array('I')`` columns, and every distinct key and scalar value is stored
+    once in the packed ``terms`` table. An object is either a term id or a child node id,
+    told apart by its lowest bit. A node's triples are contiguous, so node
+    lookups are a slice of the columns rather than a dict per node.
+    """
+
+    def __init__(self):
+        self.terms = TermTable()
+        self.key_ids: Dict[Any, int] = {}
+        self.subjects = array("I")
+        self.predicates = array("I")
+        self.objects = array("I")
+        self.node_kind = bytearray()
+        self.node_start = array("I")
+        self.node_size = array("I")
+        self.node_parent = array("I")
+        self.node_key = array("I")
+        # Content digest of a node's source text where the loader knows it, else 0
+        self.node_digest = array("Q")
+
+    @classmethod
+    def from_python(cls, data: Any) -> "TripleStore":
+        """Build a store from a parsed JSON structure"""
+        builder = TripleStoreBuilder()
+        builder.add_value(data)
+        return builder.finish()
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_kind)
+
+    @property
+    def root(self) -> Optional[NodeView]:
+        return NodeView(self, 0) if self.node_kind else None
+
+    def node(self, node_id: int) -> NodeView:
+        return NodeView(self, node_id)
+
+    def decode(self, obj: int) -> Any:
+        if obj & 1:
+            return NodeView(self, obj >> 1)
+        return self.terms[obj >> 1]
+
+    def path(self, node_id: int) -> str:
+        """Dotted path of a node, e.g. ``ontology.instances.john_doe``"""
+        parts = []
+        while node_id != NO_PARENT and self.node_parent[node_id] != NO_PARENT:
+            parent = self.node_parent[node_id]
+            key = self.terms[self.node_key[node_id]]
+            parts.append(f"[{key}]" if self.node_kind[parent] == LIST_NODE else f".{key}")
+            node_id = parent
+        return "".join(reversed(parts)).lstrip(".")
+
+    def resolve(self, path: str) -> Optional[int]:
+        """Node id at a dotted path produced by ``path``, or None"""
+        node = self.root
+        for part in re.findall(r"\[\d+\]|[^.\[\]]+", path):
+            if not isinstance(node, NodeView):
+                return None
+            try:
+                node = node[int(part[1:-1])] if part.startswith("[") else node[part]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return node.node_id if isinstance(node, NodeView) else None
+
+    def is_descendant(self, node_id: int, ancestor: int) -> bool:
+        """Whether node_id lies strictly below ancestor
+
+        Node ids are assigned in pre-order, so parents always have smaller
+        ids than their children and the walk stops early.
+        """
+        while node_id > ancestor:
+            node_id = self.node_parent[node_id]
+            if node_id == ancestor:
+                return True
+            if node_id == NO_PARENT:
+                return False
+        return False
+
+    def children(self, node_id: int) -> Iterator[int]:
+        """Ids of the direct child nodes of a node"""
+        start = self.node_start[node_id]
+        for position in range(start, start + self.node_size[node_id]):
+            obj = self.objects[position]
+            if obj & 1:
+                yield obj >> 1
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the store"""
+        size = sum(len(column) * column.itemsize for column in
+                   (self.subjects, self.predicates, self.objects, self.node_start,
+                    self.node_size, self.node_parent, self.node_key, self.node_digest))
+        size += len(self.node_kind)
+        size += self.terms.memory_usage()
+        size += sys.getsizeof(self.key_ids)
+        return size
+
+
+class TripleStoreBuilder:
+    """Incrementally builds a TripleStore
+
+    Containers are opened with ``begin_dict``/``begin_list`` and filled with
+    ``add``; a container's triples are written when it is closed with
+    ``end``, which keeps each node's triples contiguous even when children
+    are streamed in between.
+    """
+
+    def __init__(self):
+        self.store = TripleStore()
+        # Strings are keyed by themselves; other scalars by (type, value) so
+        # that 1, 1.0 and True stay distinct terms
+        self._term_ids: Dict[Any, int] = {}
+        self._open: Dict[int, Tuple[array, array]] = {}
+
+    def intern(self, value: Any) -> int:
+        key = value if type(value) is str else (type(value), value)
+        term_id = self._term_ids.get(key)
+        if term_id is None:
+            if len(self._term_ids) >= INTERN_LIMIT:
+                self._term_ids.clear()
+            term_id = self.store.terms.append(value)
+            self._term_ids[key] = term_id
+        return term_id
+
+    def intern_key(self, key: Any) -> int:
+        """Intern a field name; field names keep a single, pinned id for the life of the store
+
+        Only keys of scalar values are registered. Keys of nested nodes are
+        usually entity names, which are numerous and rarely looked up.
+        """
+        store = self.store
+        term_id = store.key_ids.get(key)
+        if term_id is None:
+            term_id = self.intern(key)
+            store.key_ids[key] = term_id
+            store.terms.pin(term_id, key)
+        return term_id
+
+    def begin_dict(self, parent: Optional[int] = None, key: Any = None) -> int:
+        return self._begin(DICT_NODE, parent, key)
+
+    def begin_list(self, parent: Optional[int] = None, key: Any = None) -> int:
+        return self._begin(LIST_NODE, parent, key)
+
+    def _begin(self, kind: int, parent: Optional[int], key: Any) -> int:
+        store = self.store
+        node_id = len(store.node_kind)
+        store.node_kind.append(kind)
+        store.node_start.append(0)
+        store.node_size.append(0)
+        store.node_parent.append(NO_PARENT if parent is None else parent)
+        store.node_key.append(0 if parent is None else self.intern(key))
+        store.node_digest.append(0)
+        self._open[node_id] = (array("I"), array("I"))
+        return node_id
+
+    def add(self, node_id: int, key: Any, value: Any = None, child: Optional[int] = None):
+        """Add a scalar value, or a child node id, under key"""
+        predicates, objects = self._open[node_id]
+        if child is None and self.store.node_kind[node_id] == DICT_NODE:
+            predicates.append(self.intern_key(key))
+        else:
+            predicates.append(self.intern(key))
+        objects.append(child << 1 | 1 if child is not None else self.intern(value) << 1)
+
+    def end(self, node_id: int):
+        store = self.store
+        predicates, objects = self._open.pop(node_id)
+        store.node_start[node_id] = len(store.subjects)
+        store.node_size[node_id] = len(predicates)
+        store.subjects.extend(array("I", [node_id]) * len(predicates))
+        store.predicates.extend(predicates)
+        store.objects.extend(objects)
+
+    def add_value(self, value: Any, parent: Optional[int] = None, key: Any = None) -> Optional[int]:
+        """Add a whole Python value, returning its node id for containers"""
+        if not isinstance(value, (dict, list)):
+            if parent is not None:
+                self.add(parent, key, value)
+            return None
+
+        root = self._begin(DICT_NODE if isinstance(value, dict) else LIST_NODE, parent, key)
+        # Iterative depth-first walk, so deep trees do not hit the recursion limit
+        stack = [(root, iter(value.items() if isinstance(value, dict) else enumerate(value)))]
+        while stack:
+            node_id, entries = stack[-1]
+            for entry_key, entry in entries:
+                if isinstance(entry, (dict, list)):
+                    child = self._begin(DICT_NODE if isinstance(entry, dict) else LIST_NODE, node_id, entry_key)
+                    self.add(node_id, entry_key, child=child)
+                    stack.append((child, iter(entry.items() if isinstance(entry, dict) else enumerate(entry))))
+                    break
+                self.add(node_id, entry_key, entry)
+            else:
+                stack.pop()
+                self.end(node_id)
+        if parent is not None:
+            self.add(parent, key, child=root)
+        return root
+
+    def finish(self) -> TripleStore:
+        """Close any open nodes and return the store"""
+        for node_id in sorted(self._open, reverse=True):
+            self.end(node_id)
+        self._term_ids = {}
+        return self.store
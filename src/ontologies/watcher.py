@@ -0,0 +1,67 @@
+"""
+Polling file watcher that hot-reloads changed ontologies
+"""
+
+import os
+import threading
+from typing import Optional
+
+from .manager import OntologyManager
+from .ontology_loader import file_fingerprint
+
+DEFAULT_POLL_INTERVAL = float(os.getenv("ONTOLOGY_WATCH_INTERVAL", "0"))
+
+
+class OntologyWatcher:
+    """Watches a storage directory and reloads resident ontologies when their file changes
+
+    Polling uses only ``os.stat`` so it needs no platform-specific
+    dependency. New files are registered with the manager; resident
+    ontologies whose file differs from the loaded version are reloaded
+    incrementally in the watcher thread, and requests keep being served
+    from the previous state meanwhile. Evicted ontologies need nothing:
+    they are re-read on next use, since their snapshot no longer matches.
+    """
+
+    def __init__(self, manager: OntologyManager, directory: str, interval: float = 2.0):
+        self.manager = manager
+        self.directory = directory
+        self.interval = interval
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start polling in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ontology-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> int:
+        """Check every resident ontology once; returns the number reloaded"""
+        reloaded = 0
+        try:
+            self.manager.discover(self.directory)
+        except OSError as e:
+            print(f"Error scanning ontology storage: {e}")
+        for name, loader in self.manager.resident():
+            state = loader.state
+            try:
+                changed = file_fingerprint(state.path) != state.fingerprint
+            except OSError:
+                continue
+            if changed and self.manager.reload_ontology(name):
+                reloaded += 1
+        self.reloads += reloaded
+        return reloaded
@@ -0,0 +1,199 @@
+"""
+Content-addressed on-disk cache of pipeline step outputs
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Directory for cached step outputs; empty disables caching
+DEFAULT_CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", "")
+DEFAULT_MAX_BYTES = int(os.getenv("PIPELINE_CACHE_MB", "1024")) * 1024 * 1024
+SUFFIX = ".pkl"
+
+_MISSING = object()
+
+
+def function_digest(function: Callable, version: str = "") -> str:
+    """Identity of a step function: qualified name, declared version and source code
+
+    Editing the function's body changes the digest by itself; bump
+    ``version`` when behaviour changes through code it calls.
+    """
+    name = f"{getattr(function, '__module__', '')}.{getattr(function, '__qualname__', repr(function))}"
+    try:
+        code = inspect.getsource(function)
+    except (OSError, TypeError):
+        code = getattr(getattr(function, "__code__", None), "co_code", b"").hex()
+    return hashlib.sha256(json.dumps([name, version, code]).encode("utf-8")).hexdigest()
+
+
+class _HashWriter:
+    """File-like sink that hashes what is written to it instead of keeping it"""
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        return len(data)
+
+
+def value_digest(value: Any) -> Optional[str]:
+    """Hash of a pipeline input, or None when it cannot be pickled
+
+    The pickle stream is hashed frame by frame as it is produced, so a
+    large input is never serialized into one bytes object.
+    """
+    writer = _HashWriter()
+    try:
+        pickle.Pickler(writer, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+    except Exception:
+        return None
+    return writer.digest.hexdigest()
+
+
+def step_key(function: str, params: Dict[str, Any], inputs: List[str]) -> str:
+    """Key of one step output: function digest, parameters and the digests of what it reads
+
+    ``inputs`` is the pipeline input's digest for a root step, or the keys
+    of its dependencies otherwise, so a key covers the whole upstream chain
+    without hashing intermediate outputs.
+    """
+    payload = json.dumps([function, params, inputs], sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StepCache:
+    """Pickled step outputs in ``directory``, evicted least recently used beyond ``max_bytes``
+
+    Every output is written to a temporary file and renamed into place as
+    soon as its step completes, so the cache doubles as the checkpoint of
+    an interrupted run: running the pipeline again picks up every step
+    that had finished.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key -> (size, last used)
+        self.entries: Dict[str, Tuple[int, float]] = {}
+        self.total_bytes = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + SUFFIX)
+
+    def _scan(self):
+        """Index outputs left by earlier runs"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(SUFFIX):
+                        stat = entry.stat()
+                        self.entries[entry.name[:-len(SUFFIX)]] = (stat.st_size, stat.st_mtime)
+                        self.total_bytes += stat.st_size
+        except OSError as e:
+            print(f"Error reading pipeline cache {self.directory}: {e}")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get(self, key: str) -> Any:
+        """The cached output; test the result with ``is_missing`` first"""
+        if key not in self.entries:
+            self._count("misses")
+            return _MISSING
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except Exception as e:
+            print(f"Error reading cached step output {path}: {e}")
+            self._count("errors")
+            self._remove(key)
+            return _MISSING
+        with self._lock:
+            if key in self.entries:
+                self.entries[key] = (self.entries[key][0], time.time())
+            self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: Any) -> bool:
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(temporary)
+            if size > self.max_bytes:
+                os.remove(temporary)
+                return False
+            os.replace(temporary, path)
+        except Exception as e:
+            print(f"Error caching step output {path}: {e}")
+            self._count("errors")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return False
+        with self._lock:
+            previous = self.entries.get(key)
+            self.total_bytes += size - (previous[0] if previous else 0)
+            self.entries[key] = (size, time.time())
+            self.stats["stores"] += 1
+        self._evict()
+        return True
+
+    def _remove(self, key: str):
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[0]
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            victims = []
+            surplus = self.total_bytes - self.max_bytes
+            for key, (size, _) in sorted(self.entries.items(), key=lambda item: item[1][1]):
+                if surplus <= 0:
+                    break
+                victims.append(key)
+                surplus -= size
+        for key in victims:
+            self._remove(key)
+            self._count("evictions")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def clear(self):
+        for key in list(self.entries):
+            self._remove(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"directory": self.directory, "entries": len(self.entries), "bytes": self.total_bytes,
+                    "max_bytes": self.max_bytes, **self.stats}
+
+
+def is_missing(value: Any) -> bool:
+    return value is _MISSING
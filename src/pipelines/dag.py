@@ -0,0 +1,269 @@
+"""
+Dependency-graph scheduling of pipeline steps over thread and process pools
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache import StepCache, is_missing, step_key, value_digest
+
+EXECUTORS = ("thread", "process", "inline")
+
+
+class PipelineError(Exception):
+    """A pipeline definition that cannot run: unknown steps or functions, or a dependency cycle"""
+
+
+class PipelineStep:
+    """One node of a pipeline: a registered function, its parameters and the steps it depends on"""
+
+    def __init__(self, name: str, function: str, depends_on: Optional[List[str]] = None,
+                 params: Optional[Dict[str, Any]] = None, executor: Optional[str] = None, position: int = 0,
+                 cache: bool = True):
+        self.name = name
+        self.function = function
+        self.depends_on = list(depends_on or [])
+        self.params = dict(params or {})
+        self.executor = executor
+        self.position = position
+        self.cache = cache
+
+    @classmethod
+    def from_dict(cls, step: Dict[str, Any], position: int) -> "PipelineStep":
+        """Build a step from its definition; the function defaults to the step name
+
+        ``"cache": false`` keeps a step with side effects, or a
+        nondeterministic one, and everything downstream of it out of the
+        step cache.
+        """
+        name = step.get("name", f"Step {position + 1}")
+        depends_on = step.get("depends_on", [])
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        return cls(name, step.get("function", name), depends_on, step.get("params"), step.get("executor"),
+                   position, step.get("cache", True))
+
+
+def plan(steps: List[PipelineStep], functions: Dict[str, Callable]) -> List[PipelineStep]:
+    """Validate a pipeline and return its steps in a topological order
+
+    Raises ``PipelineError`` on duplicate names, dependencies on unknown
+    steps, unregistered functions, unknown executors or cycles.
+    """
+    by_name: Dict[str, PipelineStep] = {}
+    for step in steps:
+        if step.name in by_name:
+            raise PipelineError(f"Duplicate step '{step.name}'")
+        by_name[step.name] = step
+    for step in steps:
+        if step.function not in functions:
+            raise PipelineError(f"Step '{step.name}' uses unregistered function '{step.function}'")
+        if step.executor is not None and step.executor not in EXECUTORS:
+            raise PipelineError(f"Step '{step.name}' has unknown executor '{step.executor}'")
+        for dependency in step.depends_on:
+            if dependency not in by_name:
+                raise PipelineError(f"Step '{step.name}' depends on unknown step '{dependency}'")
+
+    # Kahn's algorithm, keeping the declared order among ready steps
+    remaining = {step.name: len(set(step.depends_on)) for step in steps}
+    dependents: Dict[str, List[str]] = {step.name: [] for step in steps}
+    for step in steps:
+        for dependency in set(step.depends_on):
+            dependents[dependency].append(step.name)
+    ready = [step.name for step in steps if remaining[step.name] == 0]
+    ordered: List[PipelineStep] = []
+    while ready:
+        name = ready.pop(0)
+        ordered.append(by_name[name])
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    if len(ordered) != len(steps):
+        cycle = sorted(name for name, count in remaining.items() if count > 0)
+        raise PipelineError(f"Dependency cycle between steps: {', '.join(cycle)}")
+    return ordered
+
+
+def step_input(step: PipelineStep, data: Any, outputs: Dict[str, Any]) -> Any:
+    """What a step receives: the pipeline input, its single dependency's output, or a dict of them"""
+    if not step.depends_on:
+        return data
+    if len(step.depends_on) == 1:
+        return outputs[step.depends_on[0]]
+    return {dependency: outputs[dependency] for dependency in step.depends_on}
+
+
+def _timed_call(function: Callable, value: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a step function, timing it where it runs (also inside a worker process)"""
+    started = time.time()
+    clock = time.perf_counter()
+    result = function(value, **params)
+    return {"result": result, "started": started, "seconds": time.perf_counter() - clock, "pid": os.getpid()}
+
+
+class _Inline(Future):
+    """An already finished future, for steps run on the scheduling thread"""
+
+    def __init__(self, function: Callable, *args: Any):
+        super().__init__()
+        try:
+            self.set_result(function(*args))
+        except Exception as e:
+            self.set_exception(e)
+
+
+class DagRunner:
+    """Runs a planned pipeline, each step as soon as all its dependencies are done
+
+    Ready steps are submitted to the pool their ``executor`` names: threads
+    for I/O-bound work, processes (functions and values must pickle) for
+    CPU-bound work, or inline on the calling thread. Outputs flow along
+    the ``depends_on`` edges. A failed step skips everything downstream of
+    it while independent branches carry on.
+
+    With a ``cache``, a step whose key (function digest, parameters and
+    upstream keys) is already stored is not run again; its output is read
+    back instead, and every computed output is stored as it completes.
+
+    When a worker process dies, its pool is passed to ``on_broken`` so the
+    owner can replace it; the steps it was running fail.
+    """
+
+    def __init__(self, functions: Dict[str, Callable], pools: Dict[str, Callable[[], Executor]],
+                 default_executor: str = "thread", cache: Optional[StepCache] = None,
+                 digests: Optional[Dict[str, str]] = None,
+                 on_broken: Optional[Callable[[Executor], None]] = None):
+        self.functions = functions
+        self.pools = pools
+        self.default_executor = default_executor
+        self.cache = cache
+        self.digests = digests or {}
+        self.on_broken = on_broken
+
+    def keys(self, steps: List[PipelineStep], data: Any) -> Dict[str, Optional[str]]:
+        """Cache key of every planned step; None for steps that cannot be cached"""
+        keys: Dict[str, Optional[str]] = {}
+        data_digest = value_digest(data) if self.cache is not None else None
+        for step in steps:
+            inputs = [keys[dependency] for dependency in step.depends_on] if step.depends_on else [data_digest]
+            digest = self.digests.get(step.function)
+            if not step.cache or digest is None or None in inputs:
+                keys[step.name] = None
+            else:
+                keys[step.name] = step_key(digest, step.params, inputs)
+        return keys
+
+    def _pool(self, step: PipelineStep) -> Optional[Executor]:
+        """The pool a step runs on; None for inline steps"""
+        executor = step.executor or self.default_executor
+        return None if executor == "inline" else self.pools[executor]()
+
+    def _submit(self, step: PipelineStep, value: Any, pool: Optional[Executor]) -> Future:
+        function = self.functions[step.function]
+        if pool is None:
+            return _Inline(_timed_call, function, value, step.params)
+        return pool.submit(_timed_call, function, value, step.params)
+
+    def _failed(self, error: Exception, pool: Optional[Executor]):
+        if isinstance(error, BrokenProcessPool) and pool is not None and self.on_broken is not None:
+            self.on_broken(pool)
+
+    def run(self, steps: List[PipelineStep], data: Any = None) -> Dict[str, Any]:
+        """Execute planned steps; returns per-step status, result and timing plus the outputs by step name"""
+        started = time.time()
+        clock = time.perf_counter()
+        waiting = {step.name: set(step.depends_on) for step in steps}
+        outputs: Dict[str, Any] = {}
+        records: Dict[str, Dict[str, Any]] = {}
+        running: Dict[Future, PipelineStep] = {}
+        pools: Dict[Future, Optional[Executor]] = {}
+        submitted_at: Dict[str, float] = {}
+        keys = self.keys(steps, data)
+        hits = 0
+
+        def record(step: PipelineStep, status: str, **fields: Any):
+            records[step.name] = {"step": step.position + 1, "name": step.name, "status": status,
+                                  "executor": step.executor or self.default_executor, **fields}
+
+        def skip_dependents(failed: str):
+            for step in steps:
+                if step.name not in records and failed in waiting.get(step.name, ()):
+                    waiting.pop(step.name)
+                    record(step, "skipped", error=f"Dependency '{failed}' did not complete")
+                    skip_dependents(step.name)
+
+        def complete(step: PipelineStep, result: Any):
+            outputs[step.name] = result
+            for other in waiting.values():
+                other.discard(step.name)
+
+        def submit_ready():
+            nonlocal hits
+            ready = [step for step in steps if waiting.get(step.name) == set()]
+            while ready:
+                for step in ready:
+                    waiting.pop(step.name)
+                    submitted_at[step.name] = time.perf_counter()
+                    key = keys[step.name]
+                    cached = self.cache.get(key) if key is not None else None
+                    if key is not None and not is_missing(cached):
+                        hits += 1
+                        record(step, "completed", result=cached, cached=True,
+                               duration_ms=round((time.perf_counter() - submitted_at[step.name]) * 1000, 1))
+                        complete(step, cached)
+                        continue
+                    pool = None
+                    try:
+                        pool = self._pool(step)
+                        future = self._submit(step, step_input(step, data, outputs), pool)
+                    except Exception as e:
+                        self._failed(e, pool)
+                        record(step, "failed", error=str(e))
+                        skip_dependents(step.name)
+                        continue
+                    running[future] = step
+                    pools[future] = pool
+                ready = [step for step in steps if waiting.get(step.name) == set()]
+
+        submit_ready()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                pool = pools.pop(future)
+                try:
+                    call = future.result()
+                except Exception as e:
+                    self._failed(e, pool)
+                    record(step, "failed", error=f"{type(e).__name__}: {e}",
+                           duration_ms=round((time.perf_counter() - submitted_at[step.name]) * 1000, 1))
+                    skip_dependents(step.name)
+                    continue
+                if keys[step.name] is not None:
+                    self.cache.put(keys[step.name], call["result"])
+                record(step, "completed", result=call["result"],
+                       started_ms=round((call["started"] - started) * 1000, 1),
+                       duration_ms=round(call["seconds"] * 1000, 1),
+                       queued_ms=round(max(call["started"] - started - (submitted_at[step.name] - clock), 0) * 1000, 1),
+                       pid=call["pid"])
+                complete(step, call["result"])
+            submit_ready()
+
+        elapsed = time.perf_counter() - clock
+        busy = sum(entry.get("duration_ms", 0.0) for entry in records.values()) / 1000
+        ordered = sorted(records.values(), key=lambda entry: entry["step"])
+        result = {
+            "success": all(entry["status"] == "completed" for entry in ordered),
+            "steps": ordered,
+            "outputs": outputs,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            # Summed step time over wall-clock time: how many steps ran side by side on average
+            "parallelism": round(busy / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        if self.cache is not None:
+            result["cache_hits"] = hits
+        return result
@@ -2,15 +2,44 @@
 Pipeline Manager for the AI Module Framework
 """
 
-from typing import Dict, List, Any, Callable
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 import json
+import os
+import threading
+
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, StepCache, function_digest
+from .dag import EXECUTORS, DagRunner, PipelineError, PipelineStep, plan
+from .stream import STREAM_BATCH_SIZE, STREAM_QUEUE_SIZE, StreamRunner, chain
+
+PIPELINE_THREADS = int(os.getenv("PIPELINE_THREADS", str(min(32, (os.cpu_count() or 1) + 4))))
+PIPELINE_PROCESSES = int(os.getenv("PIPELINE_PROCESSES", str(os.cpu_count() or 1)))
 
 class PipelineManager:
-    """Manages data processing pipelines"""
+    """Manages data processing pipelines
+    
+    Steps name a function registered with ``register_step`` and list the
+    steps they need in ``depends_on``; independent steps run concurrently
+    on a thread pool or, for CPU-bound functions, a process pool. With a
+    ``cache_dir``, step outputs are kept on disk and reused by later runs.
+    """
     
-    def __init__(self):
+    def __init__(self, threads: int = PIPELINE_THREADS, processes: int = PIPELINE_PROCESSES,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR or None, cache_bytes: int = DEFAULT_MAX_BYTES):
         self.pipelines: Dict[str, Dict] = {}
         self.pipeline_functions: Dict[str, Callable] = {}
+        self.step_functions: Dict[str, Callable] = {}
+        self.step_executors: Dict[str, str] = {}
+        self.step_digests: Dict[str, str] = {}
+        self.stream_functions: Dict[str, Callable] = {}
+        self.stream_executors: Dict[str, str] = {}
+        self.stream_per_batch: Dict[str, bool] = {}
+        self.threads = threads
+        self.processes = processes
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.cache = StepCache(cache_dir, cache_bytes) if cache_dir else None
     
     def create_pipeline(self, name: str, steps: List[Dict]) -> str:
         """Create a pipeline with steps"""
@@ -26,8 +55,75 @@ class PipelineManager:
         """Register a function for pipeline execution"""
         self.pipeline_functions[name] = function
     
-    def execute_pipeline(self, name: str, data: Any = None) -> Dict[str, Any]:
-        """Execute a pipeline"""
+    def register_step(self, name: str, function: Callable, executor: str = "thread", version: str = ""):
+        """Register a step function: ``function(input, **params)``
+        
+        ``executor`` is "thread" for I/O-bound steps, "process" for
+        CPU-bound ones (the function, its input and output must pickle)
+        or "inline" for trivial ones. A step definition may override it.
+        Cached outputs are tied to the function's source; change
+        ``version`` to invalidate them when the step's behaviour changes
+        some other way.
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}', expected one of {', '.join(EXECUTORS)}")
+        self.step_functions[name] = function
+        self.step_executors[name] = executor
+        self.step_digests[name] = function_digest(function, version)
+    
+    def register_stream_step(self, name: str, function: Callable, per_batch: bool = False,
+                             executor: str = "thread"):
+        """Register a streaming step
+        
+        By default ``function(batches, **params)`` takes an iterator of
+        record lists and yields record lists, so it may filter, split or
+        regroup them. With ``per_batch`` it is ``function(batch, **params)``
+        returning one list, and ``executor="process"`` spreads the batches
+        over the process pool.
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}', expected one of {', '.join(EXECUTORS)}")
+        self.stream_functions[name] = function
+        self.stream_executors[name] = executor
+        self.stream_per_batch[name] = per_batch
+    
+    def _pool(self, executor: str) -> Executor:
+        """The shared pool for an executor kind, started on first use and after a broken one is discarded"""
+        with self._pool_lock:
+            if executor == "process":
+                if self._process_pool is None:
+                    self._process_pool = ProcessPoolExecutor(max_workers=self.processes)
+                return self._process_pool
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="pipeline")
+            return self._thread_pool
+    
+    def _discard_pool(self, pool: Executor):
+        """Drop a process pool whose worker died (OOM kill, crash, os._exit); it refuses all further work"""
+        with self._pool_lock:
+            if pool is not self._process_pool:
+                return
+            self._process_pool = None
+        print("Error: a pipeline worker process died; the next process step starts a new pool")
+        pool.shutdown(wait=False)
+    
+    def _plan(self, pipeline: Dict, functions: Dict[str, Callable], executors: Dict[str, str]) -> List[PipelineStep]:
+        steps = []
+        for i, definition in enumerate(pipeline["steps"]):
+            step = PipelineStep.from_dict(definition, i)
+            if step.executor is None:
+                step.executor = executors.get(step.function)
+            steps.append(step)
+        return plan(steps, functions)
+    
+    def execute_pipeline(self, name: str, data: Any = None, use_cache: bool = True) -> Dict[str, Any]:
+        """Execute a pipeline
+        
+        With the step cache enabled, steps whose function, parameters and
+        inputs are unchanged since an earlier run, including one that
+        crashed partway, return their stored output instead of running.
+        ``use_cache=False`` runs every step without reading or writing the cache.
+        """
         if name not in self.pipelines:
             return {"error": f"Pipeline '{name}' not found"}
         
@@ -41,25 +137,54 @@ class PipelineManager:
             except Exception as e:
                 return {"error": f"Pipeline execution failed: {str(e)}"}
         
-        # Otherwise, simulate step-by-step execution
+        # Otherwise, run the steps as a dependency graph
+        try:
+            steps = self._plan(pipeline, self.step_functions, self.step_executors)
+        except PipelineError as e:
+            return {"error": f"Invalid pipeline '{name}': {str(e)}"}
+        
         try:
-            results = []
-            for i, step in enumerate(pipeline["steps"]):
-                step_result = {
-                    "step": i + 1,
-                    "name": step.get("name", f"Step {i + 1}"),
-                    "status": "completed",
-                    "result": f"Processed: {step}"
-                }
-                results.append(step_result)
-            
-            return {
-                "success": True,
-                "pipeline": name,
-                "steps": results
-            }
+            runner = DagRunner(self.step_functions, {"thread": lambda: self._pool("thread"),
+                                                     "process": lambda: self._pool("process")},
+                                cache=self.cache if use_cache else None, digests=self.step_digests,
+                                on_broken=self._discard_pool)
+            run = runner.run(steps, data)
         except Exception as e:
             return {"error": f"Pipeline execution failed: {str(e)}"}
+        
+        failed = [step["name"] for step in run["steps"] if step["status"] == "failed"]
+        result = {
+            "success": run["success"],
+            "pipeline": name,
+            "steps": run["steps"],
+            "outputs": run["outputs"],
+            "elapsed_ms": run["elapsed_ms"],
+            "parallelism": run["parallelism"]
+        }
+        if "cache_hits" in run:
+            result["cache_hits"] = run["cache_hits"]
+        if failed:
+            result["error"] = f"Steps failed: {', '.join(failed)}"
+        return result
+    
+    def stream_pipeline(self, name: str, records: Iterable[Any], batch_size: int = STREAM_BATCH_SIZE,
+                        queue_size: int = STREAM_QUEUE_SIZE, stats: Optional[Dict[str, Any]] = None) -> Iterator[List[Any]]:
+        """Stream records through a pipeline of streaming steps, yielding output batches as they are ready
+        
+        ``records`` is any iterable, read ``batch_size`` records at a time.
+        The steps must form a chain and run concurrently, one thread each,
+        with at most ``queue_size`` batches waiting between two of them.
+        ``stats`` receives per-step batch and record counts plus the time
+        each step spent working and blocked on the next one. Raises
+        ``PipelineError`` for an unknown or invalid pipeline, or when a
+        step fails while streaming.
+        """
+        if name not in self.pipelines:
+            raise PipelineError(f"Pipeline '{name}' not found")
+        steps = chain(self._plan(self.pipelines[name], self.stream_functions, self.stream_executors))
+        runner = StreamRunner(self.stream_functions, self.stream_per_batch,
+                              {"process": lambda: self._pool("process")}, queue_size, self._discard_pool)
+        return runner.run(steps, records, batch_size, stats)
     
     def list_pipelines(self) -> List[str]:
         """List all pipelines"""
@@ -77,3 +202,19 @@ class PipelineManager:
                 del self.pipeline_functions[name]
             return True
         return False
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Step cache size and hit counts"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+    
+    def shutdown(self):
+        """Stop the worker pools; they are started again on the next execution"""
+        with self._pool_lock:
+            pools = (self._thread_pool, self._process_pool)
+            self._thread_pool = None
+            self._process_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=True)
@@ -0,0 +1,210 @@
+"""
+Streaming pipeline stages connected by bounded queues
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .dag import PipelineError, PipelineStep
+
+STREAM_BATCH_SIZE = 1000
+# Batches buffered between two stages; a full queue blocks the stage feeding it
+STREAM_QUEUE_SIZE = 4
+
+_END = object()
+
+
+class _Failed:
+    """Carries a stage's exception downstream to the consumer"""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+def batches(records: Iterable[Any], size: int = STREAM_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Group records into lists of ``size``, reading only one batch ahead"""
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def chain(steps: List[PipelineStep]) -> List[PipelineStep]:
+    """Check that planned steps form a single line, each fed by the one before"""
+    for previous, step in zip(steps, steps[1:]):
+        if step.depends_on not in ([], [previous.name]):
+            raise PipelineError(f"Streaming step '{step.name}' must depend only on '{previous.name}'")
+    return steps
+
+
+class StageStats:
+    """Batches and records out of one stage, and its time working, waiting for input and blocked on output"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.records = 0
+        self.busy_seconds = 0.0
+        self.waiting_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "batches": self.batches, "records": self.records,
+                "busy_ms": round(self.busy_seconds * 1000, 1), "waiting_ms": round(self.waiting_seconds * 1000, 1),
+                "blocked_ms": round(self.blocked_seconds * 1000, 1)}
+
+
+class StreamRunner:
+    """Runs a chain of streaming steps, one thread per stage
+
+    A stage function is either an iterator transform,
+    ``function(batches, **params)`` yielding output batches, or with
+    ``per_batch`` a plain ``function(batch, **params)`` returning one. A
+    per-batch stage on the "process" executor maps batches over the
+    process pool, at most ``queue_size`` at a time and in order. Every
+    queue between stages holds at most ``queue_size`` batches, so a slow
+    stage stalls the ones before it instead of letting data pile up, and
+    memory stays proportional to batch size times stage count. A process
+    pool whose worker died is passed to ``on_broken`` to be replaced.
+    """
+
+    def __init__(self, functions: Dict[str, Callable], per_batch: Dict[str, bool],
+                 pools: Dict[str, Callable[[], Executor]], queue_size: int = STREAM_QUEUE_SIZE,
+                 on_broken: Optional[Callable[[Executor], None]] = None):
+        self.functions = functions
+        self.per_batch = per_batch
+        self.pools = pools
+        self.queue_size = max(queue_size, 1)
+        self.on_broken = on_broken
+
+    def _transform(self, step: PipelineStep, inputs: Iterator[List[Any]]) -> Iterator[List[Any]]:
+        function = self.functions[step.function]
+        if not self.per_batch.get(step.function):
+            return iter(function(inputs, **step.params))
+        if step.executor == "process":
+            return self._pooled(self.pools["process"](), function, step.params, inputs)
+        return (function(batch, **step.params) for batch in inputs)
+
+    def _pooled(self, pool: Executor, function: Callable, params: Dict[str, Any],
+                inputs: Iterator[List[Any]]) -> Iterator[List[Any]]:
+        pending = []
+        try:
+            for batch in inputs:
+                pending.append(pool.submit(function, batch, **params))
+                if len(pending) >= self.queue_size:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+        except BrokenProcessPool:
+            if self.on_broken is not None:
+                self.on_broken(pool)
+            raise
+
+    def run(self, steps: List[PipelineStep], records: Iterable[Any], batch_size: int = STREAM_BATCH_SIZE,
+            stats: Optional[Dict[str, Any]] = None) -> Iterator[List[Any]]:
+        """Yield the last stage's output batches as they are produced
+
+        Closing the returned generator early stops every stage. With
+        ``stats`` given, per-stage counts and timings are filled in once
+        the stream ends.
+        """
+        stop = threading.Event()
+        stages = [StageStats(step.name) for step in steps]
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(steps) + 1)]
+        started = time.perf_counter()
+
+        def put(target: queue.Queue, item: Any, stage: Optional[StageStats]) -> bool:
+            blocked = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stage is not None:
+                stage.blocked_seconds += time.perf_counter() - blocked
+            return not stop.is_set()
+
+        def read(source: queue.Queue, stage: StageStats) -> Iterator[List[Any]]:
+            while True:
+                clock = time.perf_counter()
+                try:
+                    item = source.get(timeout=0.1)
+                except queue.Empty:
+                    stage.waiting_seconds += time.perf_counter() - clock
+                    if stop.is_set():
+                        return
+                    continue
+                stage.waiting_seconds += time.perf_counter() - clock
+                if item is _END:
+                    return
+                if isinstance(item, _Failed):
+                    # Forward the upstream failure and end this stage's input
+                    put(queues[-1], item, None)
+                    stop.set()
+                    return
+                yield item
+
+        def feed():
+            try:
+                for batch in batches(records, batch_size):
+                    if not put(queues[0], batch, None):
+                        return
+                put(queues[0], _END, None)
+            except Exception as e:
+                put(queues[0], _Failed("input", e), None)
+
+        def work(index: int, step: PipelineStep):
+            stage = stages[index]
+            output = queues[index + 1]
+            try:
+                results = self._transform(step, read(queues[index], stage))
+                while not stop.is_set():
+                    clock = time.perf_counter()
+                    waited = stage.waiting_seconds
+                    try:
+                        batch = next(results)
+                    except StopIteration:
+                        break
+                    finally:
+                        # Time inside the stage's function, less what it spent waiting on the stage before
+                        stage.busy_seconds += time.perf_counter() - clock - (stage.waiting_seconds - waited)
+                    batch = list(batch)
+                    stage.batches += 1
+                    stage.records += len(batch)
+                    if not put(output, batch, stage):
+                        return
+                put(output, _END, stage)
+            except Exception as e:
+                put(queues[-1], _Failed(step.name, e), None)
+                stop.set()
+
+        threads = [threading.Thread(target=feed, name="stream-input", daemon=True)]
+        threads += [threading.Thread(target=work, args=(index, step), name=f"stream-{step.name}", daemon=True)
+                    for index, step in enumerate(steps)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                if isinstance(item, _Failed):
+                    raise PipelineError(f"Streaming step '{item.stage}' failed: "
+                                        f"{type(item.error).__name__}: {item.error}") from item.error
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=1)
+            if stats is not None:
+                stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                stats["stages"] = [stage.to_dict() for stage in stages]
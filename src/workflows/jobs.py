@@ -0,0 +1,308 @@
+"""
+Background job queue for workflows, with a persistent result store
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+WORKFLOW_WORKERS = int(os.getenv("WORKFLOW_WORKERS", "4"))
+WORKFLOW_MAX_QUEUED = int(os.getenv("WORKFLOW_MAX_QUEUED", "100"))
+# Finished jobs are kept this many seconds, and at most WORKFLOW_MAX_RESULTS of them
+WORKFLOW_RESULT_TTL = float(os.getenv("WORKFLOW_RESULT_TTL", "86400"))
+WORKFLOW_MAX_RESULTS = int(os.getenv("WORKFLOW_MAX_RESULTS", "1000"))
+# Sqlite file jobs are persisted to; empty keeps them in memory only
+WORKFLOW_JOBS_PATH = os.getenv("WORKFLOW_JOBS_PATH", "")
+# Progress updates are written to disk at most this often per job
+PROGRESS_SAVE_INTERVAL = 1.0
+
+FINISHED = ("succeeded", "failed", "cancelled", "interrupted")
+COLUMNS = ("id", "workflow", "status", "progress", "message", "inputs", "result", "error",
+           "submitted", "started", "finished")
+
+
+class JobCancelled(Exception):
+    """Raised by ``Job.check`` in a workflow function once its job has been cancelled"""
+
+
+class QueueFull(Exception):
+    """Too many jobs are waiting for a worker"""
+
+
+class Job:
+    """One workflow run: its status, progress and, once finished, result or error
+
+    Workflow functions that take a ``job`` argument get this object and
+    may call ``report`` to publish progress and ``check`` (or read
+    ``cancelled``) between units of work to stop early when cancelled.
+    """
+
+    def __init__(self, workflow: str, inputs: Dict[str, Any], job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.workflow = workflow
+        self.inputs = inputs
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._saved = 0.0
+        self._on_change: Optional[Callable[["Job", bool], None]] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def report(self, progress: float, message: str = ""):
+        """Publish progress as a fraction between 0 and 1, with an optional note"""
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        self.message = message
+        if self._on_change is not None:
+            self._on_change(self, False)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        job = {"job_id": self.id, "workflow": self.workflow, "status": self.status,
+               "progress": round(self.progress, 4), "message": self.message, "submitted": self.submitted,
+               "started": self.started, "finished": self.finished}
+        if self.started is not None:
+            job["seconds"] = round((self.finished or time.time()) - self.started, 3)
+        if self.error is not None:
+            job["error"] = self.error
+        if include_result and self.status == "succeeded":
+            job["result"] = self.result
+        return job
+
+
+class JobQueue:
+    """Runs submitted jobs on a pool of worker threads and remembers their outcome
+
+    ``submit`` returns at once with a queued job. Jobs are persisted to a
+    sqlite file when ``path`` is set, so finished results survive restarts;
+    jobs that were queued or running when the process stopped come back
+    as "interrupted". Finished jobs expire ``ttl`` seconds after they end,
+    and beyond ``max_results`` the oldest are dropped. Results must be
+    JSON-serializable to be persisted; anything else is stored as text.
+    """
+
+    def __init__(self, workers: int = WORKFLOW_WORKERS, max_queued: int = WORKFLOW_MAX_QUEUED,
+                 ttl: float = WORKFLOW_RESULT_TTL, max_results: int = WORKFLOW_MAX_RESULTS,
+                 path: Optional[str] = WORKFLOW_JOBS_PATH or None):
+        self.workers = max(workers, 1)
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.max_results = max_results
+        self.path = path
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.functions: Dict[str, Callable[[Job], Any]] = {}
+        self.stats: Dict[str, int] = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0,
+                                      "cancelled": 0, "expired": 0}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, workflow TEXT, status TEXT, progress REAL, "
+                "message TEXT, inputs TEXT, result TEXT, error TEXT, submitted REAL, started REAL, finished REAL)"
+            )
+            self._db.commit()
+            self._restore()
+        except sqlite3.Error as e:
+            print(f"Error opening workflow job store {path}: {e}")
+            self._db = None
+
+    def _restore(self):
+        """Load persisted jobs; those a previous process never finished are marked interrupted"""
+        rows = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs ORDER BY submitted").fetchall()
+        for row in rows:
+            values = dict(zip(COLUMNS, row))
+            job = Job(values["workflow"], json.loads(values["inputs"] or "{}"), values["id"])
+            job.status = values["status"]
+            job.progress = values["progress"] or 0.0
+            job.message = values["message"] or ""
+            job.result = json.loads(values["result"]) if values["result"] is not None else None
+            job.error = values["error"]
+            job.submitted = values["submitted"]
+            job.started = values["started"]
+            job.finished = values["finished"]
+            if job.status not in FINISHED:
+                job.status = "interrupted"
+                job.error = "The server stopped before the job finished"
+                job.finished = time.time()
+                self._save(job)
+            job._on_change = self._changed
+            self.jobs[job.id] = job
+        self._sweep()
+
+    def _save(self, job: Job):
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    (job.id, job.workflow, job.status, job.progress, job.message,
+                     json.dumps(job.inputs, default=str),
+                     json.dumps(job.result, default=str) if job.status == "succeeded" else None,
+                     job.error, job.submitted, job.started, job.finished))
+                self._db.commit()
+            job._saved = time.monotonic()
+        except sqlite3.Error as e:
+            print(f"Error saving workflow job {job.id}: {e}")
+
+    def _changed(self, job: Job, force: bool):
+        if force or time.monotonic() - job._saved >= PROGRESS_SAVE_INTERVAL:
+            self._save(job)
+
+    def register(self, workflow: str, function: Callable[[Job], Any]):
+        """Set what running a job of ``workflow`` means: ``function(job)`` returning its result"""
+        self.functions[workflow] = function
+
+    def submit(self, workflow: str, inputs: Optional[Dict[str, Any]] = None) -> Job:
+        """Queue a job and return it immediately; raises ``QueueFull`` when too many are waiting"""
+        if workflow not in self.functions:
+            raise KeyError(workflow)
+        with self._lock:
+            self._sweep()
+            waiting = sum(1 for job in self.jobs.values() if job.status == "queued")
+            if waiting >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{waiting} workflow jobs are already queued")
+            job = Job(workflow, inputs or {})
+            job._on_change = self._changed
+            self.jobs[job.id] = job
+            self.stats["submitted"] += 1
+            self._start_workers()
+        self._save(job)
+        self._queue.put(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._sweep()
+            return self.jobs.get(job_id)
+
+    def list_jobs(self, status: Optional[str] = None, workflow: Optional[str] = None, limit: int = 100) -> List[Job]:
+        """Most recently submitted jobs first"""
+        with self._lock:
+            self._sweep()
+            jobs = [job for job in reversed(self.jobs.values())
+                    if (status is None or job.status == status) and (workflow is None or job.workflow == workflow)]
+        return jobs[:limit]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job outright, or ask a running one to stop at its next ``check``"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job._cancel.set()
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+            else:
+                job.status = "cancelling"
+        self._save(job)
+        return job
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        if status == "succeeded":
+            job.progress = 1.0
+        self.stats[status] = self.stats.get(status, 0) + 1
+
+    def _start_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"workflow-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._stopping:
+                return
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started = time.time()
+            self._save(job)
+            try:
+                result = self.functions[job.workflow](job)
+                job.check()
+                outcome = ("succeeded", result, None)
+            except JobCancelled:
+                outcome = ("cancelled", None, None)
+            except Exception as e:
+                outcome = ("failed", None, f"{type(e).__name__}: {e}")
+            with self._lock:
+                self._finish(job, *outcome)
+            self._save(job)
+
+    def _sweep(self):
+        """Drop expired finished jobs, then the oldest finished ones beyond ``max_results``"""
+        now = time.time()
+        finished = [job for job in self.jobs.values() if job.status in FINISHED]
+        expired = [job for job in finished if now - (job.finished or now) > self.ttl]
+        surplus = len(finished) - len(expired) - self.max_results
+        if surplus > 0:
+            kept = sorted((job for job in finished if job not in expired), key=lambda job: job.finished or 0)
+            expired.extend(kept[:surplus])
+        if not expired:
+            return
+        for job in expired:
+            self.jobs.pop(job.id, None)
+        self.stats["expired"] += len(expired)
+        if self._db is not None:
+            try:
+                self._db.executemany("DELETE FROM jobs WHERE id = ?", [(job.id,) for job in expired])
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error expiring workflow jobs: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "max_queued": self.max_queued, "persistent": self._db is not None,
+                "jobs": counts, **self.stats}
+
+    def stop(self):
+        """Let workers exit once their current job is done
+
+        Jobs still queued are not started; with a persistent store they are
+        reported as interrupted after the next start.
+        """
+        self._stopping = True
+        for _ in self._threads:
+            self._queue.put(None)
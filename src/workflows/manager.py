@@ -2,18 +2,32 @@
 Workflow Manager for the AI Module Framework
 """
 
-from typing import Dict, List, Any, Callable
+from typing import Dict, List, Any, Callable, Optional
+import inspect
 import json
 
+from .jobs import Job, JobQueue, QueueFull
+
 class WorkflowManager:
-    """Manages workflows and their execution"""
+    """Manages workflows and their execution
+    
+    ``execute_workflow`` runs a workflow in the caller's thread;
+    ``submit_workflow`` queues it as a job on the ``jobs`` worker pool and
+    returns its id at once.
+    """
     
-    def __init__(self):
+    def __init__(self, jobs: Optional[JobQueue] = None):
         self.workflows: Dict[str, Dict] = {}
         self.workflow_functions: Dict[str, Callable] = {}
+        self.jobs = jobs if jobs is not None else JobQueue()
     
     def register_workflow(self, name: str, workflow: Dict, function: Callable = None):
-        """Register a workflow with optional function"""
+        """Register a workflow with optional function
+        
+        The function is called as ``function(inputs)``, or as
+        ``function(inputs, job=job)`` if it has a ``job`` parameter, to let
+        background runs report progress and notice cancellation.
+        """
         self.workflows[name] = workflow
         if function:
             self.workflow_functions[name] = function
@@ -28,7 +42,7 @@ class WorkflowManager:
         # If there's a registered function, use it
         if name in self.workflow_functions:
             try:
-                result = self.workflow_functions[name](inputs or {})
+                result = self._call(name, inputs or {})
                 return {"success": True, "result": result}
             except Exception as e:
                 return {"error": f"Workflow execution failed: {str(e)}"}
@@ -36,6 +50,50 @@ class WorkflowManager:
         # Otherwise, return workflow definition
         return {"workflow": workflow, "inputs": inputs}
     
+    def _call(self, name: str, inputs: Dict[str, Any], job: Optional[Job] = None) -> Any:
+        function = self.workflow_functions[name]
+        try:
+            takes_job = "job" in inspect.signature(function).parameters
+        except (TypeError, ValueError):
+            takes_job = False
+        if takes_job:
+            return function(inputs, job=job)
+        return function(inputs)
+    
+    def _run_job(self, job: Job) -> Any:
+        if job.workflow not in self.workflows:
+            raise KeyError(f"Workflow '{job.workflow}' not found")
+        if job.workflow not in self.workflow_functions:
+            return {"workflow": self.workflows[job.workflow], "inputs": job.inputs}
+        return self._call(job.workflow, job.inputs, job)
+    
+    def submit_workflow(self, name: str, inputs: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Queue a workflow run; returns its job id without waiting for it"""
+        if name not in self.workflows:
+            return {"error": f"Workflow '{name}' not found"}
+        
+        self.jobs.register(name, self._run_job)
+        try:
+            job = self.jobs.submit(name, inputs or {})
+        except QueueFull as e:
+            return {"error": f"Workflow queue is full: {str(e)}", "queue_full": True}
+        return {"job_id": job.id, "status": job.status}
+    
+    def get_job(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """Status, progress and (once succeeded) result of a job"""
+        job = self.jobs.get(job_id)
+        return job.to_dict(include_result) if job is not None else None
+    
+    def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask a running one to stop"""
+        job = self.jobs.cancel(job_id)
+        return job.to_dict(include_result=False) if job is not None else None
+    
+    def list_jobs(self, status: Optional[str] = None, workflow: Optional[str] = None,
+                  limit: int = 100) -> List[Dict[str, Any]]:
+        """Recent jobs, newest first, without their results"""
+        return [job.to_dict(include_result=False) for job in self.jobs.list_jobs(status, workflow, limit)]
+    
     def list_workflows(self) -> List[str]:
         """List all registered workflows"""
         return list(self.workflows.keys())
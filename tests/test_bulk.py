@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies.bulk import MAX_REPORTED_CONFLICTS, ShardMerger, bulk_ingest, bulk_parse, resolve_shards
+
+
+def merge(*shards):
+    merger = ShardMerger()
+    for i, ontology in enumerate(shards):
+        merger.add(f"shard_{i}.json", ontology)
+    return merger
+
+
+def test_new_and_duplicate_entities():
+    person = {"type": "Person", "name": "Ana"}
+    merger = merge({"instances": {"ana": person}}, {"instances": {"ana": dict(person), "bo": {"type": "Person"}}})
+    assert merger.ontology == {"instances": {"ana": person, "bo": {"type": "Person"}}}
+    assert (merger.entities, merger.duplicates, merger.merged, merger.conflict_count) == (2, 1, 0, 0)
+
+
+def test_entities_are_merged_field_by_field():
+    merger = merge({"classes": {"Person": {"description": "A human", "subclasses": ["Employee"]}}},
+                   {"classes": {"Person": {"subclasses": ["Employee", "Customer"], "parent": "Agent"}}})
+    assert merger.ontology["classes"]["Person"] == {"description": "A human", "subclasses": ["Employee", "Customer"],
+                                                    "parent": "Agent"}
+    assert merger.merged == 1 and merger.conflict_count == 0
+
+
+def test_field_conflict_keeps_the_first_shard():
+    merger = merge({"instances": {"ana": {"type": "Person", "city": "Zürich", "age": 30}}},
+                   {"instances": {"ana": {"type": "Employee", "city": "Zürich", "email": "ana@example.org"}}})
+    assert merger.ontology["instances"]["ana"] == {"type": "Person", "city": "Zürich", "age": 30,
+                                                   "email": "ana@example.org"}
+    assert merger.conflicts == [{"section": "instances", "key": "ana", "kept_from": "shard_0.json",
+                                 "rejected_from": "shard_1.json", "fields": ["type"]}]
+
+
+def test_nested_conflict_is_reported_on_the_top_field():
+    merger = merge({"instances": {"ana": {"address": {"city": "Bern", "zip": "3000"}}}},
+                   {"instances": {"ana": {"address": {"city": "Basel", "street": "Rheinweg"}}}})
+    assert merger.ontology["instances"]["ana"]["address"] == {"city": "Bern", "zip": "3000", "street": "Rheinweg"}
+    assert merger.conflicts[0]["fields"] == ["address"]
+
+
+def test_top_level_values():
+    merger = merge({"name": "Company", "tags": ["a", "b"]}, {"name": "Other", "tags": ["b", "c"], "version": 2})
+    # Scalars come from the first shard without a conflict, lists are unioned
+    assert merger.ontology == {"name": "Company", "tags": ["a", "b", "c"], "version": 2}
+    assert merger.conflict_count == 0
+
+
+def test_section_type_mismatch_is_a_conflict():
+    merger = merge({"instances": {"ana": {"type": "Person"}}, "tags": ["a"]},
+                   {"instances": ["ana"], "tags": "b"}, {"instances": {"bo": {"type": "Person"}}})
+    assert merger.ontology == {"instances": {"ana": {"type": "Person"}, "bo": {"type": "Person"}}, "tags": ["a"]}
+    assert [(conflict["section"], conflict["key"], conflict["rejected_from"]) for conflict in merger.conflicts] == [
+        ("instances", None, "shard_1.json"), ("tags", None, "shard_1.json")]
+
+
+def test_reported_conflicts_are_capped():
+    merger = merge(*({"instances": {"ana": {"age": age}}} for age in range(MAX_REPORTED_CONFLICTS + 6)))
+    assert merger.conflict_count == MAX_REPORTED_CONFLICTS + 5
+    assert len(merger.conflicts) == MAX_REPORTED_CONFLICTS
+
+
+@pytest.fixture
+def storage(tmp_path):
+    shards = tmp_path / "shards"
+    (shards / "nested").mkdir(parents=True)
+    for name, instances in (("a.json", {"ana": {"type": "Person"}}), ("nested/b.json", {"bo": {"type": "Person"}}),
+                            ("c.json", {"ana": {"type": "Employee"}})):
+        (shards / name).write_text(json.dumps({"ontology": {"name": "People", "instances": instances}}),
+                                   encoding="utf-8")
+    (shards / "broken.json").write_text("{", encoding="utf-8")
+    (shards / "notes.txt").write_text("not a shard", encoding="utf-8")
+    (shards / "old.merged.json").write_text(json.dumps({"ontology": {}}), encoding="utf-8")
+    (tmp_path / "outside.json").write_text(json.dumps({"ontology": {}}), encoding="utf-8")
+    return tmp_path
+
+
+def test_resolve_shards(storage):
+    names = [os.path.relpath(path, storage) for path in resolve_shards(str(storage), "shards")]
+    assert names == [os.path.join("shards", name) for name in ("a.json", "broken.json", "c.json",
+                                                              os.path.join("nested", "b.json"))]
+    assert resolve_shards(str(storage), "shards/*.json", exclude=(str(storage / "shards" / "a.json"),)) == [
+        str(storage / "shards" / "broken.json"), str(storage / "shards" / "c.json")]
+    assert resolve_shards(str(storage), "../*.json") == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bulk_parse_is_independent_of_workers(storage, workers):
+    data, stats = bulk_parse(resolve_shards(str(storage), "shards"), workers=workers)
+    assert data["ontology"]["instances"] == {"ana": {"type": "Person"}, "bo": {"type": "Person"}}
+    assert stats["workers"] == workers and stats["failed"] == 1 and stats["conflict_count"] == 1
+    assert stats["errors"][0]["path"].endswith("broken.json")
+
+
+def test_bulk_ingest_writes_the_merged_file(storage):
+    output = str(storage / "shards" / "people.merged.json")
+    data, stats = bulk_ingest(str(storage), "shards", output, workers=1, name="Everyone")
+    with open(output, encoding="utf-8") as file:
+        assert json.load(file) == data
+    assert data["ontology"]["name"] == "Everyone" and stats["shards"] == 4
+    # Running again does not read its own output
+    assert bulk_ingest(str(storage), "shards", output, workers=1)[1]["shards"] == 4
+    assert bulk_ingest(str(storage), "missing", output)[0] is None
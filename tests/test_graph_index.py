@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies.graph_index import GraphIndex
+from ontologies.triple_store import TripleStore
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "storage", "example_ontology.json")
+
+
+@pytest.fixture(scope="module")
+def graph():
+    with open(EXAMPLE, encoding="utf-8") as file:
+        return GraphIndex.build(TripleStore.from_python(json.load(file)))
+
+
+def names(result):
+    assert "error" not in result, result
+    return sorted(hit["name"] for hit in result["results"])
+
+
+def test_subclasses(graph):
+    assert names(graph.query("subclasses", "Person", transitive=False)) == ["CEO", "Employee", "Manager"]
+    assert names(graph.query("subclasses", "Employee")) == ["Manager"]
+    assert names(graph.query("superclasses", "Manager")) == ["Employee", "Person"]
+
+
+def test_instances_include_subclasses_when_transitive(graph):
+    assert names(graph.query("instances", "Manager")) == ["john_doe"]
+    assert names(graph.query("instances", "Person")) == ["john_doe"]
+    assert names(graph.query("instances", "Person", transitive=False)) == []
+    assert names(graph.query("types", "john_doe")) == ["Employee", "Manager", "Person"]
+
+
+def test_neighbours(graph):
+    result = graph.query("neighbours", "ai_project")
+    assert {(hit["name"], hit["relation"]) for hit in result["results"]} == {
+        ("john_doe", "managed_by"), ("engineering_dept", "belongs_to")}
+    incoming = graph.query("neighbours", "john_doe", direction="in")
+    assert [(hit["name"], hit["direction"]) for hit in incoming["results"]] == [("ai_project", "in")]
+    assert names(graph.query("neighbours", "ai_project", relation="belongs_to")) == ["engineering_dept"]
+    assert names(graph.query("neighbours", "ai_project", type="Manager")) == ["john_doe"]
+
+
+def test_k_hops():
+    chain = {f"n{i}": {"type": "Node", "next": f"n{i + 1}"} for i in range(4)}
+    chain["n4"] = {"type": "Node"}
+    graph = GraphIndex.build(TripleStore.from_python({"ontology": {"classes": {"Node": {}}, "instances": chain}}))
+    result = graph.query("neighbours", "n0", hops=3)
+    assert [(hit["name"], hit["hops"], hit["relation"]) for hit in result["results"]] == [
+        ("n1", 1, "next"), ("n2", 2, "next"), ("n3", 3, "next")]
+    assert names(graph.query("neighbours", "n2", hops=1, direction="both")) == ["n1", "n3"]
+
+
+def test_lookup_by_instance_name(graph):
+    assert names(graph.query("types", "John Doe", transitive=False)) == ["Manager"]
+
+
+def test_errors(graph):
+    assert "error" in graph.query("subclasses", "Nobody")
+    assert "error" in graph.query("descendants", "Person")
+    assert "error" in graph.query("neighbours", "john_doe", direction="sideways")
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies.incremental import update_index
+from ontologies.ontology_loader import OntologyLoader
+from ontologies.search_index import LayeredSearchIndex, SearchIndex
+from ontologies.triple_store import TripleStore
+
+
+def company(instances: int, **changes):
+    data = {f"person_{i}": {"type": "Person", "name": f"Person {i}", "city": "Basel"} for i in range(instances)}
+    data.update(changes)
+    return {"ontology": {"name": "Company", "classes": {"Person": {"description": "A human being"}},
+                         "instances": data}}
+
+
+def ranked(index: SearchIndex, query: str, **options):
+    _, hits = index.search(query, limit=1000, **options)
+    return sorted((path, round(score, 6)) for path, _, score in hits)
+
+
+@pytest.mark.parametrize("query, options", [("basel", {}), ("zürich", {}), ("person 7", {}),
+                                            ("", {"filters": {"city": "basel"}})])
+def test_layered_index_matches_a_full_rebuild(query, options):
+    old = TripleStore.from_python(company(100))
+    new = TripleStore.from_python(company(100, person_7={"type": "Person", "name": "Person 7", "city": "Zürich"},
+                                          person_100={"type": "Person", "name": "Newcomer", "city": "Basel"}))
+    layered = update_index(SearchIndex.build(old), old, new)
+    assert isinstance(layered, LayeredSearchIndex)
+    assert ranked(layered, query, **options) == ranked(SearchIndex.build(new), query, **options)
+
+
+def test_removed_documents_disappear():
+    old = TripleStore.from_python(company(50))
+    data = company(50)
+    del data["ontology"]["instances"]["person_3"]
+    new = TripleStore.from_python(data)
+    layered = update_index(SearchIndex.build(old), old, new)
+    assert "ontology.instances.person_3" not in [path for path, _ in ranked(layered, "person")]
+
+
+def test_large_changes_rebuild_the_index():
+    old = TripleStore.from_python(company(20))
+    new = TripleStore.from_python({"ontology": {"instances": {f"x{i}": {"v": i} for i in range(20)}}})
+    assert not isinstance(update_index(SearchIndex.build(old), old, new), LayeredSearchIndex)
+
+
+def test_reload_publishes_only_when_the_file_changed(tmp_path):
+    path = tmp_path / "company.json"
+    path.write_text(json.dumps(company(100)), encoding="utf-8")
+    published = []
+    loader = OntologyLoader(snapshots=False, on_publish=published.append)
+    assert loader.load_ontology(str(path))
+    assert loader.reload() and len(published) == 1
+
+    path.write_text(json.dumps(company(100, person_5={"type": "Person", "name": "Renamed", "city": "Bern"})),
+                    encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert loader.reload()
+    assert len(published) == 2
+    assert loader.state.loaded_from == "reload"
+    assert isinstance(loader.search_index, LayeredSearchIndex)
+    assert loader.search("renamed")["results"][0]["path"] == "ontology.instances.person_5"
+    assert loader.graph_query("instances", "Person")["total"] == 100
@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from workflows.jobs import JobQueue, QueueFull
+
+
+def wait_for(job, *statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status not in statuses:
+        assert time.monotonic() < deadline, job.status
+        time.sleep(0.01)
+    return job
+
+
+def test_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    jobs = JobQueue(workers=1, path=path)
+    jobs.register("double", lambda job: {"value": job.inputs["value"] * 2, "note": "größer"})
+    jobs.register("fail", lambda job: 1 / 0)
+    done = wait_for(jobs.submit("double", {"value": 21}), "succeeded")
+    failed = wait_for(jobs.submit("fail"), "failed")
+    jobs.stop()
+
+    reopened = JobQueue(workers=1, path=path)
+    assert reopened.get(done.id).to_dict()["result"] == {"value": 42, "note": "größer"}
+    assert reopened.get(failed.id).error.startswith("ZeroDivisionError")
+    assert [job.id for job in reopened.list_jobs()] == [failed.id, done.id]
+
+
+def test_unfinished_jobs_come_back_interrupted(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    release = threading.Event()
+    jobs = JobQueue(workers=1, path=path)
+    jobs.register("block", lambda job: release.wait(5))
+    running = wait_for(jobs.submit("block"), "running")
+    queued = jobs.submit("block")
+
+    reopened = JobQueue(workers=1, path=path)
+    release.set()
+    jobs.stop()
+    for job_id in (running.id, queued.id):
+        assert reopened.get(job_id).status == "interrupted"
+        assert reopened.get(job_id).finished is not None
+
+
+def test_cancel_and_queue_limit():
+    release = threading.Event()
+    jobs = JobQueue(workers=1, max_queued=1)
+    jobs.register("block", lambda job: release.wait(5))
+    wait_for(jobs.submit("block"), "running")
+    queued = jobs.submit("block")
+    with pytest.raises(QueueFull):
+        jobs.submit("block")
+    assert jobs.cancel(queued.id).status == "cancelled"
+    release.set()
+    jobs.stop()
+    assert jobs.get_stats()["rejected"] == 1
+
+
+def test_expired_results_are_dropped(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    jobs = JobQueue(workers=1, ttl=0.0, path=path)
+    jobs.register("noop", lambda job: None)
+    job = wait_for(jobs.submit("noop"), "succeeded")
+    time.sleep(0.01)
+    assert jobs.get(job.id) is None
+    jobs.stop()
+    assert JobQueue(path=path).get(job.id) is None
@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies.json_stream import StreamingJSONLoader
+
+ONTOLOGY = {
+    "ontology": {
+        "name": "Chunk boundaries",
+        "version": 1.5,
+        "scale": -2.5e-3,
+        "active": True,
+        "retired": False,
+        "parent": None,
+        "note": "tab\there \"quoted\" é中",
+        "classes": {
+            "Person": {"description": "A \\ person", "weight": 12.75, "flags": [True, None, 3e2]}
+        }
+    }
+}
+
+
+@pytest.fixture
+def ontology_file(tmp_path):
+    path = tmp_path / "ontology.json"
+    path.write_text(json.dumps(ONTOLOGY, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def test_every_chunk_boundary_decodes_the_same(ontology_file):
+    """Numbers, literals and escapes split across chunks must not be cut short"""
+    size = os.path.getsize(ontology_file)
+    for chunk_size in range(1, size + 1):
+        store, _ = StreamingJSONLoader(ontology_file, chunk_size=chunk_size, build_index=False).load()
+        assert store.root.to_python() == ONTOLOGY, f"chunk_size={chunk_size}"
+
+
+@pytest.mark.parametrize("fragment", ['"version": 1.5', '"active": true', '"parent": null', '"note": "a\\tb"'])
+def test_scalar_split_at_chunk_end(tmp_path, fragment):
+    """The value starts right before the first chunk ends, as with a 1 MB chunk in a large file"""
+    prefix = '{"ontology": {"padding": "' + "x" * 40 + '", '
+    text = prefix + fragment + "}}"
+    path = tmp_path / "split.json"
+    path.write_text(text, encoding="utf-8")
+    split = len(prefix) + fragment.index(":") + 4
+    store, _ = StreamingJSONLoader(str(path), chunk_size=split, build_index=False).load()
+    assert store.root.to_python() == json.loads(text)
+
+
+def test_malformed_entity_fails_without_reading_to_the_end(tmp_path):
+    instances = {f"e{i}": {"name": "x" * 50, "value": i} for i in range(2000)}
+    text = json.dumps({"ontology": {"instances": instances}}).replace('"value": 5}', '"value": 5,,}', 1)
+    path = tmp_path / "malformed.json"
+    path.write_text(text, encoding="utf-8")
+    loader = StreamingJSONLoader(str(path), chunk_size=1024, build_index=False)
+    with pytest.raises(ValueError, match="Invalid JSON"):
+        loader.load()
+    assert loader.bytes_read < len(text) // 10
@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from pipelines.cache import StepCache, is_missing, value_digest
+from pipelines.dag import PipelineError, PipelineStep, plan
+from pipelines.manager import PipelineManager
+
+CALLS = []
+
+
+def load(data):
+    CALLS.append("load")
+    return list(data)
+
+
+def total(values):
+    CALLS.append("total")
+    return sum(values)
+
+
+def count(values):
+    CALLS.append("count")
+    return len(values)
+
+
+def mean(results, digits=2):
+    CALLS.append("mean")
+    return round(results["total"] / results["count"], digits)
+
+
+def fail(values):
+    raise RuntimeError("boom")
+
+
+DIAMOND = [
+    {"name": "mean", "depends_on": ["total", "count"], "params": {"digits": 1}},
+    {"name": "total", "depends_on": "load"},
+    {"name": "count", "depends_on": "load"},
+    {"name": "load"}
+]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = PipelineManager(threads=4, cache_dir=str(tmp_path / "cache"))
+    for function in (load, total, count, mean, fail):
+        manager.register_step(function.__name__, function)
+    CALLS.clear()
+    yield manager
+    manager.shutdown()
+
+
+def test_plan_orders_dependencies_and_rejects_cycles():
+    steps = [PipelineStep.from_dict(step, i) for i, step in enumerate(DIAMOND)]
+    functions = {"load": load, "total": total, "count": count, "mean": mean}
+    assert [step.name for step in plan(steps, functions)] == ["load", "total", "count", "mean"]
+    cycle = [PipelineStep("a", "load", ["b"]), PipelineStep("b", "load", ["a"])]
+    with pytest.raises(PipelineError, match="cycle"):
+        plan(cycle, functions)
+    with pytest.raises(PipelineError, match="unknown step"):
+        plan([PipelineStep("a", "load", ["missing"])], functions)
+
+
+def test_diamond_runs_and_is_cached(manager):
+    manager.create_pipeline("stats", DIAMOND)
+    first = manager.execute_pipeline("stats", [1, 2, 3, 4])
+    assert first["success"] and first["outputs"]["mean"] == 2.5
+    assert CALLS.index("load") < CALLS.index("mean")
+
+    CALLS.clear()
+    second = manager.execute_pipeline("stats", [1, 2, 3, 4])
+    assert second["outputs"] == first["outputs"] and second["cache_hits"] == 4
+    assert CALLS == []
+
+    changed = manager.execute_pipeline("stats", [1, 2, 3, 5])
+    assert changed["outputs"]["mean"] == 2.8 and sorted(CALLS) == ["count", "load", "mean", "total"]
+
+    CALLS.clear()
+    uncached = manager.execute_pipeline("stats", [1, 2, 3, 4], use_cache=False)
+    assert "cache_hits" not in uncached and len(CALLS) == 4
+
+
+def test_failed_step_skips_its_dependents(manager):
+    manager.create_pipeline("broken", [{"name": "load"}, {"name": "fail", "depends_on": "load"},
+                                       {"name": "mean", "depends_on": "fail"}, {"name": "count", "depends_on": "load"}])
+    result = manager.execute_pipeline("broken", [1])
+    statuses = {step["name"]: step["status"] for step in result["steps"]}
+    assert statuses == {"load": "completed", "fail": "failed", "mean": "skipped", "count": "completed"}
+    assert not result["success"] and result["error"] == "Steps failed: fail"
+
+
+def test_invalid_pipeline_is_reported(manager):
+    manager.create_pipeline("cyclic", [{"name": "total", "depends_on": "count"}, {"name": "count", "depends_on": "total"}])
+    assert "cycle" in manager.execute_pipeline("cyclic", [])["error"]
+
+
+def test_value_digest():
+    assert value_digest({"a": [1, 2]}) == value_digest({"a": [1, 2]})
+    assert value_digest({"a": [1, 2]}) != value_digest({"a": [2, 1]})
+    assert value_digest(threading.Lock()) is None
+
+
+def test_step_cache_evicts_least_recently_used(tmp_path):
+    cache = StepCache(str(tmp_path), max_bytes=2500)
+    for key in ("aa1", "bb2", "cc3"):
+        assert cache.put(key, b"x" * 1000)
+        cache.get("aa1")
+    assert "bb2" not in cache and "aa1" in cache and "cc3" in cache
+    assert is_missing(cache.get("bb2"))
+    assert not cache.put("dd4", b"x" * 5000)
+    assert StepCache(str(tmp_path), max_bytes=2500).get("cc3") == b"x" * 1000
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1 and stats["misses"] == 1
+
+
+def double(batch):
+    return [value * 2 for value in batch]
+
+
+def evens(batches):
+    for batch in batches:
+        yield [value for value in batch if value % 2 == 0]
+
+
+def test_stream_pipeline_runs_a_chain(manager):
+    manager.register_stream_step("double", double, per_batch=True)
+    manager.register_stream_step("evens", evens)
+    manager.create_pipeline("stream", [{"name": "evens"}, {"name": "double", "depends_on": "evens"}])
+    stats = {}
+    output = [value for batch in manager.stream_pipeline("stream", range(10), batch_size=3, stats=stats)
+              for value in batch]
+    assert output == [0, 4, 8, 12, 16]
+    assert [(stage["name"], stage["records"]) for stage in stats["stages"]] == [("evens", 5), ("double", 5)]
@@ -0,0 +1,119 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies.rdf_parser import (SubjectsNotGrouped, TurtleParser, build_ontology, build_store, iter_ntriples,
+                                   iter_rdfxml, load_rdf, load_rdf_store)
+
+TURTLE = """
+@prefix ex: <http://ex.org/kb#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+ex:Person a owl:Class ; rdfs:comment "A human being" .
+ex:Employee a owl:Class ; rdfs:subClassOf ex:Person .
+ex:worksIn a owl:ObjectProperty ; rdfs:domain ex:Person ; rdfs:range ex:Department .
+ex:alice a ex:Employee ;
+    rdfs:label "Alice \\"Al\\" Smith"@en ;
+    ex:age "41"^^xsd:integer ;
+    ex:skills ( "python" "rdf" ) ;
+    ex:address [ ex:city "Zürich" ] .
+"""
+
+NTRIPLES = """<http://ex.org/kb#bob> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://ex.org/kb#Person> .
+<http://ex.org/kb#bob> <http://ex.org/kb#age> "7"^^<http://www.w3.org/2001/XMLSchema#integer> .
+# a comment
+<http://ex.org/kb#bob> <http://ex.org/kb#note> "line\\nbreak" .
+"""
+
+RDFXML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:ex="http://ex.org/kb#">
+  <ex:Person rdf:about="http://ex.org/kb#alice">
+    <ex:bio rdf:parseType="Literal">Likes <b xmlns="http://www.w3.org/1999/xhtml">bold</b> text</ex:bio>
+    <ex:friends rdf:parseType="Collection">
+      <rdf:Description rdf:about="http://ex.org/kb#bob"/>
+      <ex:Person rdf:about="http://ex.org/kb#carol"/>
+    </ex:friends>
+    <ex:address rdf:parseType="Resource"><ex:city>Bern</ex:city></ex:address>
+    <ex:age rdf:datatype="http://www.w3.org/2001/XMLSchema#integer">30</ex:age>
+  </ex:Person>
+</rdf:RDF>
+"""
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_turtle_terms():
+    triples = list(TurtleParser(io.StringIO(TURTLE)).triples())
+    alice = {str(predicate).split("#")[1]: obj for subject, predicate, obj in triples
+             if subject == "http://ex.org/kb#alice"}
+    assert alice["label"] == 'Alice "Al" Smith'
+    assert alice["age"] == 41
+    assert alice["skills"] == ["python", "rdf"]
+    address = alice["address"]
+    assert (address, "http://ex.org/kb#city", "Zürich") in triples
+
+
+def test_turtle_small_chunks_parse_the_same():
+    whole = list(TurtleParser(io.StringIO(TURTLE)).triples())
+    assert list(TurtleParser(io.StringIO(TURTLE), chunk_size=7).triples()) == whole
+
+
+def test_ntriples():
+    triples = list(iter_ntriples(io.StringIO(NTRIPLES)))
+    assert len(triples) == 3
+    assert triples[1][2] == 7
+    assert triples[2][2] == "line\nbreak"
+
+
+def test_ontology_layout(tmp_path):
+    ontology = load_rdf(write(tmp_path, "company.ttl", TURTLE))["ontology"]
+    assert ontology["name"] == "company"
+    assert ontology["classes"]["Employee"]["parent"] == "Person"
+    assert ontology["classes"]["Person"]["subclasses"] == ["Employee"]
+    assert ontology["classes"]["Person"]["relationships"] == {"worksIn": "Department"}
+    assert ontology["instances"]["alice"]["type"] == "Employee"
+
+
+def test_rdfxml_parse_types():
+    triples = list(iter_rdfxml(io.BytesIO(RDFXML.encode("utf-8"))))
+    objects = {str(predicate).split("#")[1]: obj for subject, predicate, obj in triples
+               if subject == "http://ex.org/kb#alice"}
+    assert objects["bio"].startswith("Likes <") and "bold</" in objects["bio"] and objects["bio"].endswith(" text")
+    assert objects["friends"] == ["http://ex.org/kb#bob", "http://ex.org/kb#carol"]
+    assert (objects["address"], "http://ex.org/kb#city", "Bern") in triples
+    assert objects["age"] == 30
+
+
+@pytest.mark.parametrize("name, text", [("company.ttl", TURTLE), ("people.nt", NTRIPLES), ("alice.rdf", RDFXML)])
+def test_streamed_store_matches_in_memory_layout(tmp_path, name, text):
+    path = write(tmp_path, name, text)
+    assert load_rdf_store(path).root.to_python() == load_rdf(path)
+
+
+def test_scattered_subjects_fall_back_to_grouping_in_memory(tmp_path):
+    lines = [f"<http://ex.org/kb#e{i}> <http://ex.org/kb#p{round}> \"v{round}\" ."
+             for round in range(2) for i in range(50)]
+    path = write(tmp_path, "scattered.nt", "\n".join(lines) + "\n")
+    with pytest.raises(SubjectsNotGrouped):
+        build_store(iter_ntriples(io.StringIO("\n".join(lines))), window=10)
+    instances = load_rdf_store(path).root.to_python()["ontology"]["instances"]
+    assert len(instances) == 50
+    assert instances["e3"] == {"p0": "v0", "p1": "v1"}
+
+
+def test_shared_local_names_get_full_keys(tmp_path):
+    text = ("<http://a.org/x#item> <http://ex.org/kb#p> \"a\" .\n"
+            "<http://b.org/y#item> <http://ex.org/kb#p> \"b\" .\n")
+    path = write(tmp_path, "shared.nt", text)
+    instances = load_rdf_store(path).root.to_python()["ontology"]["instances"]
+    assert instances == build_ontology(iter_ntriples(io.StringIO(text)), "shared")["ontology"]["instances"]
+    assert set(instances) == {"item", "http://b.org/y#item"}
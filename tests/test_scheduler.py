@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from agents.scheduler import AdmissionController, SchedulerFull
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerFull) as rejected:
+            controller.check()
+        assert rejected.value.retry_after >= 1
+        with pytest.raises(SchedulerFull):
+            await controller.acquire()
+        controller.release(0.1)
+        await waiter
+        assert controller.in_flight == 1
+        return controller.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 2 and stats["queued"] == 1 and stats["admitted"] == 2
+
+
+def test_interactive_is_served_before_batch():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=5)
+        order = []
+
+        async def call(name, priority):
+            async with controller.slot(priority):
+                order.append(name)
+
+        await controller.acquire()
+        tasks = [asyncio.ensure_future(call(name, priority)) for name, priority in
+                 [("batch 1", "batch"), ("chat 1", "interactive"), ("batch 2", "batch"), ("chat 2", "interactive")]]
+        await asyncio.sleep(0)
+        assert controller.queue_depth() == {"interactive": 2, "batch": 2}
+        controller.release()
+        await asyncio.gather(*tasks)
+        return order, controller.in_flight
+
+    order, in_flight = asyncio.run(scenario())
+    assert order == ["chat 1", "chat 2", "batch 1", "batch 2"]
+    assert in_flight == 0
+
+
+def test_queue_timeout_raises_and_frees_the_place():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(SchedulerFull):
+            await controller.acquire()
+        assert controller.queue_depth() == {"interactive": 0, "batch": 0}
+        controller.release()
+        await controller.acquire("batch")
+        return controller.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["timeouts"] == 1 and stats["in_flight"] == 1
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        AdmissionController().check("urgent")
@@ -0,0 +1,90 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies.search_index import MAX_PREFIX_TERMS, SearchIndex, tokenize
+from ontologies.triple_store import TripleStore
+
+ONTOLOGY = {
+    "ontology": {
+        "name": "Company",
+        "classes": {
+            "Person": {"description": "A human being", "subclasses": ["Employee"]},
+            "Employee": {"description": "A person who works for the company", "parent": "Person"},
+            "Department": {"description": "An organizational unit"}
+        },
+        "instances": {
+            "john_doe": {"type": "Employee", "name": "John Doe", "department": "Engineering"},
+            "jürgen": {"type": "Employee", "name": "Jürgen Müller", "department": "Forschung"},
+            "wang": {"type": "Employee", "name": "王伟", "department": "Engineering"},
+            "engineering": {"type": "Department", "name": "Engineering"}
+        }
+    }
+}
+
+
+def build(data=ONTOLOGY) -> SearchIndex:
+    return SearchIndex.build(TripleStore.from_python(data))
+
+
+def paths(index: SearchIndex, query: str, **options):
+    _, hits = index.search(query, **options)
+    return [path for path, _, _ in hits]
+
+
+def test_tokenize_keeps_non_ascii_and_splits_underscores():
+    assert tokenize("Jürgen MÜLLER, 王伟 employee_0") == ["jürgen", "müller", "王伟", "employee", "0"]
+
+
+def test_non_ascii_query_finds_the_entity():
+    index = build()
+    assert paths(index, "Müller") == ["ontology.instances.jürgen"]
+    assert paths(index, "MÜLLER") == ["ontology.instances.jürgen"]
+    assert paths(index, "王伟") == ["ontology.instances.wang"]
+
+
+def test_name_matches_outrank_value_matches():
+    # "engineering" is the key of one instance and a field value of two others
+    assert paths(build(), "engineering")[0] == "ontology.instances.engineering"
+
+
+def test_rare_terms_weigh_more():
+    # "doe" occurs once, "employee" in several documents
+    assert paths(build(), "employee doe")[0] == "ontology.instances.john_doe"
+
+
+def test_filters_and_path_prefix():
+    index = build()
+    assert sorted(paths(index, "", filters={"department": "engineering"})) == [
+        "ontology.instances.john_doe", "ontology.instances.wang"]
+    assert paths(index, "engineering", filters={"type": "Department"}) == ["ontology.instances.engineering"]
+    assert all(path.startswith("ontology.classes.") for path in paths(index, "person", path_prefix="ontology.classes"))
+    assert index.search("person", path_prefix="ontology.missing") == (0, [])
+
+
+def test_pagination():
+    index = build()
+    total, first = index.search("employee", limit=1)
+    _, second = index.search("employee", limit=1, offset=1)
+    assert total > 2
+    assert first[0][0] != second[0][0]
+
+
+def test_prefix_fallback_is_bounded():
+    instances = {f"item_{i}": {"code": f"zz{i:04d}", "tag": "common" if i % 2 else "rare"} for i in range(200)}
+    index = build({"ontology": {"instances": instances}})
+    # Too short to expand
+    assert index.search("z") == (0, [])
+    total, _ = index.search("zz0")
+    assert total == MAX_PREFIX_TERMS
+    # Exact terms are not expanded
+    assert index.search("common")[0] == 100
+
+
+def test_named_and_referrers():
+    index = build()
+    store = index.store
+    assert [store.path(doc_id) for doc_id in index.named("Employee")] == ["ontology.classes.Employee"]
+    referrers = {store.path(doc_id) for doc_id in index.referrers("Employee")}
+    # Documents naming Employee in a scalar field, but not the class itself
+    assert referrers == {"ontology.instances.john_doe", "ontology.instances.jürgen", "ontology.instances.wang"}
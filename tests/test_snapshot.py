@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ontologies import snapshot
+from ontologies.search_index import SearchIndex
+from ontologies.snapshot import load_snapshot, save_snapshot, snapshot_path, source_stamp
+from ontologies.triple_store import TripleStore
+
+ONTOLOGY = {
+    "ontology": {
+        "name": "Round trip",
+        "version": 2,
+        "ratio": 0.5,
+        "flags": [True, False, None, 1, 1.0, "1"],
+        "classes": {"Person": {"description": "Café owner", "subclasses": ["Employee"]}},
+        "instances": {"ana": {"type": "Person", "tags": [["nested"], {"deep": {"x": -3}}], "empty": {}}}
+    }
+}
+
+
+@pytest.fixture
+def ontology_file(tmp_path):
+    path = tmp_path / "ontology.json"
+    path.write_text(json.dumps(ONTOLOGY), encoding="utf-8")
+    return str(path)
+
+
+def test_store_round_trip_keeps_types():
+    store = TripleStore.from_python(ONTOLOGY)
+    assert store.root.to_python() == ONTOLOGY
+    flags = store.root.to_python()["ontology"]["flags"]
+    assert [type(flag) for flag in flags] == [bool, bool, type(None), int, float, str]
+
+
+def test_store_paths_resolve():
+    store = TripleStore.from_python(ONTOLOGY)
+    node = store.resolve("ontology.instances.ana")
+    assert store.path(node) == "ontology.instances.ana"
+    assert store.is_descendant(node, store.resolve("ontology"))
+    assert not store.is_descendant(node, store.resolve("ontology.classes"))
+
+
+def test_snapshot_round_trip(ontology_file):
+    store = TripleStore.from_python(ONTOLOGY)
+    index = SearchIndex.build(store)
+    assert save_snapshot(ontology_file, store, index) == snapshot_path(ontology_file)
+    loaded = load_snapshot(ontology_file)
+    assert loaded is not None
+    mapped_store, mapped_index = loaded
+    assert mapped_store.root.to_python() == ONTOLOGY
+    assert mapped_index.search("café")[0] == index.search("café")[0] == 1
+    assert mapped_index.field_matches("type", "person") == index.field_matches("type", "person")
+
+
+def test_snapshot_is_stale_after_an_edit(ontology_file):
+    store = TripleStore.from_python(ONTOLOGY)
+    save_snapshot(ontology_file, store, SearchIndex.build(store))
+    with open(ontology_file, "a", encoding="utf-8") as file:
+        file.write(" ")
+    assert load_snapshot(ontology_file) is None
+
+
+def test_snapshot_skipped_when_source_changed_during_parse(ontology_file):
+    stamp = source_stamp(ontology_file)
+    with open(ontology_file, "a", encoding="utf-8") as file:
+        file.write("\n")
+    store = TripleStore.from_python(ONTOLOGY)
+    assert save_snapshot(ontology_file, store, SearchIndex.build(store), stamp) is None
+    assert not os.path.exists(snapshot_path(ontology_file))
+
+
+def test_touched_source_is_hashed_once(ontology_file, monkeypatch):
+    store = TripleStore.from_python(ONTOLOGY)
+    save_snapshot(ontology_file, store, SearchIndex.build(store))
+    stat = os.stat(ontology_file)
+    os.utime(ontology_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    hashed = []
+    digest = snapshot.file_digest
+    monkeypatch.setattr(snapshot, "file_digest", lambda path: hashed.append(path) or digest(path))
+    assert load_snapshot(ontology_file) is not None
+    assert load_snapshot(ontology_file) is not None
+    assert len(hashed) == 1